@@ -0,0 +1,380 @@
+"""File attachments: streamed in, stored once per distinct content, streamed out.
+
+Blobs are addressed by the SHA-256 of their content, so a file attached to
+several assignments or threads is stored once. An upload is staged under
+an upload id and committed under its digest when complete; a resumable
+upload is staged in parts written by several requests. Nothing here holds
+more than a chunk of a file in memory.
+"""
+import asyncio
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+import weakref
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi.responses import Response, StreamingResponse
+
+from httpcache import etag_matches
+from ids import new_id
+
+# Unit of reads, disk writes and GCS part uploads; GCS wants a multiple of 256 KiB
+CHUNK_BYTES = int(os.getenv("ATTACHMENT_CHUNK_BYTES", str(256 << 10)))
+MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(100 << 20)))
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+class TooLarge(Exception):
+    pass
+
+
+class PartialWrite(Exception):
+    """Writing a part failed after `written` bytes were staged; they are kept."""
+
+    def __init__(self, written: int):
+        super().__init__(f"Write failed after {written} bytes")
+        self.written = written
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+async def limited(chunks: AsyncIterator[bytes], max_bytes: int) -> AsyncIterator[bytes]:
+    total = 0
+    async for chunk in chunks:
+        total += len(chunk)
+        if total > max_bytes:
+            raise TooLarge(max_bytes)
+        yield chunk
+
+
+async def rechunk(chunks: AsyncIterator[bytes], size: int = CHUNK_BYTES) -> AsyncIterator[bytes]:
+    """The same bytes in chunks of `size`, so network reads of a few KiB do not each become a write."""
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= size:
+            yield bytes(buffer[:size])
+            del buffer[:size]
+    if buffer:
+        yield bytes(buffer)
+
+
+async def _hashed(chunks: AsyncIterator[bytes], digest) -> AsyncIterator[bytes]:
+    async for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+class BlobStore(ABC):
+    """Content-addressed file storage.
+
+    Backends stage uploads, commit them under a digest and read committed
+    blobs; storing, resuming and deduplicating are built on those here.
+    """
+
+    @abstractmethod
+    async def write_part(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> int:
+        """Stage `chunks` as the upload's bytes from `offset` on; returns the bytes written.
+
+        If the chunks or the write fail partway, whatever was staged stays
+        staged and PartialWrite reports how much that was.
+        """
+        ...
+
+    @abstractmethod
+    def read_staged(self, upload_id: str) -> AsyncIterator[bytes]:
+        ...
+
+    @abstractmethod
+    async def commit(self, upload_id: str, digest: str) -> None:
+        """Make a staged upload readable under `digest`, or drop it if that content is already stored."""
+        ...
+
+    @abstractmethod
+    async def discard(self, upload_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def read(self, digest: str, start: int, end: int) -> AsyncIterator[bytes]:
+        """Bytes `start` to `end` (exclusive) of a blob, a chunk at a time."""
+        ...
+
+    async def close(self) -> None:
+        pass
+
+    async def put(self, chunks: AsyncIterator[bytes], max_bytes: int = MAX_BYTES) -> Tuple[str, int]:
+        """Store a stream in one go, hashing it as it arrives; returns its digest and size."""
+        upload_id = new_id("blob")
+        digest = hashlib.sha256()
+        try:
+            size = await self.write_part(upload_id, 0, _hashed(rechunk(limited(chunks, max_bytes)), digest))
+        except PartialWrite as e:
+            await self.discard(upload_id)
+            raise e.__cause__ from None
+        await self.commit(upload_id, digest.hexdigest())
+        return digest.hexdigest(), size
+
+    async def finish(self, upload_id: str) -> str:
+        """Commit a resumable upload once all its parts are staged; returns its digest."""
+        # Parts arrive in separate requests, possibly on other workers, so
+        # the content is hashed once it is all there
+        digest = hashlib.sha256()
+        async for chunk in self.read_staged(upload_id):
+            digest.update(chunk)
+        await self.commit(upload_id, digest.hexdigest())
+        return digest.hexdigest()
+
+
+class LocalBlobStore(BlobStore):
+    """Blobs as files in a local directory, for development and tests.
+
+    Reads memory-map the file and copy each chunk out in a worker thread,
+    so page faults on a cold file never block the event loop.
+    """
+
+    def __init__(self, directory: str):
+        self._blobs = os.path.join(directory, "blobs")
+        self._uploads = os.path.join(directory, "uploads")
+        os.makedirs(self._blobs, exist_ok=True)
+        os.makedirs(self._uploads, exist_ok=True)
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self._blobs, digest[:2], digest)
+
+    def _upload_path(self, upload_id: str) -> str:
+        return os.path.join(self._uploads, upload_id)
+
+    async def write_part(self, upload_id, offset, chunks):
+        path = self._upload_path(upload_id)
+        file = await asyncio.to_thread(open, path, "r+b" if offset else "wb")
+        written = 0
+        try:
+            file.seek(offset)
+            async for chunk in chunks:
+                await asyncio.to_thread(file.write, chunk)
+                written += len(chunk)
+        except Exception as e:
+            # Drop anything past the last whole chunk, so the upload resumes exactly there
+            await asyncio.to_thread(file.truncate, offset + written)
+            raise PartialWrite(written) from e
+        finally:
+            await asyncio.to_thread(file.close)
+        return written
+
+    async def read_staged(self, upload_id):
+        path = self._upload_path(upload_id)
+        if not os.path.exists(path):
+            # An empty upload never had a part written
+            return
+        with open(path, "rb") as file:
+            while chunk := await asyncio.to_thread(file.read, CHUNK_BYTES):
+                yield chunk
+
+    async def commit(self, upload_id, digest):
+        await asyncio.to_thread(self._commit, self._upload_path(upload_id), self._blob_path(digest))
+
+    @staticmethod
+    def _commit(staged: str, target: str) -> None:
+        if not os.path.exists(staged):
+            # An empty upload never had a part written
+            open(staged, "wb").close()
+        if os.path.exists(target):
+            os.unlink(staged)
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(staged, target)
+
+    async def discard(self, upload_id):
+        try:
+            os.unlink(self._upload_path(upload_id))
+        except FileNotFoundError:
+            pass
+
+    async def read(self, digest, start, end):
+        if start >= end:
+            return
+        with open(self._blob_path(digest), "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            view.madvise(mmap.MADV_SEQUENTIAL)
+            for position in range(start, end, CHUNK_BYTES):
+                yield await asyncio.to_thread(view.__getitem__, slice(position, min(position + CHUNK_BYTES, end)))
+
+
+class GCSBlobStore(BlobStore):
+    """Blobs in a Google Cloud Storage bucket.
+
+    Each part of an upload is its own staging object, named by its offset;
+    committing composes the parts into the blob server-side. A lifecycle
+    rule deleting old objects under `uploads/` cleans up abandoned uploads.
+    """
+
+    def __init__(self, bucket: str, prefix: str = ""):
+        # Imported lazily so the app runs without google-cloud-storage installed
+        from google.cloud import storage
+
+        self._client = storage.Client()
+        self._bucket = self._client.bucket(bucket)
+        self._prefix = prefix
+
+    def _blob(self, digest: str):
+        return self._bucket.blob(f"{self._prefix}blobs/{digest[:2]}/{digest}")
+
+    def _parts(self, upload_id: str) -> list:
+        # Zero-padded offsets, so name order is byte order
+        parts = self._client.list_blobs(self._bucket, prefix=f"{self._prefix}uploads/{upload_id}/")
+        return sorted(parts, key=lambda part: part.name)
+
+    async def write_part(self, upload_id, offset, chunks):
+        part = self._bucket.blob(f"{self._prefix}uploads/{upload_id}/{offset:020d}")
+        writer = await asyncio.to_thread(part.open, "wb", chunk_size=CHUNK_BYTES)
+        written = 0
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(writer.write, chunk)
+                written += len(chunk)
+        except Exception as e:
+            try:
+                # Finishes the part with what was written, so the upload resumes from there
+                await asyncio.to_thread(writer.close)
+            except Exception:
+                written = 0
+            raise PartialWrite(written) from e
+        await asyncio.to_thread(writer.close)
+        return written
+
+    async def read_staged(self, upload_id):
+        for part in await asyncio.to_thread(self._parts, upload_id):
+            async for chunk in self._read_object(part, 0, None):
+                yield chunk
+
+    async def commit(self, upload_id, digest):
+        parts = await asyncio.to_thread(self._parts, upload_id)
+        target = self._blob(digest)
+        if not await asyncio.to_thread(target.exists):
+            if not parts:
+                await asyncio.to_thread(target.upload_from_string, b"")
+            # A compose takes at most 32 sources, so longer uploads are folded in
+            for start in range(0, len(parts), 31):
+                sources = parts[start:start + 31] if start == 0 else [target] + parts[start:start + 31]
+                await asyncio.to_thread(target.compose, sources)
+        await self._delete(parts)
+
+    async def discard(self, upload_id):
+        await self._delete(await asyncio.to_thread(self._parts, upload_id))
+
+    async def _delete(self, parts: List) -> None:
+        if parts:
+            await asyncio.to_thread(self._bucket.delete_blobs, parts, on_error=lambda part: None)
+
+    def read(self, digest, start, end):
+        return self._read_object(self._blob(digest), start, end)
+
+    async def _read_object(self, blob, start: int, end: Optional[int]) -> AsyncIterator[bytes]:
+        reader = await asyncio.to_thread(blob.open, "rb", chunk_size=CHUNK_BYTES)
+        try:
+            if start:
+                await asyncio.to_thread(reader.seek, start)
+            position = start
+            while end is None or position < end:
+                size = CHUNK_BYTES if end is None else min(CHUNK_BYTES, end - position)
+                chunk = await asyncio.to_thread(reader.read, size)
+                if not chunk:
+                    return
+                position += len(chunk)
+                yield chunk
+        finally:
+            reader.close()
+
+    async def close(self) -> None:
+        self._client.close()
+
+
+def open_blob_store() -> BlobStore:
+    """The bucket named by ATTACHMENT_BUCKET, or the directory ATTACHMENT_DIR otherwise."""
+    bucket = os.getenv("ATTACHMENT_BUCKET")
+    if bucket:
+        return GCSBlobStore(bucket, os.getenv("ATTACHMENT_PREFIX", ""))
+    return LocalBlobStore(os.getenv("ATTACHMENT_DIR") or os.path.join(tempfile.gettempdir(), "canvas-attachments"))
+
+
+_upload_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def upload_lock(upload_id: str) -> asyncio.Lock:
+    """Serializes this worker's writes to one resumable upload, e.g. a client retrying a part early."""
+    lock = _upload_locks.get(upload_id)
+    if lock is None:
+        lock = _upload_locks[upload_id] = asyncio.Lock()
+    return lock
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """The `(start, end)` bytes, end exclusive, asked for by a single-range Range header.
+
+    None means send the whole body: no header, something other than one
+    byte range, or a malformed one, all of which a server may ignore.
+    """
+    match = _RANGE.fullmatch(header.strip()) if header else None
+    if match is None or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = int(last) + 1 if last else size
+        if last and end <= start:
+            return None
+        if start >= size:
+            raise RangeNotSatisfiable()
+    else:
+        # "bytes=-500" is the last 500 bytes
+        if int(last) == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        start, end = max(size - int(last), 0), size
+    return start, min(end, size)
+
+
+def attachment_response(blobs: BlobStore, attachment: dict, headers: Dict[str, str]) -> Response:
+    """The attachment's content, or the byte range the request asks for.
+
+    Content never changes once stored, so the digest is a strong ETag and
+    the body can be cached for as long as the client likes.
+    """
+    size = attachment["size"]
+    etag = f'"{attachment["sha256"]}"'
+    common = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=31536000, immutable",
+    }
+    if etag_matches(headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=common)
+
+    byte_range = None
+    # A stale If-Range means the client's partial copy is of other content
+    if headers.get("if-range", etag) == etag:
+        try:
+            byte_range = parse_range(headers.get("range"), size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**common, "Content-Range": f"bytes */{size}"})
+    start, end = byte_range or (0, size)
+    response_headers = {
+        **common,
+        "Content-Length": str(end - start),
+        # Served as a download, so uploaded HTML or SVG never renders on this origin
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(attachment['filename'])}",
+        "X-Content-Type-Options": "nosniff",
+    }
+    if byte_range:
+        response_headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    return StreamingResponse(
+        blobs.read(attachment["sha256"], start, end),
+        status_code=206 if byte_range else 200,
+        headers=response_headers,
+        media_type=attachment["content_type"],
+    )
@@ -0,0 +1,263 @@
+"""Timed quiz attempts: deadlines on a timer wheel and coalesced autosaves.
+
+Expiring attempts are tracked by one hierarchical timer wheel per worker,
+advanced by a single task once per tick, instead of one sleeping task
+per attempt. Autosaves only replace the attempt's state in memory; the
+latest state of every changed attempt is written with one bulk upsert
+every `AUTOSAVE_FLUSH_SECONDS`, so a student saving after each answer
+costs one write per flush rather than one per save.
+
+Deadlines are stored with the attempts, and on startup every attempt
+still in progress is put back on the wheel; those that ran out while no
+worker was up are submitted on the first tick. Autosaves not yet flushed
+when a worker crashes are lost, up to one flush interval; a clean
+shutdown flushes them.
+
+Any worker takes autosaves for any attempt, and every worker reopens the
+attempts in progress at startup, so several may hold the same timer.
+Submitting or expiring an attempt first claims it in storage, moving it
+from in progress to grading in one conditional update: only the worker
+that wins the claim grades it, and flushes skip attempts no longer in
+progress. An attempt claimed by a worker that stopped before grading it
+is graded by the next worker to start, once the claim is
+`ATTEMPT_CLAIM_TIMEOUT_SECONDS` old.
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Iterable, List, Optional, Set, TypeVar
+
+from pydantic import BaseModel
+
+from storage import Storage
+
+logger = logging.getLogger(__name__)
+
+ATTEMPTS_COLLECTION = "quiz_attempts"
+IN_PROGRESS = "in_progress"
+# Claimed for grading by one worker, which then records the final status
+GRADING = "grading"
+AUTOSAVE_FLUSH_SECONDS = float(os.getenv("AUTOSAVE_FLUSH_SECONDS", "2"))
+# Submissions and autosaves arriving this late are still accepted, to
+# allow for network latency; attempts expire once it has passed too
+ATTEMPT_GRACE_SECONDS = float(os.getenv("ATTEMPT_GRACE_SECONDS", "10"))
+# Grading takes well under this, so an older claim was left by a worker
+# that stopped
+ATTEMPT_CLAIM_TIMEOUT_SECONDS = float(os.getenv("ATTEMPT_CLAIM_TIMEOUT_SECONDS", "60"))
+
+K = TypeVar("K", bound=Hashable)
+
+
+class TimerWheel(Generic[K]):
+    """Hierarchical timing wheel holding at most one deadline per key.
+
+    Level 0 has `slots` slots of one `tick` each, and every level above has
+    slots spanning a whole turn of the level below. A timer is put on the
+    lowest level whose turn reaches its deadline. When a level comes round
+    to a slot, the slot's timers move down to a finer level, until they
+    reach level 0 and fire. Scheduling and cancelling are O(1), and a tick
+    touches only the timers that are due or moving down, however many are
+    pending. With the defaults the wheel spans 64**4 seconds, about 194
+    days; timers beyond that wait on the top level.
+
+    Deadlines are in `time.time()` seconds and fire on the first tick at or
+    after them, never early.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 64, levels: int = 4, now: Optional[float] = None):
+        self.tick = tick
+        self.slots = slots
+        self._spans = [slots ** level for level in range(levels)]
+        self._wheels: List[List[List[K]]] = [[[] for _ in range(slots)] for _ in range(levels)]
+        # Deadline tick of every pending key; a key's entries in the slots
+        # that no longer match it are skipped, so cancelling is a pop
+        self._deadlines: Dict[K, int] = {}
+        self._now = int((time.time() if now is None else now) // tick)
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._deadlines
+
+    def schedule(self, key: K, deadline: float) -> None:
+        """Fire `key` at `deadline`, replacing any earlier schedule; past deadlines fire on the next tick."""
+        tick = max(math.ceil(deadline / self.tick), self._now + 1)
+        self._deadlines[key] = tick
+        self._place(key, tick)
+
+    def cancel(self, key: K) -> None:
+        self._deadlines.pop(key, None)
+
+    def advance(self, now: Optional[float] = None) -> List[K]:
+        """Move to `now` and return the keys that fell due, which are removed."""
+        target = int((time.time() if now is None else now) // self.tick)
+        expired: List[K] = []
+        while self._now < target:
+            self._now += 1
+            # A level comes round to its next slot whenever the level below
+            # completes a turn; that slot's timers move down first
+            for level in range(1, len(self._spans)):
+                if self._now % self._spans[level]:
+                    break
+                self._cascade(level, (self._now // self._spans[level]) % self.slots)
+            slot = self._now % self.slots
+            due, self._wheels[0][slot] = self._wheels[0][slot], []
+            for key in due:
+                if self._deadlines.get(key) == self._now:
+                    del self._deadlines[key]
+                    expired.append(key)
+        return expired
+
+    def _place(self, key: K, tick: int) -> None:
+        delta = tick - self._now
+        for level, span in enumerate(self._spans):
+            if delta < span * self.slots or level == len(self._spans) - 1:
+                self._wheels[level][(tick // span) % self.slots].append(key)
+                return
+
+    def _cascade(self, level: int, slot: int) -> None:
+        span = self._spans[level]
+        top = level == len(self._spans) - 1
+        entries, self._wheels[level][slot] = self._wheels[level][slot], []
+        for key in entries:
+            tick = self._deadlines.get(key)
+            if tick is None:
+                continue  # cancelled or already fired
+            if tick // span == self._now // span or (top and tick // span > self._now // span):
+                # Due within this slot, or a later turn of the top level
+                self._place(key, tick)
+            # Otherwise the key was rescheduled and its live entry is elsewhere
+
+
+class QuizSessions:
+    """The attempts this worker keeps open: their timers and unsaved answers.
+
+    `expire` is called with the ids of attempts whose time ran out, and of
+    claims left stale by a stopped worker, and is expected to submit them.
+    Attempts are pydantic models with `id`, `status`, `answers`, `deadline`
+    and `saved_at` fields, written to `ATTEMPTS_COLLECTION`.
+    """
+
+    def __init__(
+        self,
+        storage: Storage,
+        expire: Callable[[List[str]], Awaitable[None]],
+        tick: float = 1.0,
+        flush_interval: float = AUTOSAVE_FLUSH_SECONDS,
+        grace: float = ATTEMPT_GRACE_SECONDS,
+    ):
+        self.storage = storage
+        self.expire = expire
+        self.flush_interval = flush_interval
+        self.grace = grace
+        self.timers: TimerWheel[str] = TimerWheel(tick)
+        self.expired = 0
+        self.flushes = 0
+        self.saves = 0
+        self._open: Set[str] = set()
+        self._unsaved: Dict[str, BaseModel] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._open)
+
+    async def start(self) -> None:
+        """Reopen the stored attempts still in progress and start the clock."""
+        for attempt in await self.storage.find(ATTEMPTS_COLLECTION, {"status": IN_PROGRESS}, fields=("id", "deadline")):
+            self.open(attempt["id"], attempt["deadline"])
+        for attempt in await self.storage.find(ATTEMPTS_COLLECTION, {"status": GRADING}, fields=("id", "saved_at")):
+            self.timers.schedule(attempt["id"], attempt["saved_at"].timestamp() + ATTEMPT_CLAIM_TIMEOUT_SECONDS)
+        self._task = asyncio.create_task(self._run())
+
+    def open(self, attempt_id: str, deadline: Optional[datetime]) -> None:
+        self._open.add(attempt_id)
+        if deadline is not None:
+            # Past the grace period by a flush, so answers other workers took
+            # in time have been written before the attempt is graded
+            self.timers.schedule(attempt_id, deadline.timestamp() + self.grace + self.flush_interval)
+
+    def save(self, attempt: BaseModel) -> None:
+        """Keep `attempt` as its latest state, to be written with the next flush.
+
+        The flush skips the attempt if it was submitted meanwhile, by this
+        worker or another.
+        """
+        if attempt.id not in self._open:
+            # Started on another worker: this one expires it too
+            self.open(attempt.id, attempt.deadline)
+        self._unsaved[attempt.id] = attempt
+        self.saves += 1
+
+    def unsaved(self, attempt_id: str) -> Optional[BaseModel]:
+        return self._unsaved.get(attempt_id)
+
+    def close_attempt(self, attempt_id: str) -> Optional[BaseModel]:
+        """Stop tracking a submitted attempt; returns its unsaved state, which is dropped."""
+        self._open.discard(attempt_id)
+        self.timers.cancel(attempt_id)
+        return self._unsaved.pop(attempt_id, None)
+
+    def in_time(self, deadline: Optional[datetime], now: Optional[datetime] = None) -> bool:
+        if deadline is None:
+            return True
+        return (now or datetime.now()).timestamp() <= deadline.timestamp() + self.grace
+
+    async def flush(self) -> None:
+        if not self._unsaved:
+            return
+        # Kept until written, so reads during the write still see them
+        attempts = dict(self._unsaved)
+        changes = {key: {"answers": attempt.answers, "saved_at": attempt.saved_at} for key, attempt in attempts.items()}
+        await self.storage.update_many_if(ATTEMPTS_COLLECTION, {"status": IN_PROGRESS}, changes)
+        for key, attempt in attempts.items():
+            # Unless a newer save replaced it or the attempt closed meanwhile
+            if self._unsaved.get(key) is attempt:
+                del self._unsaved[key]
+        self.flushes += 1
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    async def _run(self) -> None:
+        last_flush = time.monotonic()
+        while True:
+            # Ticks are aligned to the clock, so deadlines fire within a tick
+            await asyncio.sleep(self.timers.tick - time.time() % self.timers.tick)
+            try:
+                due = self.timers.advance()
+                if due:
+                    self.expired += len(due)
+                    await self.expire(due)
+                if time.monotonic() - last_flush >= self.flush_interval:
+                    last_flush = time.monotonic()
+                    await self.flush()
+            except Exception:
+                logger.exception("Quiz session tick failed")
+
+
+def attempt_id(user_id: str, quiz_id: str) -> str:
+    """One attempt per student and quiz, keyed like enrollments."""
+    return f"{user_id}:{quiz_id}"
+
+
+def grading_answers(answers: Iterable[Optional[int]], question_count: int) -> List[int]:
+    """Answers ready for `answer_matrix`: unanswered questions count as wrong."""
+    answers = [-1 if answer is None else answer for answer in answers][:question_count]
+    return answers + [-1] * (question_count - len(answers))
+
+
+def split_by_quiz(attempts: Iterable[BaseModel]) -> Dict[str, List[BaseModel]]:
+    by_quiz: Dict[str, List[BaseModel]] = {}
+    for attempt in attempts:
+        by_quiz.setdefault(attempt.quiz_id, []).append(attempt)
+    return by_quiz
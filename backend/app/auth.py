@@ -0,0 +1,104 @@
+import asyncio
+import hashlib
+import os
+import secrets
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import bcrypt
+
+JWT_ALGORITHM = "HS256"
+ACCESS_TOKEN_MINUTES = int(os.getenv("ACCESS_TOKEN_MINUTES", "60"))
+
+# bcrypt releases the GIL, so hashes run in parallel on their own threads
+# instead of competing with sync routes for the default threadpool
+_hash_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AUTH_HASH_WORKERS", str(os.cpu_count() or 1))),
+    thread_name_prefix="bcrypt",
+)
+# Checked when the user does not exist, so response times do not reveal
+# which usernames are registered
+_DUMMY_HASH = bcrypt.hashpw(b"dummy password", bcrypt.gensalt(4))
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _jwt():
+    # python-jose loads its cryptography backends on import, a noticeable
+    # share of startup, so it is imported with the first token instead;
+    # the lifespan's warm-up imports it in the background
+    from jose import jwt
+
+    return jwt
+
+
+def jwt_secret() -> str:
+    """`JWT_SECRET`, or a random per-process secret for local development.
+
+    Without a configured secret, tokens stop working on restart and are not
+    accepted by other workers.
+    """
+    return os.getenv("JWT_SECRET") or secrets.token_urlsafe(32)
+
+
+async def verify_password(password: str, password_hash: Optional[str]) -> bool:
+    hashed = password_hash.encode() if password_hash else _DUMMY_HASH
+    matches = await asyncio.get_running_loop().run_in_executor(_hash_pool, bcrypt.checkpw, password.encode(), hashed)
+    return matches and password_hash is not None
+
+
+class TokenVerifier:
+    """Issues access tokens and verifies them with a claims cache.
+
+    Decoded claims are cached under the SHA-256 of the token, so a repeat
+    request skips the signature check and raw tokens are never kept. An
+    entry lives until its token's `exp`: it is dropped when read after
+    that, and the least recently used entries go first when the cache is
+    full.
+    """
+
+    def __init__(
+        self,
+        secret: str,
+        algorithm: str = JWT_ALGORITHM,
+        max_entries: int = int(os.getenv("AUTH_CACHE_SIZE", "100000")),
+    ):
+        self.algorithm = algorithm
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._secret = secret
+        self._claims: "OrderedDict[bytes, Tuple[float, Dict]]" = OrderedDict()
+
+    def issue(self, user_id: str, name: str, minutes: int = ACCESS_TOKEN_MINUTES) -> str:
+        now = int(time.time())
+        claims = {"sub": user_id, "name": name, "iat": now, "exp": now + minutes * 60}
+        return _jwt().encode(claims, self._secret, algorithm=self.algorithm)
+
+    def verify(self, token: str) -> Dict:
+        """The token's claims; raises InvalidToken when it is malformed, forged or expired."""
+        key = hashlib.sha256(token.encode()).digest()
+        cached = self._claims.get(key)
+        if cached is not None:
+            if cached[0] > time.time():
+                self._claims.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            del self._claims[key]
+
+        self.misses += 1
+        jwt = _jwt()
+        try:
+            claims = jwt.decode(token, self._secret, algorithms=[self.algorithm])
+        except jwt.JWTError as e:
+            raise InvalidToken(str(e)) from e
+        if "sub" not in claims or "exp" not in claims:
+            raise InvalidToken("Token is missing required claims")
+        self._claims[key] = (claims["exp"], claims)
+        while len(self._claims) > self.max_entries:
+            self._claims.popitem(last=False)
+        return claims
@@ -0,0 +1,120 @@
+"""Running several GET requests inside one request, for `POST /batch`.
+
+Each sub-request goes through the whole app, middleware included, with
+the batch's Authorization header, so it is authenticated, rate limited,
+recorded and cached exactly as if it had been sent on its own. The
+sub-requests run concurrently under one `BatchingStorage`, so reads they
+make at the same time are loaded together.
+"""
+import asyncio
+import logging
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from urllib.parse import unquote, urlsplit
+
+from starlette.types import ASGIApp, Message, Scope
+
+from dataloader import batching
+from storage import Storage
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_REQUESTS = 50
+# Sub-response headers passed on to the client
+FORWARDED_HEADERS = (b"etag", b"cache-control", b"x-next-cursor", b"retry-after")
+
+
+class SubResponse(NamedTuple):
+    status: int
+    headers: Dict[str, str]
+    body: Optional[bytes]  # encoded JSON, or None when there is no body
+
+
+class NotBatchable(Exception):
+    pass
+
+
+NOT_BATCHABLE = SubResponse(406, {}, b'{"detail":"Only JSON responses can be batched"}')
+
+
+def sub_scope(scope: Scope, url: str) -> Scope:
+    """A GET for `url` carrying the batch request's connection and credentials."""
+    parts = urlsplit(url)
+    headers = [(name, value) for name, value in scope["headers"] if name == b"authorization"]
+    headers.append((b"accept", b"application/json"))
+    return {
+        "type": "http",
+        "asgi": scope.get("asgi", {"version": "3.0"}),
+        "http_version": scope.get("http_version", "1.1"),
+        "method": "GET",
+        "scheme": scope.get("scheme", "http"),
+        "server": scope.get("server"),
+        "client": scope.get("client"),
+        "root_path": scope.get("root_path", ""),
+        "path": unquote(parts.path),
+        "raw_path": parts.path.encode(),
+        "query_string": parts.query.encode(),
+        "headers": headers,
+        "state": {},
+    }
+
+
+async def run_sub_request(app: ASGIApp, scope: Scope) -> SubResponse:
+    status = 500
+    headers: Dict[str, str] = {}
+    chunks: List[bytes] = []
+    disconnected = asyncio.Event()
+    requested = False
+
+    async def receive() -> Message:
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Nothing else arrives until the sub-request is done
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Message) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            for name, value in message.get("headers", []):
+                if name == b"content-type" and status != 304 and not value.startswith(b"application/json"):
+                    # Ends streams such as /stream instead of waiting on them
+                    raise NotBatchable()
+                if name in FORWARDED_HEADERS:
+                    headers[name.decode()] = value.decode()
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await app(scope, receive, send)
+    except NotBatchable:
+        return NOT_BATCHABLE
+    except Exception:
+        # One failing sub-request must not fail its siblings
+        logger.exception("Batched request for %s failed", scope["path"])
+        return SubResponse(500, {}, b'{"detail":"Internal Server Error"}')
+    finally:
+        disconnected.set()
+    return SubResponse(status, headers, b"".join(chunks) or None)
+
+
+async def run_batch(
+    app: ASGIApp, scope: Scope, storage: Storage, urls: List[str], streaming: Iterable[str] = ()
+) -> List[SubResponse]:
+    """The responses to GET requests for `urls`, run concurrently, in the same order.
+
+    Paths in `streaming` are answered 406 without being called, so a
+    long-lived stream is never opened only to be cut off.
+    """
+    streaming = frozenset(streaming)
+
+    async def run(url: str) -> SubResponse:
+        sub = sub_scope(scope, url)
+        if sub["path"] in streaming:
+            return NOT_BATCHABLE
+        return await run_sub_request(app, sub)
+
+    with batching(storage):
+        return list(await asyncio.gather(*(run(url) for url in urls)))
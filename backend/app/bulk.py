@@ -0,0 +1,304 @@
+"""Streaming NDJSON import and export of whole collections.
+
+Imports read one JSON document per line, validate them against the
+collection's model and write them in batches with `upsert_many`, so memory
+stays bounded by the batch size whatever the size of the dump. Progress of
+a named job is checkpointed after every batch; sending the same file again
+under the same job skips the lines already written. Exports page through
+the collection with keyset cursors and yield one chunk per page.
+
+Also a command line tool:
+
+    python bulk.py import courses courses.ndjson
+    python bulk.py import discussion_replies replies.ndjson --url http://localhost:8000 --token ...
+    python bulk.py export quiz_submissions --where quiz_id=quiz1 > gradebook.ndjson
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Type
+
+import orjson
+from pydantic import BaseModel, ValidationError
+
+from storage import COLLECTIONS, MemoryStorage, Storage, open_storage
+from timeline import naive
+
+BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "1000"))
+# Longer lines are rejected rather than buffered
+MAX_LINE_BYTES = int(os.getenv("BULK_MAX_LINE_BYTES", str(1 << 20)))
+# Rejected lines reported individually; the rest are only counted
+MAX_REPORTED_ERRORS = 20
+# Counter documents holding each named import's progress
+JOBS_COLLECTION = "bulk_jobs"
+
+OnBatch = Callable[[str, List[dict]], Awaitable[None]]
+
+
+class LineTooLong(Exception):
+    pass
+
+
+async def ndjson_lines(chunks: AsyncIterator[bytes], max_bytes: int = MAX_LINE_BYTES) -> AsyncIterator[bytes]:
+    """Lines of a byte stream split at arbitrary points; an overlong line yields LineTooLong."""
+    buffer = b""
+    skipping = False
+    async for chunk in chunks:
+        buffer += chunk
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            if skipping:
+                # The rest of a line already reported as too long
+                skipping = False
+                continue
+            yield line
+        if len(buffer) > max_bytes:
+            if not skipping:
+                yield LineTooLong()
+            buffer = b""
+            skipping = True
+    if buffer and not skipping:
+        yield buffer
+
+
+def naive_datetimes(item: BaseModel) -> BaseModel:
+    """`item` with every datetime, nested ones included, as the naive local time stored."""
+    # Dumps may carry offsets; one aware value in a collection of naive ones
+    # breaks every comparison against it, in sorting and in queries
+    for name in type(item).model_fields:
+        value = getattr(item, name)
+        if isinstance(value, datetime):
+            setattr(item, name, naive(value))
+        elif isinstance(value, BaseModel):
+            naive_datetimes(value)
+        elif isinstance(value, list):
+            for element in value:
+                if isinstance(element, BaseModel):
+                    naive_datetimes(element)
+    return item
+
+
+class ImportResult:
+    def __init__(self, collection: str, job: Optional[str], resumed_at: int):
+        self.collection = collection
+        self.job = job
+        self.resumed_at = resumed_at
+        # Lines read in total, including the ones skipped on resume
+        self.lines = resumed_at
+        self.imported = 0
+        self.rejected = 0
+        self.errors: List[dict] = []
+
+    def reject(self, line: int, error: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+
+async def import_ndjson(
+    storage: Storage,
+    collection: str,
+    model: Type[BaseModel],
+    chunks: AsyncIterator[bytes],
+    job: Optional[str] = None,
+    batch_size: int = BATCH_SIZE,
+    on_batch: Optional[OnBatch] = None,
+    on_progress: Optional[Callable[[ImportResult], None]] = None,
+) -> ImportResult:
+    """Validate and upsert every document in an NDJSON stream, a batch at a time.
+
+    `on_batch` is called with the dumped documents after each batch is
+    written, so derived in-memory state can be brought up to date.
+    """
+    checkpoint = await storage.counters(JOBS_COLLECTION, job) if job else None
+    result = ImportResult(collection, job, int(checkpoint["lines"]) if checkpoint else 0)
+    batch: List[BaseModel] = []
+    batch_lines = batch_rejected = 0
+    line_number = 0
+
+    async def flush() -> None:
+        nonlocal batch, batch_lines, batch_rejected
+        if batch:
+            await storage.upsert_many(collection, batch)
+            if on_batch is not None:
+                await on_batch(collection, [item.model_dump() for item in batch])
+        if job:
+            # Written after the batch, so a crash in between re-imports the
+            # batch, which upserting makes harmless
+            await storage.accumulate(JOBS_COLLECTION, job, {
+                "lines": batch_lines,
+                "imported": len(batch),
+                "rejected": batch_rejected,
+            })
+        result.lines += batch_lines
+        result.imported += len(batch)
+        if on_progress is not None:
+            on_progress(result)
+        batch, batch_lines, batch_rejected = [], 0, 0
+
+    async for line in ndjson_lines(chunks):
+        line_number += 1
+        if line_number <= result.resumed_at:
+            continue
+        batch_lines += 1
+        if isinstance(line, LineTooLong):
+            result.reject(line_number, f"Line longer than {MAX_LINE_BYTES} bytes")
+            batch_rejected += 1
+        elif line.strip():
+            try:
+                batch.append(naive_datetimes(model.model_validate(orjson.loads(line))))
+            except (orjson.JSONDecodeError, ValidationError) as e:
+                result.reject(line_number, str(e))
+                batch_rejected += 1
+        if batch_lines >= batch_size:
+            await flush()
+    await flush()
+    return result
+
+
+async def export_ndjson(
+    storage: Storage,
+    collection: str,
+    where: Optional[Dict[str, str]] = None,
+    batch_size: int = BATCH_SIZE,
+) -> AsyncIterator[bytes]:
+    """The collection as NDJSON in list order, one chunk per page.
+
+    Pages are fetched only when the consumer asks for the next chunk, so a
+    slow client holds back the reads instead of letting them pile up.
+    """
+    order_by = COLLECTIONS[collection].order_by
+    after = None
+    while True:
+        docs = await storage.find(collection, where=where, after=after, limit=batch_size)
+        if not docs:
+            return
+        yield b"".join(orjson.dumps(doc) + b"\n" for doc in docs)
+        if len(docs) < batch_size:
+            return
+        after = (docs[-1][order_by], docs[-1]["id"])
+
+
+async def file_chunks(path: str, size: int = 1 << 16) -> AsyncIterator[bytes]:
+    with (sys.stdin.buffer if path == "-" else open(path, "rb")) as file:
+        while True:
+            chunk = file.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _default_job(collection: str, path: str) -> Optional[str]:
+    if path == "-":
+        return None
+    stat = os.stat(path)
+    return f"{collection}:{os.path.basename(path)}:{stat.st_size}"
+
+
+def _report(result: ImportResult, started: float) -> None:
+    elapsed = time.perf_counter() - started
+    rate = (result.lines - result.resumed_at) / elapsed if elapsed else 0
+    print(
+        f"\r{result.lines:,} lines, {result.imported:,} imported, {result.rejected:,} rejected ({rate:,.0f} lines/s)",
+        end="",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+async def _import_direct(args: argparse.Namespace, models: Dict[str, Type[BaseModel]]) -> dict:
+    storage = await open_storage()
+    if isinstance(storage, MemoryStorage):
+        print("Using the memory backend: nothing is kept after this run. Set MONGODB_URL or use --url.", file=sys.stderr)
+    started = time.perf_counter()
+    try:
+        result = await import_ndjson(
+            storage,
+            args.collection,
+            models[args.collection],
+            file_chunks(args.path),
+            job=args.job,
+            batch_size=args.batch_size,
+            on_progress=lambda result: _report(result, started),
+        )
+    finally:
+        await storage.close()
+    print(file=sys.stderr)
+    return result.as_dict()
+
+
+async def _import_remote(args: argparse.Namespace) -> dict:
+    import httpx
+
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    params = {"batch_size": args.batch_size}
+    if args.job:
+        params["job"] = args.job
+    async with httpx.AsyncClient(base_url=args.url, headers=headers, timeout=None) as client:
+        response = await client.post(f"/bulk/{args.collection}/import", params=params, content=file_chunks(args.path))
+        response.raise_for_status()
+        return response.json()
+
+
+async def _export(args: argparse.Namespace) -> None:
+    where = dict(pair.split("=", 1) for pair in args.where)
+    out = sys.stdout.buffer
+    if args.url:
+        import httpx
+
+        headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+        async with httpx.AsyncClient(base_url=args.url, headers=headers, timeout=None) as client:
+            async with client.stream("GET", f"/bulk/{args.collection}/export", params=where) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    out.write(chunk)
+        return
+
+    storage = await open_storage()
+    try:
+        async for chunk in export_ndjson(storage, args.collection, where or None, args.batch_size):
+            out.write(chunk)
+    finally:
+        await storage.close()
+
+
+def main_(argv: Optional[Iterable[str]] = None) -> None:
+    # The models live with the routes
+    from main import BULK_EXPORTS, BULK_IMPORTS
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="base URL of a running server (default: the storage configured by env)")
+    parser.add_argument("--token", default=os.getenv("BULK_TOKEN"), help="bearer token of an admin user")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    commands = parser.add_subparsers(dest="command", required=True)
+    importing = commands.add_parser("import", help="load an NDJSON file ('-' for stdin)")
+    importing.add_argument("collection", choices=sorted(BULK_IMPORTS))
+    importing.add_argument("path")
+    importing.add_argument("--job", help="checkpoint name; defaults to the collection, file name and size")
+    exporting = commands.add_parser("export", help="write a collection to stdout as NDJSON")
+    exporting.add_argument("collection", choices=sorted(BULK_EXPORTS))
+    exporting.add_argument("--where", action="append", default=[], help="field=value on an indexed field")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        asyncio.run(_export(args))
+        return
+    args.job = args.job or _default_job(args.collection, args.path)
+    if args.url:
+        summary = asyncio.run(_import_remote(args))
+    else:
+        summary = asyncio.run(_import_direct(args, BULK_IMPORTS))
+    print(orjson.dumps(summary, option=orjson.OPT_INDENT_2).decode())
+    if summary["rejected"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_()
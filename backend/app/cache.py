@@ -0,0 +1,407 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+CacheKey = Tuple[str, str]
+
+
+class CacheStats:
+    """Counters for one cache; `as_dict` is what `/cache/stats` reports."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        # Entries loaded at an older revision than the request asked for
+        self.outdated = 0
+        self.invalidations = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(vars(self))
+
+
+class LocalCache:
+    """In-process LRU of encoded bodies whose entries also expire after `ttl` seconds.
+
+    Each entry keeps the collection revision it was loaded at, and `get`
+    skips entries older than the revision asked for.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, stats: CacheStats):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = stats
+        self._entries: "OrderedDict[CacheKey, Tuple[float, int, bytes]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: CacheKey, revision: int = 0) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            self.stats.expirations += 1
+            return None
+        if entry[1] < revision:
+            del self._entries[key]
+            self.stats.outdated += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[2]
+
+    def put(self, key: CacheKey, body: bytes, revision: int = 0) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, revision, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def pop(self, key: CacheKey) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class MemorySharedCache:
+    """Stand-in for a shared cache tier, kept in this process.
+
+    Shared tiers store bytes under string keys with a TTL; `RedisSharedCache`
+    implements the same four methods so every worker shares one tier.
+    Each key also has a generation, which `delete` bumps: a body loaded
+    before an invalidation is written back under the generation read
+    before loading, and dropped once that generation has moved on.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[float, bytes]] = {}
+        self._generations: Dict[str, int] = {}
+
+    async def get_many(self, keys: List[str]) -> List[Tuple[Optional[bytes], int]]:
+        """Each key's body, or None, with its current generation."""
+        now = time.monotonic()
+        found = []
+        for key in keys:
+            entry = self._entries.get(key)
+            body = entry[1] if entry is not None and entry[0] > now else None
+            found.append((body, self._generations.get(key, 0)))
+        return found
+
+    async def set_many(self, items: Dict[str, Tuple[bytes, int]], ttl: float) -> None:
+        """Store each `(body, generation)` unless the key was deleted since that generation."""
+        expires = time.monotonic() + ttl
+        for key, (body, generation) in items.items():
+            if self._generations.get(key, 0) == generation:
+                self._entries[key] = (expires, body)
+
+    async def delete(self, keys: List[str]) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    async def close(self) -> None:
+        self._entries.clear()
+
+
+# Generations only need to outlive the loads in flight when they are bumped
+GENERATION_TTL_MS = 3600 * 1000
+
+# Sets KEYS[i] to its body when the generation in KEYS[n + i] still has the
+# value read before loading; ARGV is the TTL then (generation, body) pairs
+SET_IF_CURRENT = """
+local n = #KEYS / 2
+for i = 1, n do
+    if tonumber(redis.call('GET', KEYS[n + i]) or '0') == tonumber(ARGV[2 * i]) then
+        redis.call('SET', KEYS[i], ARGV[2 * i + 1], 'PX', ARGV[1])
+    end
+end
+"""
+
+
+class RedisSharedCache:
+    """Shared cache tier in Redis, used by every worker."""
+
+    def __init__(self, url: str):
+        # Imported lazily so the app runs without redis installed
+        from redis.asyncio import Redis
+
+        self._redis = Redis.from_url(url)
+        self._set_if_current = self._redis.register_script(SET_IF_CURRENT)
+
+    async def get_many(self, keys: List[str]) -> List[Tuple[Optional[bytes], int]]:
+        values = await self._redis.mget(keys + [_generation_key(key) for key in keys])
+        return [(body, int(generation or 0)) for body, generation in zip(values[:len(keys)], values[len(keys):])]
+
+    async def set_many(self, items: Dict[str, Tuple[bytes, int]], ttl: float) -> None:
+        # One script, so no delete can land between a key's check and its set
+        keys = list(items)
+        args: List[object] = [int(ttl * 1000)]
+        for body, generation in items.values():
+            args += [generation, body]
+        await self._set_if_current(keys=keys + [_generation_key(key) for key in keys], args=args)
+
+    async def delete(self, keys: List[str]) -> None:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.delete(*keys)
+            for key in keys:
+                pipe.incr(_generation_key(key))
+                pipe.pexpire(_generation_key(key), GENERATION_TTL_MS)
+            await pipe.execute()
+
+    async def close(self) -> None:
+        await self._redis.close()
+
+
+def open_shared_cache():
+    """The shared tier configured by `CACHE_REDIS_URL`, or None for a local-only cache."""
+    url = os.getenv("CACHE_REDIS_URL")
+    return RedisSharedCache(url) if url else None
+
+
+class EncodedCache:
+    """Read-through cache of pre-encoded JSON bodies, keyed by (namespace, id).
+
+    Reads go to an in-process LRU with a TTL first, then to the optional
+    shared tier, and only then to the loader. Concurrent misses for one key
+    are coalesced so a burst of requests triggers a single load.
+
+    Write paths must call `invalidate` for every cached entity they change.
+    That clears this process and the shared tier. Other workers' local
+    entries can stay stale for up to `ttl` seconds, except for reads that
+    pass a `revision`: entries in either tier are stamped with the
+    collection revision read before they were loaded, and those older than
+    the revision a read asks for are loaded again. Routes pass the revision
+    their ETag was built from, through `at`, so a body never goes out under
+    an ETag newer than the data in it.
+    """
+
+    def __init__(
+        self,
+        shared=None,
+        max_entries: int = int(os.getenv("ENCODED_CACHE_SIZE", "100000")),
+        ttl: float = float(os.getenv("CACHE_TTL_SECONDS", "60")),
+        shared_ttl: float = float(os.getenv("CACHE_SHARED_TTL_SECONDS", "3600")),
+    ):
+        self.stats = CacheStats()
+        self.local = LocalCache(max_entries, ttl, self.stats)
+        self.shared = shared
+        self.shared_ttl = shared_ttl
+        # Loads in flight, with the revision each was started at
+        self._loading: Dict[CacheKey, Tuple["asyncio.Future[Optional[bytes]]", int]] = {}
+        # Keys being fetched by get_or_load_many, each with its call's marker
+        self._filling: Dict[CacheKey, object] = {}
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+    def at(self, revisions: Dict[str, int]) -> "RevisionedCache":
+        """This cache read at `revisions`, collection name -> revision."""
+        return RevisionedCache(self, revisions)
+
+    async def get_or_load(
+        self,
+        namespace: str,
+        key: str,
+        load: Callable[[], Awaitable[Optional[bytes]]],
+        revision: int = 0,
+    ) -> Optional[bytes]:
+        """The cached body, loading and caching it on a miss; None bodies are not cached.
+
+        Entries loaded before `revision` count as misses.
+        """
+        cache_key = (namespace, key)
+        body = self.local.get(cache_key, revision)
+        if body is not None:
+            self.stats.hits += 1
+            return body
+        loading = self._loading.get(cache_key)
+        if loading is not None and loading[1] >= revision:
+            self.stats.coalesced += 1
+            return await asyncio.shield(loading[0])
+
+        self.stats.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._loading[cache_key] = (future, revision)
+        try:
+            body = await self._load(namespace, key, load, revision)
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark it retrieved so a load nobody else waited on is not logged
+            future.exception()
+            raise
+        finally:
+            current = self._loading.get(cache_key, (None,))[0] is future
+            if current:
+                del self._loading[cache_key]
+        # A body loaded while the key was invalidated may be stale; hand it
+        # to the waiting requests but keep it out of the cache
+        if body is not None and current:
+            self.local.put(cache_key, body, revision)
+        future.set_result(body)
+        return body
+
+    async def get_or_load_many(
+        self,
+        namespace: str,
+        keys: Iterable[str],
+        load: Callable[[List[str]], Awaitable[Dict[str, bytes]]],
+        revision: int = 0,
+    ) -> Dict[str, bytes]:
+        """Bodies for whichever of `keys` exist, loading every uncached one with a single `load` call.
+
+        `load` returns the bodies it found by key. As with `get_or_load`,
+        entries loaded before `revision` count as misses, and bodies of keys
+        invalidated while they were being fetched are returned but not
+        cached.
+        """
+        bodies: Dict[str, bytes] = {}
+        missing: List[str] = []
+        for key in keys:
+            body = self.local.get((namespace, key), revision)
+            if body is None:
+                missing.append(key)
+            else:
+                bodies[key] = body
+        self.stats.hits += len(bodies)
+        if not missing:
+            return bodies
+        self.stats.misses += len(missing)
+
+        # invalidate_many drops these markers, so a key whose marker is gone
+        # afterwards changed during the fetch
+        marker = object()
+        for key in missing:
+            self._filling[(namespace, key)] = marker
+        fetched: Dict[str, Tuple[int, bytes]] = {}
+        loaded: Dict[str, bytes] = {}
+        generations: Dict[str, int] = {}
+        try:
+            to_load = missing
+            if self.shared is not None:
+                found = await self.shared.get_many([_shared_key(namespace, key) for key in missing])
+                to_load = []
+                for key, (value, generation) in zip(missing, found):
+                    entry = _unpack(value, revision)
+                    if entry is None:
+                        to_load.append(key)
+                        generations[key] = generation
+                    else:
+                        fetched[key] = entry
+                self.stats.shared_hits += len(fetched)
+            if to_load:
+                loaded = await load(to_load)
+        finally:
+            current = set()
+            for key in missing:
+                if self._filling.get((namespace, key)) is marker:
+                    del self._filling[(namespace, key)]
+                    current.add(key)
+        for key, (loaded_at, body) in fetched.items():
+            bodies[key] = body
+            if key in current:
+                self.local.put((namespace, key), body, loaded_at)
+        for key, body in loaded.items():
+            bodies[key] = body
+            if key in current:
+                self.local.put((namespace, key), body, revision)
+        if loaded and self.shared is not None:
+            await self.shared.set_many(
+                {_shared_key(namespace, key): (_pack(revision, body), generations[key]) for key, body in loaded.items()},
+                self.shared_ttl,
+            )
+        return bodies
+
+    async def invalidate(self, namespace: str, key: str) -> None:
+        await self.invalidate_many(namespace, [key])
+
+    async def invalidate_many(self, namespace: str, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        self.stats.invalidations += len(keys)
+        for key in keys:
+            self.local.pop((namespace, key))
+            self._loading.pop((namespace, key), None)
+            self._filling.pop((namespace, key), None)
+        if keys and self.shared is not None:
+            await self.shared.delete([_shared_key(namespace, key) for key in keys])
+
+    def clear(self) -> None:
+        self.local.clear()
+
+    async def close(self) -> None:
+        if self.shared is not None:
+            await self.shared.close()
+
+    async def _load(
+        self,
+        namespace: str,
+        key: str,
+        load: Callable[[], Awaitable[Optional[bytes]]],
+        revision: int,
+    ) -> Optional[bytes]:
+        if self.shared is None:
+            return await load()
+        (value, generation), = await self.shared.get_many([_shared_key(namespace, key)])
+        entry = _unpack(value, revision)
+        if entry is not None:
+            self.stats.shared_hits += 1
+            return entry[1]
+        body = await load()
+        if body is not None:
+            # Dropped by the shared tier if the key was invalidated meanwhile,
+            # by this worker or any other
+            await self.shared.set_many({_shared_key(namespace, key): (_pack(revision, body), generation)}, self.shared_ttl)
+        return body
+
+
+class RevisionedCache:
+    """An `EncodedCache` whose reads ask for given collection revisions; namespaces not listed ask for none."""
+
+    def __init__(self, cache: EncodedCache, revisions: Dict[str, int]):
+        self.cache = cache
+        self.revisions = revisions
+
+    async def get_or_load(self, namespace: str, key: str, load: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        return await self.cache.get_or_load(namespace, key, load, self.revisions.get(namespace, 0))
+
+    async def get_or_load_many(
+        self,
+        namespace: str,
+        keys: Iterable[str],
+        load: Callable[[List[str]], Awaitable[Dict[str, bytes]]],
+    ) -> Dict[str, bytes]:
+        return await self.cache.get_or_load_many(namespace, keys, load, self.revisions.get(namespace, 0))
+
+    def __getattr__(self, name: str):
+        # Invalidation, stats and the rest are the cache's own
+        return getattr(self.cache, name)
+
+
+def _shared_key(namespace: str, key: str) -> str:
+    return f"cache:{namespace}:{key}"
+
+
+def _generation_key(shared_key: str) -> str:
+    return f"gen:{shared_key}"
+
+
+# Shared values are the revision a body was loaded at, then the body
+_REVISION_BYTES = 8
+
+
+def _pack(revision: int, body: bytes) -> bytes:
+    return revision.to_bytes(_REVISION_BYTES, "big") + body
+
+
+def _unpack(value: Optional[bytes], revision: int) -> Optional[Tuple[int, bytes]]:
+    """The `(revision, body)` in a shared value, or None if there is none at or after `revision`."""
+    if value is None:
+        return None
+    loaded_at = int.from_bytes(value[:_REVISION_BYTES], "big")
+    return (loaded_at, value[_REVISION_BYTES:]) if loaded_at >= revision else None
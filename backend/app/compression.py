@@ -0,0 +1,271 @@
+"""Response compression negotiated from Accept-Encoding.
+
+gzip is always available; brotli (`br`) and `zstd` are offered when the
+`brotli` and `zstandard` packages are installed. Bodies are compressed
+whole, so streamed responses, ranges and bodies under `min_bytes` go out
+as they are.
+
+A response with an ETag is a fixed representation of one data revision,
+so its compressed body is kept under (ETag, coding) and compressed again
+only once a write changes the ETag. Those bodies are compressed once per
+revision rather than per request, so they use the slower, tighter
+`cached_levels`.
+"""
+import asyncio
+import gzip
+import os
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+Codec = Callable[[bytes, int], bytes]
+
+# Codings in order of preference when the client weighs them equally
+ENCODINGS = tuple(filter(None, os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",")))
+# Per-request levels favour speed; cached bodies are compressed harder,
+# except with gzip, which gains little past 6
+LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+CACHED_LEVELS = {"zstd": 9, "br": 6, "gzip": 6}
+MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+# Bodies at least this large are compressed off the event loop
+THREAD_BYTES = int(os.getenv("COMPRESSION_THREAD_BYTES", str(64 * 1024)))
+CACHE_BYTES = int(os.getenv("COMPRESSION_CACHE_BYTES", str(64 * 1024 * 1024)))
+COMPRESSIBLE_TYPES = ("application/json", "application/xml", "application/javascript", "image/svg+xml", "text/")
+
+
+def _gzip(body: bytes, level: int) -> bytes:
+    # No timestamp in the header, so equal bodies compress to equal bytes
+    return gzip.compress(body, level, mtime=0)
+
+
+def available_codecs() -> Dict[str, Codec]:
+    """Compressors for the codings this process can produce."""
+    codecs: Dict[str, Codec] = {"gzip": _gzip}
+    # Imported lazily so the app runs without the optional codecs installed
+    try:
+        import brotli
+
+        codecs["br"] = lambda body, level: brotli.compress(body, quality=level)
+    except ImportError:
+        pass
+    try:
+        import zstandard
+
+        codecs["zstd"] = lambda body, level: zstandard.ZstdCompressor(level=level).compress(body)
+    except ImportError:
+        pass
+    return codecs
+
+
+@lru_cache(maxsize=256)
+def negotiate(accept_encoding: str, codings: Tuple[str, ...]) -> Optional[str]:
+    """The first of `codings` with the highest weight in `accept_encoding`, or None for identity."""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+    default = weights.get("*", 0.0)
+    chosen, chosen_weight = None, 0.0
+    for coding in codings:
+        weight = weights.get(coding, default)
+        if weight > chosen_weight:
+            chosen, chosen_weight = coding, weight
+    return chosen
+
+
+class CompressionStats:
+    """Counters for `/metrics`; bytes are before and after compression."""
+
+    def __init__(self):
+        self.compressed = 0
+        self.cache_hits = 0
+        self.evictions = 0
+        self.skipped_small = 0
+        self.skipped_streaming = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+
+    def events(self) -> Dict[str, int]:
+        return {
+            "compressed": self.compressed,
+            "cache_hit": self.cache_hits,
+            "eviction": self.evictions,
+            "skipped_small": self.skipped_small,
+            "skipped_streaming": self.skipped_streaming,
+        }
+
+
+class Compressor:
+    """Compresses bodies in the negotiated coding, caching those with an ETag.
+
+    The cache is an LRU bounded by the total size of the compressed bodies.
+    Entries are never invalidated: a write changes the ETag, so the old
+    entry is simply no longer asked for and ages out.
+    """
+
+    def __init__(
+        self,
+        codecs: Optional[Dict[str, Codec]] = None,
+        encodings: Tuple[str, ...] = ENCODINGS,
+        levels: Dict[str, int] = LEVELS,
+        cached_levels: Dict[str, int] = CACHED_LEVELS,
+        max_bytes: int = CACHE_BYTES,
+        thread_bytes: int = THREAD_BYTES,
+    ):
+        self.codecs = codecs if codecs is not None else available_codecs()
+        self.encodings = tuple(coding for coding in encodings if coding in self.codecs)
+        self.levels = levels
+        self.cached_levels = cached_levels
+        self.max_bytes = max_bytes
+        self.thread_bytes = thread_bytes
+        self.stats = CompressionStats()
+        self._cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._cached_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def negotiate(self, accept_encoding: Optional[str]) -> Optional[str]:
+        if not accept_encoding or not self.encodings:
+            return None
+        return negotiate(accept_encoding, self.encodings)
+
+    async def compress(self, body: bytes, coding: str, etag: Optional[str] = None) -> bytes:
+        if etag is None:
+            return await self._compress(body, coding, self.levels[coding])
+        key = (etag, coding)
+        compressed = self._cache.get(key)
+        if compressed is not None:
+            self._cache.move_to_end(key)
+            self.stats.cache_hits += 1
+            return compressed
+        compressed = await self._compress(body, coding, self.cached_levels[coding], in_thread=True)
+        self._put(key, compressed)
+        return compressed
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._cached_bytes = 0
+
+    async def _compress(self, body: bytes, coding: str, level: int, in_thread: bool = False) -> bytes:
+        codec = self.codecs[coding]
+        start = time.perf_counter()
+        # The compressors release the GIL, so large bodies and the slow cached
+        # levels run on a worker thread instead of stalling the event loop
+        if in_thread or len(body) >= self.thread_bytes:
+            compressed = await asyncio.to_thread(codec, body, level)
+        else:
+            compressed = codec(body, level)
+        self.stats.seconds += time.perf_counter() - start
+        self.stats.compressed += 1
+        self.stats.bytes_in += len(body)
+        self.stats.bytes_out += len(compressed)
+        return compressed
+
+    def _put(self, key: Tuple[str, str], compressed: bytes) -> None:
+        if len(compressed) > self.max_bytes:
+            return
+        previous = self._cache.pop(key, None)
+        if previous is not None:
+            self._cached_bytes -= len(previous)
+        self._cache[key] = compressed
+        self._cached_bytes += len(compressed)
+        while self._cached_bytes > self.max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cached_bytes -= len(evicted)
+            self.stats.evictions += 1
+
+
+def compressible(status: int, headers: Headers) -> bool:
+    content_type = headers.get("content-type", "")
+    return (
+        status == 200
+        and content_type.startswith(COMPRESSIBLE_TYPES)
+        and not content_type.startswith("text/event-stream")
+        and "content-encoding" not in headers
+        # Byte ranges address the identity body
+        and "accept-ranges" not in headers
+        and "content-range" not in headers
+        and "no-transform" not in headers.get("cache-control", "")
+    )
+
+
+class CompressionMiddleware:
+    """Compresses whole response bodies in the coding the client accepts.
+
+    Uses the `Compressor` on `app.state.compressor`, created in the lifespan.
+    A response is compressed only when its first body message is the whole
+    body, so streamed responses pass through untouched. Compressible
+    responses always carry `Vary: Accept-Encoding`, and a compressed one's
+    ETag is made weak, which `If-None-Match` still matches.
+    """
+
+    def __init__(self, app: ASGIApp, min_bytes: int = MIN_BYTES):
+        self.app = app
+        self.min_bytes = min_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        compressor: Compressor = scope["app"].state.compressor
+        coding = compressor.negotiate(Headers(scope=scope).get("accept-encoding"))
+        start: Optional[Message] = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Held back until the first body message shows whether it streams
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+            started, start = start, None
+            headers = MutableHeaders(raw=list(started.get("headers", [])))
+            started["headers"] = headers.raw
+            if started["status"] == 304:
+                # Revalidations carry the Vary of the response they stand for
+                headers.add_vary_header("Accept-Encoding")
+            if message["type"] != "http.response.body" or not compressible(started["status"], headers):
+                await send(started)
+                await send(message)
+                return
+            headers.add_vary_header("Accept-Encoding")
+            body = message.get("body", b"")
+            if coding is None or message.get("more_body", False) or len(body) < self.min_bytes:
+                if message.get("more_body", False):
+                    compressor.stats.skipped_streaming += 1
+                elif coding is not None:
+                    compressor.stats.skipped_small += 1
+                await send(started)
+                await send(message)
+                return
+            etag = headers.get("etag")
+            cacheable = etag is not None and not etag.startswith("W/")
+            compressed = await compressor.compress(body, coding, etag if cacheable else None)
+            headers["Content-Encoding"] = coding
+            headers["Content-Length"] = str(len(compressed))
+            if cacheable:
+                # A strong ETag names the identity bytes
+                headers["ETag"] = f"W/{etag}"
+            await send(started)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
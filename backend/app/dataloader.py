@@ -0,0 +1,160 @@
+"""Request-scoped batching of storage reads, for the batch endpoint.
+
+A `DataLoader` collects the keys that concurrent tasks ask for and loads
+them with one call, so N sub-requests that each list one discussion's
+replies become a single grouped query. While a batch runs, `get_storage`
+hands routes a `BatchingStorage` instead of the shared storage; it sends
+the reads routes make per entity or per parent through loaders and
+passes everything else through.
+"""
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Iterable, Iterator, List, Optional, Set, TypeVar
+
+from storage import COLLECTIONS, Storage
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+# Event-loop turns a loader waits for more keys before loading
+MAX_SETTLE_TURNS = 8
+
+_batching: ContextVar[Optional["BatchingStorage"]] = ContextVar("batching", default=None)
+
+
+class DataLoader(Generic[K, V]):
+    """Loads keys in batches and remembers every result for its lifetime.
+
+    `load` calls made while other tasks are still running are gathered
+    into one `batch_load(keys)` call, which returns a dict of the keys it
+    found; missing keys resolve to `default`. The batch is sent once a turn
+    of the event loop adds no new keys, or after `MAX_SETTLE_TURNS` turns.
+    Results are never invalidated, so a loader must not outlive one
+    read-only request.
+    """
+
+    def __init__(self, batch_load: Callable[[List[K]], Awaitable[Dict[K, V]]], default: Any = None):
+        self.batch_load = batch_load
+        self.default = default
+        self.batches = 0
+        self._results: Dict[K, "asyncio.Future[V]"] = {}
+        self._pending: List[K] = []
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def load(self, key: K) -> V:
+        future = self._results.get(key)
+        if future is None:
+            future = self._results[key] = asyncio.get_running_loop().create_future()
+            self._pending.append(key)
+            if len(self._pending) == 1:
+                task = asyncio.create_task(self._dispatch())
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        # Shielded, so one cancelled caller does not cancel the others' result
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: Iterable[K]) -> List[V]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    async def _dispatch(self) -> None:
+        keys = self._pending
+        try:
+            for _ in range(MAX_SETTLE_TURNS):
+                waiting = len(self._pending)
+                await asyncio.sleep(0)
+                if len(self._pending) == waiting:
+                    break
+            keys, self._pending = self._pending, []
+            self.batches += 1
+            found = await self.batch_load(keys)
+        except BaseException as e:
+            # Failed keys are forgotten, so a later load tries them again
+            if keys is self._pending:
+                self._pending = []
+            for key in keys:
+                future = self._results.pop(key)
+                if isinstance(e, Exception):
+                    future.set_exception(e)
+                    # Mark it retrieved so a load nobody waited on is not logged
+                    future.exception()
+                else:
+                    future.cancel()
+            if not isinstance(e, Exception):
+                raise
+            return
+        for key in keys:
+            self._results[key].set_result(found.get(key, self.default))
+
+
+class BatchingStorage:
+    """A storage view for one batch request, coalescing its sub-requests' reads.
+
+    Whole documents by id (`get`, `get_many`) and first pages of one
+    indexed field's value (`find_keys`) go through loaders; other calls,
+    including every write, go straight to the wrapped storage.
+    """
+
+    def __init__(self, storage: Storage):
+        self.storage = storage
+        self._documents: Dict[str, DataLoader[str, Optional[dict]]] = {}
+        self._keys: Dict[tuple, DataLoader[Any, list]] = {}
+
+    def __getattr__(self, name: str):
+        return getattr(self.storage, name)
+
+    @property
+    def batches(self) -> int:
+        """Storage calls the loaders made."""
+        return sum(loader.batches for loader in (*self._documents.values(), *self._keys.values()))
+
+    async def get(self, collection, key, fields=None):
+        if fields is not None:
+            return await self.storage.get(collection, key, fields)
+        return await self._document_loader(collection).load(key)
+
+    async def get_many(self, collection, keys, fields=None):
+        if fields is not None:
+            return await self.storage.get_many(collection, keys, fields)
+        docs = await self._document_loader(collection).load_many(keys)
+        return [doc for doc in docs if doc is not None]
+
+    async def find_keys(self, collection, where=None, after=None, limit=None):
+        field = next(iter(where), None) if where and len(where) == 1 else None
+        if after is not None or field not in COLLECTIONS[collection].indexes:
+            return await self.storage.find_keys(collection, where, after=after, limit=limit)
+        return await self._keys_loader(collection, field, limit).load(where[field])
+
+    def _document_loader(self, collection: str) -> DataLoader[str, Optional[dict]]:
+        loader = self._documents.get(collection)
+        if loader is None:
+            async def load(keys: List[str]) -> Dict[str, dict]:
+                return {doc["id"]: doc for doc in await self.storage.get_many(collection, keys)}
+
+            loader = self._documents[collection] = DataLoader(load)
+        return loader
+
+    def _keys_loader(self, collection: str, field: str, limit: Optional[int]) -> DataLoader[Any, list]:
+        loader = self._keys.get((collection, field, limit))
+        if loader is None:
+            async def load(values: List[Any]) -> Dict[Any, list]:
+                return await self.storage.find_keys_grouped(collection, field, values, limit=limit)
+
+            loader = self._keys[(collection, field, limit)] = DataLoader(load, default=[])
+        return loader
+
+
+def batching_storage() -> Optional[BatchingStorage]:
+    """The storage view of the batch request running in this context, if any."""
+    return _batching.get()
+
+
+@contextmanager
+def batching(storage: Storage) -> Iterator[BatchingStorage]:
+    """Routes called in this context, and in tasks started from it, share one `BatchingStorage`."""
+    view = BatchingStorage(storage)
+    token = _batching.set(view)
+    try:
+        yield view
+    finally:
+        _batching.reset(token)
@@ -0,0 +1,12 @@
+"""Loads a local `.env` into the environment; main imports this first.
+
+Several modules read their settings when imported, so the file must be
+loaded before any of them. Cloud Run sets `K_SERVICE` and passes settings
+as real environment variables, so there the lookup is skipped.
+"""
+import os
+
+if not os.getenv("K_SERVICE"):
+    from dotenv import load_dotenv
+
+    load_dotenv()
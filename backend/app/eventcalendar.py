@@ -0,0 +1,273 @@
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from timeline import naive
+
+logger = logging.getLogger(__name__)
+
+# Longest window a calendar query may ask for
+MAX_RANGE = timedelta(days=366)
+
+# Recurrence frequencies with a fixed step; anything calendar-dependent
+# (monthly, BYDAY, ...) is rejected rather than expanded wrongly
+FREQUENCIES = {
+    "DAILY": timedelta(days=1),
+    "WEEKLY": timedelta(weeks=1),
+}
+
+Interval = Tuple[datetime, datetime, str]
+
+
+class Recurrence:
+    """The subset of an iCalendar RRULE the calendar can expand.
+
+    Supports `FREQ=DAILY|WEEKLY` with optional `INTERVAL`, `COUNT` and
+    `UNTIL`. Occurrences are a fixed step apart, so the ones inside a
+    window are found arithmetically instead of by walking the series.
+    """
+
+    def __init__(self, step: timedelta, count: Optional[int] = None, until: Optional[datetime] = None):
+        self.step = step
+        self.count = count
+        self.until = until
+
+    @classmethod
+    def parse(cls, rule: str) -> "Recurrence":
+        parts = {}
+        for part in rule.split(";"):
+            name, sep, value = part.partition("=")
+            if not sep:
+                raise ValueError(f"Invalid recurrence rule part: {part!r}")
+            parts[name.strip().upper()] = value.strip()
+        freq = parts.pop("FREQ", None)
+        if freq not in FREQUENCIES:
+            raise ValueError(f"Unsupported recurrence frequency: {freq}")
+        interval = int(parts.pop("INTERVAL", "1"))
+        count = int(parts.pop("COUNT")) if "COUNT" in parts else None
+        until = _parse_until(parts.pop("UNTIL")) if "UNTIL" in parts else None
+        if parts:
+            raise ValueError(f"Unsupported recurrence rule parts: {', '.join(parts)}")
+        if interval < 1 or (count is not None and count < 1):
+            raise ValueError("INTERVAL and COUNT must be positive")
+        return cls(FREQUENCIES[freq] * interval, count, until)
+
+    def last_start(self, first: datetime) -> Optional[datetime]:
+        """Start of the final occurrence, or None when the series never ends."""
+        n = self.count
+        if self.until is not None:
+            # The first occurrence always counts, even past UNTIL
+            by_until = max((self.until - first) // self.step + 1, 1)
+            n = by_until if n is None else min(n, by_until)
+        if n is None:
+            return None
+        return first + self.step * (n - 1)
+
+    def occurrences(
+        self,
+        first: datetime,
+        duration: timedelta,
+        start: datetime,
+        end: datetime,
+    ) -> Iterator[datetime]:
+        """Starts of the occurrences overlapping [start, end]."""
+        last = self.last_start(first)
+        # Smallest k with first + k * step + duration >= start
+        k = max(0, -((first + duration - start) // self.step))
+        occurrence = first + self.step * k
+        while occurrence <= end and (last is None or occurrence <= last):
+            yield occurrence
+            occurrence += self.step
+
+
+def _parse_until(value: str) -> datetime:
+    if value.endswith("Z"):
+        # UTC bounds are compared against naive local event times
+        return naive(datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc))
+    if "T" in value:
+        return datetime.strptime(value, "%Y%m%dT%H%M%S")
+    # A bare date includes occurrences starting at any time that day
+    return datetime.strptime(value, "%Y%m%d") + timedelta(days=1, microseconds=-1)
+
+
+class IntervalIndex:
+    """Closed time intervals answering overlap queries in O(log n + k).
+
+    Starts are kept in sorted parallel arrays, so intervals beginning
+    inside a query are a bisected slice. Intervals that began earlier
+    and are still running come from a centered interval tree stabbed at
+    the query start. The tree is rebuilt lazily after writes, which are
+    rare next to reads.
+    """
+
+    def __init__(self):
+        self._starts: List[datetime] = []
+        self._keys: List[str] = []
+        self._intervals: Dict[str, Tuple[datetime, datetime]] = {}
+        self._tree = None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: str, start: datetime, end: datetime) -> None:
+        self.remove(key)
+        index = bisect_right(self._starts, start)
+        self._starts.insert(index, start)
+        self._keys.insert(index, key)
+        self._intervals[key] = (start, end)
+        self._tree = None
+
+    def remove(self, key: str) -> bool:
+        interval = self._intervals.pop(key, None)
+        if interval is None:
+            return False
+        index = bisect_left(self._starts, interval[0])
+        while self._keys[index] != key:
+            index += 1
+        del self._starts[index]
+        del self._keys[index]
+        self._tree = None
+        return True
+
+    def keys(self) -> List[str]:
+        """Every key, ordered by interval start."""
+        return list(self._keys)
+
+    def overlapping(self, start: datetime, end: datetime) -> List[str]:
+        """Keys of intervals overlapping [start, end], ordered by interval start."""
+        if self._tree is None:
+            self._tree = _build_tree([(s, self._intervals[k][1], k) for s, k in zip(self._starts, self._keys)])
+        running = sorted(interval for interval in _stab(self._tree, start) if interval[0] < start)
+        lo = bisect_left(self._starts, start)
+        hi = bisect_right(self._starts, end)
+        return [interval[2] for interval in running] + self._keys[lo:hi]
+
+
+def _build_tree(intervals: List[Interval]):
+    """Centered interval tree over intervals sorted by start.
+
+    Each node is (center, intervals containing center by start, the same
+    by descending end, left subtree, right subtree).
+    """
+    if not intervals:
+        return None
+    center = intervals[len(intervals) // 2][0]
+    left, here, right = [], [], []
+    for interval in intervals:
+        if interval[1] < center:
+            left.append(interval)
+        elif interval[0] > center:
+            right.append(interval)
+        else:
+            here.append(interval)
+    by_end = sorted(here, key=lambda interval: interval[1], reverse=True)
+    return center, here, by_end, _build_tree(left), _build_tree(right)
+
+
+def _stab(node, point: datetime) -> List[Interval]:
+    """Intervals containing `point`."""
+    found = []
+    while node is not None:
+        center, by_start, by_end, left, right = node
+        if point < center:
+            # Everything here ends at or after center, so it contains the
+            # point as long as it starts by then
+            for interval in by_start:
+                if interval[0] > point:
+                    break
+                found.append(interval)
+            node = left
+        else:
+            for interval in by_end:
+                if interval[1] < point:
+                    break
+                found.append(interval)
+            node = right
+    return found
+
+
+class EventCalendar:
+    """Events indexed by the time they occupy, overall and per course.
+
+    A recurring event is indexed once by the span of its whole series and
+    expanded into occurrences only within the window being read.
+    """
+
+    def __init__(self):
+        self._events: Dict[str, dict] = {}
+        self._rules: Dict[str, Recurrence] = {}
+        self._all = IntervalIndex()
+        self._by_course: Dict[str, IntervalIndex] = {}
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def upsert(self, event: dict) -> None:
+        event_id = event["id"]
+        self.remove(event_id)
+        start, end = event["start_time"], event["end_time"]
+        if event.get("recurrence"):
+            rule = Recurrence.parse(event["recurrence"])
+            last = rule.last_start(start)
+            end = datetime.max if last is None else last + (end - start)
+            self._rules[event_id] = rule
+        self._events[event_id] = event
+        self._all.add(event_id, start, end)
+        if event.get("course_id"):
+            self._by_course.setdefault(event["course_id"], IntervalIndex()).add(event_id, start, end)
+
+    def remove(self, event_id: str) -> bool:
+        event = self._events.pop(event_id, None)
+        if event is None:
+            return False
+        self._rules.pop(event_id, None)
+        self._all.remove(event_id)
+        course_index = self._by_course.get(event.get("course_id"))
+        if course_index is not None:
+            course_index.remove(event_id)
+            if not course_index:
+                del self._by_course[event["course_id"]]
+        return True
+
+    def window(self, start: datetime, end: datetime, course_id: Optional[str] = None) -> List[dict]:
+        """Event occurrences overlapping [start, end], ordered by start time."""
+        start, end = naive(start), naive(end)
+        index = self._all if course_id is None else self._by_course.get(course_id)
+        if index is None:
+            return []
+        occurrences = []
+        expanded = False
+        for event_id in index.overlapping(start, end):
+            event = self._events[event_id]
+            rule = self._rules.get(event_id)
+            if rule is None:
+                occurrences.append(event)
+                continue
+            expanded = True
+            duration = event["end_time"] - event["start_time"]
+            for occurrence in rule.occurrences(event["start_time"], duration, start, end):
+                occurrences.append({**event, "start_time": occurrence, "end_time": occurrence + duration})
+        if expanded:
+            # Later occurrences of a series interleave with other events
+            occurrences.sort(key=lambda event: event["start_time"])
+        return occurrences
+
+    def events(self, course_id: Optional[str] = None) -> List[dict]:
+        """Every event (recurring ones once, unexpanded), ordered by start time."""
+        index = self._all if course_id is None else self._by_course.get(course_id)
+        if index is None:
+            return []
+        return [self._events[event_id] for event_id in index.keys()]
+
+
+async def build_event_calendar(storage) -> EventCalendar:
+    calendar = EventCalendar()
+    for event in await storage.find("events"):
+        try:
+            calendar.upsert(event)
+        except (ValueError, TypeError, OverflowError):
+            # Stored before rules were validated; one bad event must not
+            # stop the app from starting
+            logger.exception("Skipping event %s the calendar cannot expand", event["id"])
+    return calendar
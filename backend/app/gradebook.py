@@ -0,0 +1,132 @@
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+from grading import CompiledQuiz
+from storage import Storage
+
+SUBMISSIONS_COLLECTION = "quiz_submissions"
+STATS_COLLECTION = "quiz_stats"
+HISTOGRAM_BINS = 10
+
+
+class QuizStats:
+    """Running statistics for one quiz, kept as plain sums.
+
+    Every field is additive, so a batch of submissions is folded in with
+    one atomic increment and the summary never rescans submissions:
+    mean and variance come from the score sums, item difficulty from the
+    per-question correct counts, and discrimination (point-biserial
+    correlation with the total score) from the per-question score sums.
+    """
+
+    def __init__(self, question_count: int, bins: int = HISTOGRAM_BINS):
+        self.count = 0
+        self.score_sum = 0.0
+        self.score_sq_sum = 0.0
+        self.histogram = np.zeros(bins, dtype=np.int64)
+        self.correct = np.zeros(question_count, dtype=np.int64)
+        self.correct_score_sum = np.zeros(question_count, dtype=np.float64)
+
+    @classmethod
+    def from_batch(cls, quiz: CompiledQuiz, marked: np.ndarray, scores: np.ndarray, bins: int = HISTOGRAM_BINS):
+        stats = cls(quiz.question_count, bins)
+        stats.count = len(scores)
+        stats.score_sum = float(scores.sum())
+        stats.score_sq_sum = float(scores @ scores)
+        if quiz.total_points > 0:
+            positions = np.minimum((scores / quiz.total_points * bins).astype(np.int64), bins - 1)
+            stats.histogram = np.bincount(np.maximum(positions, 0), minlength=bins)
+        else:
+            stats.histogram[0] = len(scores)
+        stats.correct = marked.sum(axis=0)
+        stats.correct_score_sum = scores @ marked
+        return stats
+
+    def to_increments(self) -> Dict[str, float]:
+        increments: Dict[str, float] = {
+            "count": self.count,
+            "score_sum": self.score_sum,
+            "score_sq_sum": self.score_sq_sum,
+        }
+        increments.update({f"hist_{i}": int(v) for i, v in enumerate(self.histogram)})
+        increments.update({f"correct_{i}": int(v) for i, v in enumerate(self.correct)})
+        increments.update({f"correct_score_sum_{i}": float(v) for i, v in enumerate(self.correct_score_sum)})
+        return increments
+
+    @classmethod
+    def from_counters(cls, counters: Dict[str, float], question_count: int, bins: int = HISTOGRAM_BINS):
+        stats = cls(question_count, bins)
+        stats.count = int(counters.get("count", 0))
+        stats.score_sum = counters.get("score_sum", 0.0)
+        stats.score_sq_sum = counters.get("score_sq_sum", 0.0)
+        for i in range(bins):
+            stats.histogram[i] = counters.get(f"hist_{i}", 0)
+        for i in range(question_count):
+            stats.correct[i] = counters.get(f"correct_{i}", 0)
+            stats.correct_score_sum[i] = counters.get(f"correct_score_sum_{i}", 0.0)
+        return stats
+
+    def summary(self, quiz: CompiledQuiz) -> dict:
+        n = self.count
+        mean = self.score_sum / n if n else None
+        variance = max(self.score_sq_sum / n - mean * mean, 0.0) if n else None
+        std = math.sqrt(variance) if variance is not None else None
+
+        bins = len(self.histogram)
+        width = quiz.total_points / bins
+        questions = []
+        for i, question_id in enumerate(quiz.question_ids):
+            correct = int(self.correct[i])
+            questions.append({
+                "question_id": question_id,
+                "correct": correct,
+                "difficulty": correct / n if n else None,
+                "discrimination": self._discrimination(i, mean, std),
+            })
+        return {
+            "submissions": n,
+            "mean": mean,
+            "variance": variance,
+            "std_dev": std,
+            "histogram": [
+                {"min": i * width, "max": (i + 1) * width, "count": int(count)}
+                for i, count in enumerate(self.histogram)
+            ],
+            "questions": questions,
+        }
+
+    def _discrimination(self, i: int, mean: Optional[float], std: Optional[float]) -> Optional[float]:
+        n, correct = self.count, int(self.correct[i])
+        if not n or not std or correct in (0, n):
+            return None
+        mean_correct = self.correct_score_sum[i] / correct
+        mean_incorrect = (self.score_sum - self.correct_score_sum[i]) / (n - correct)
+        p = correct / n
+        return float((mean_correct - mean_incorrect) / std * math.sqrt(p * (1 - p)))
+
+
+async def record_submissions(
+    storage: Storage,
+    quiz_id: str,
+    quiz: CompiledQuiz,
+    submissions: List[BaseModel],
+    marked: np.ndarray,
+    scores: np.ndarray,
+) -> None:
+    """Append graded submissions and fold them into the quiz's running stats."""
+    await storage.insert_many(SUBMISSIONS_COLLECTION, submissions)
+    await count_submissions(storage, quiz_id, quiz, marked, scores)
+
+
+async def count_submissions(storage: Storage, quiz_id: str, quiz: CompiledQuiz, marked: np.ndarray, scores: np.ndarray) -> None:
+    """Fold graded submissions into the quiz's running stats, once per call."""
+    if len(scores):
+        await storage.accumulate(STATS_COLLECTION, quiz_id, QuizStats.from_batch(quiz, marked, scores).to_increments())
+
+
+async def quiz_stats(storage: Storage, quiz_id: str, quiz: CompiledQuiz) -> dict:
+    counters = await storage.counters(STATS_COLLECTION, quiz_id) or {}
+    return QuizStats.from_counters(counters, quiz.question_count).summary(quiz)
@@ -0,0 +1,95 @@
+from itertools import chain
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class CompiledQuiz:
+    """A quiz's answer key as arrays, ready for vectorized grading.
+
+    Each question is worth its own `points`. Scores are scaled so a perfect
+    submission earns the quiz's `total_points`.
+    """
+
+    def __init__(
+        self,
+        question_ids: List[str],
+        correct: np.ndarray,
+        points: np.ndarray,
+        total_points: float,
+        course_id: Optional[str] = None,
+        time_limit_minutes: Optional[int] = None,
+    ):
+        self.question_ids = question_ids
+        self.correct = correct
+        self.points = points
+        self.total_points = total_points
+        self.course_id = course_id
+        self.time_limit_minutes = time_limit_minutes
+        max_points = float(points.sum())
+        self._scale = total_points / max_points if max_points else 0.0
+
+    @classmethod
+    def from_quiz(cls, quiz: dict) -> "CompiledQuiz":
+        questions = quiz["questions"]
+        correct = np.fromiter((q["correct_option"] for q in questions), dtype=np.int64, count=len(questions))
+        points = np.fromiter((q["points"] for q in questions), dtype=np.float64, count=len(questions))
+        return cls(
+            [q["id"] for q in questions],
+            correct,
+            points,
+            float(quiz["total_points"]),
+            quiz.get("course_id"),
+            quiz.get("time_limit_minutes"),
+        )
+
+    @property
+    def question_count(self) -> int:
+        return len(self.correct)
+
+    def mark(self, answers: np.ndarray) -> np.ndarray:
+        """Boolean correctness for an (n_submissions, n_questions) array of chosen options."""
+        return answers == self.correct
+
+    def score(self, marked: np.ndarray) -> np.ndarray:
+        return (marked @ self.points) * self._scale
+
+    def grade(self, answers: np.ndarray) -> np.ndarray:
+        return self.score(self.mark(answers))
+
+    def grade_one(self, answers: Sequence[int]) -> float:
+        return float(self.grade(np.asarray([answers], dtype=np.int64))[0])
+
+
+class GradingEngine:
+    """Caches compiled quizzes, recompiling when the quizzes collection changes."""
+
+    # Fields needed to compile a quiz
+    QUIZ_FIELDS = ("course_id", "questions", "total_points", "time_limit_minutes")
+
+    def __init__(self):
+        self._compiled: Dict[str, Tuple[int, CompiledQuiz]] = {}
+
+    async def compiled(self, storage, quiz_id: str):
+        revision, = await storage.revisions(["quizzes"])
+        cached = self._compiled.get(quiz_id)
+        if cached is not None and cached[0] == revision:
+            return cached[1]
+        quiz = await storage.get("quizzes", quiz_id, fields=self.QUIZ_FIELDS)
+        if quiz is None:
+            self._compiled.pop(quiz_id, None)
+            return None
+        compiled = CompiledQuiz.from_quiz(quiz)
+        self._compiled[quiz_id] = (revision, compiled)
+        return compiled
+
+
+def answer_matrix(submissions: List[Sequence[int]], question_count: int) -> np.ndarray:
+    """Stack answer lists into one array; raises ValueError naming bad rows."""
+    lengths = np.fromiter(map(len, submissions), dtype=np.int64, count=len(submissions))
+    bad = np.flatnonzero(lengths != question_count)
+    if len(bad):
+        raise ValueError(bad.tolist())
+    # Flattening through fromiter avoids building a nested array first
+    flat = np.fromiter(chain.from_iterable(submissions), dtype=np.int64, count=len(submissions) * question_count)
+    return flat.reshape(len(submissions), question_count)
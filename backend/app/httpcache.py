@@ -0,0 +1,92 @@
+import hashlib
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+from fastapi import Depends, Request, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class NotModified(Exception):
+    def __init__(self, headers: Dict[str, str]):
+        self.headers = headers
+
+
+async def _same_for_everyone() -> str:
+    return ""
+
+
+def conditional(
+    *collections: str,
+    max_age: int = 0,
+    vary: Callable[..., Awaitable[str]] = _same_for_everyone,
+):
+    """Dependency making a read route conditional on collection revisions.
+
+    The ETag is derived from the request path and query plus the current
+    revision of every collection the route reads, so it changes whenever a
+    write could have changed the body. `vary` is a dependency whose value
+    is mixed in too, e.g. the current user for per-user bodies. A matching
+    If-None-Match ends the request with 304 before the handler runs.
+    Otherwise the revisions are left in `request.state.revisions` so the
+    handler's cache reads skip bodies older than the ETag.
+    """
+    if max_age:
+        cache_control = f"private, max-age={max_age}"
+    else:
+        cache_control = "private, no-cache"
+
+    async def check_revisions(request: Request, variant: str = Depends(vary)) -> None:
+        revisions = await request.app.state.storage.revisions(collections)
+        etag = make_etag(request.url.path, request.url.query, revisions, variant)
+        headers = {"ETag": etag, "Cache-Control": cache_control}
+        request.state.cache_headers = headers
+        request.state.revisions = dict(zip(collections, revisions))
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            raise NotModified(headers)
+
+    return check_revisions
+
+
+def make_etag(path: str, query: str, revisions: Iterable[int], variant: str = "") -> str:
+    key = f"{path}?{query}|{','.join(map(str, revisions))}|{variant}"
+    return '"' + hashlib.sha1(key.encode()).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
+
+
+async def not_modified_handler(request: Request, exc: NotModified) -> Response:
+    return Response(status_code=304, headers=exc.headers)
+
+
+class CacheHeadersMiddleware:
+    """Adds the ETag and Cache-Control computed by `conditional` to 200 responses.
+
+    Routes that return their own Response objects bypass FastAPI's injected
+    response headers, so the headers are attached at the ASGI level instead.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = scope.get("state", {}).get("cache_headers")
+                if headers:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (name.lower().encode(), value.encode()) for name, value in headers.items()
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
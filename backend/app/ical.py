@@ -0,0 +1,78 @@
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterable, List
+
+PRODID = "-//Canvas Student Remake//Calendar//EN"
+UID_DOMAIN = "canvas-remake"
+# Events serialized into each chunk of a streamed feed
+CHUNK_EVENTS = 200
+
+
+def escape_text(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold(line: str) -> str:
+    """A content line with CRLF, folded so no physical line exceeds 75 octets."""
+    if len(line.encode()) <= 75:
+        return line + "\r\n"
+    parts: List[str] = []
+    current: List[str] = []
+    size, limit = 0, 75
+    for char in line:
+        width = len(char.encode())
+        if size + width > limit:
+            parts.append("".join(current))
+            # Continuation lines start with a space, which counts too
+            current, size, limit = [], 0, 74
+        current.append(char)
+        size += width
+    parts.append("".join(current))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def format_datetime(value: datetime) -> str:
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    # Naive times are exported as floating local times
+    return value.strftime("%Y%m%dT%H%M%S")
+
+
+def vevent(event: dict, stamp: str) -> str:
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{event['id']}@{UID_DOMAIN}",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART:{format_datetime(event['start_time'])}",
+        f"DTEND:{format_datetime(event['end_time'])}",
+        f"SUMMARY:{escape_text(event['title'])}",
+    ]
+    if event.get("location"):
+        lines.append(f"LOCATION:{escape_text(event['location'])}")
+    if event.get("description"):
+        lines.append(f"DESCRIPTION:{escape_text(event['description'])}")
+    if event.get("course_id"):
+        lines.append(f"CATEGORIES:{escape_text(event['course_id'])}")
+    if event.get("recurrence"):
+        lines.append(f"RRULE:{event['recurrence']}")
+    lines.append("END:VEVENT")
+    return "".join(map(fold, lines))
+
+
+async def ics_stream(events: Iterable[dict]) -> AsyncIterator[bytes]:
+    """iCalendar feed for `events`, serialized a chunk of events at a time."""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield ("BEGIN:VCALENDAR\r\nVERSION:2.0\r\n" + fold(f"PRODID:{PRODID}") + "CALSCALE:GREGORIAN\r\n").encode()
+    chunk: List[str] = []
+    for event in events:
+        chunk.append(vevent(event, stamp))
+        if len(chunk) == CHUNK_EVENTS:
+            yield "".join(chunk).encode()
+            chunk = []
+    chunk.append("END:VCALENDAR\r\n")
+    yield "".join(chunk).encode()
@@ -0,0 +1,52 @@
+import base64
+import os
+import threading
+import time
+
+RANDOM_BITS = 80
+# Crockford's base32 is in ascending order, so encoded IDs sort like their values
+_TO_CROCKFORD = bytes.maketrans(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ234567", b"0123456789ABCDEFGHJKMNPQRSTVWXYZ")
+
+
+class IdGenerator:
+    """Time-ordered, collision-free IDs in the ULID format.
+
+    An ID is a 48-bit millisecond timestamp followed by 80 random bits,
+    written as 26 base32 characters, so IDs sort in creation order. IDs
+    made in the same millisecond by one process count up from the last
+    one and stay strictly increasing. Processes never coordinate: with 80
+    random bits per millisecond a collision between workers is negligible.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._last_random = 0
+
+    def new(self) -> str:
+        with self._lock:
+            ms = time.time_ns() // 1_000_000
+            if ms > self._last_ms:
+                random = int.from_bytes(os.urandom(RANDOM_BITS // 8), "big")
+            else:
+                # Same millisecond, or the clock stepped back: continue from the last ID
+                ms, random = self._last_ms, self._last_random + 1
+                if random >> RANDOM_BITS:
+                    ms, random = ms + 1, 0
+            self._last_ms, self._last_random = ms, random
+        value = (ms << RANDOM_BITS) | random
+        # 20 bytes encode to 32 characters; the first 6 only hold zero bits
+        return base64.b32encode(value.to_bytes(20, "big"))[6:].translate(_TO_CROCKFORD).decode()
+
+    def reset(self) -> None:
+        # A forked worker must not continue its parent's sequence
+        self.__init__()
+
+
+_generator = IdGenerator()
+os.register_at_fork(after_in_child=_generator.reset)
+
+
+def new_id(prefix: str = "") -> str:
+    """A new time-ordered ID, e.g. `new_id("disc")` -> "disc_01J9ZQ4Y0M8V3K2T6W5XNB7RHD"."""
+    return f"{prefix}_{_generator.new()}" if prefix else _generator.new()
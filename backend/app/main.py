@@ -1,17 +1,206 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+import env  # noqa: F401  (first: loads .env before other modules read settings)
+from fastapi import FastAPI, Body, Depends, Header, HTTPException, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Any, Dict, List, Literal, Optional
+from contextlib import asynccontextmanager
+from importlib import import_module
+import asyncio
+import logging
 import os
-from dotenv import load_dotenv
+import orjson
 
-# Load environment variables
-load_dotenv()
+from attachments import (
+    MAX_BYTES,
+    BlobStore,
+    PartialWrite,
+    TooLarge,
+    attachment_response,
+    limited,
+    open_blob_store,
+    rechunk,
+    upload_lock,
+)
+from attempts import (
+    ATTEMPT_CLAIM_TIMEOUT_SECONDS,
+    ATTEMPTS_COLLECTION,
+    GRADING,
+    IN_PROGRESS,
+    QuizSessions,
+    attempt_id,
+    grading_answers,
+    split_by_quiz,
+)
+from batch import MAX_BATCH_REQUESTS, run_batch
+from auth import InvalidToken, TokenVerifier, jwt_secret, verify_password
+from bulk import JOBS_COLLECTION, export_ndjson, import_ndjson
+from cache import EncodedCache, RevisionedCache, open_shared_cache
+from compression import CompressionMiddleware, Compressor
+from dataloader import batching_storage
+from eventcalendar import MAX_RANGE, EventCalendar, Recurrence, build_event_calendar
+from gradebook import SUBMISSIONS_COLLECTION, count_submissions, quiz_stats, record_submissions
+from grading import GradingEngine, answer_matrix
+from ical import ics_stream
+from ids import new_id
+from metrics import PROMETHEUS_CONTENT_TYPE, Metrics, MetricsMiddleware, TimedRoute, open_metrics
+from httpcache import CacheHeadersMiddleware, NotModified, conditional, not_modified_handler
+from pagination import NEXT_CURSOR_HEADER, PageParams, page_params, paginate
+from pubsub import ANNOUNCEMENTS_TOPIC, Broker, course_topic, post_topic
+from seeding import seed_storage
+from search import INDEXED, SearchIndex, build_search_index, index_document, save_search_index
+from serialization import JSONBytesResponse, encoded_list, encoded_one
+from storage import COLLECTIONS, Storage, open_storage
+from throttling import (
+    LoadShedder,
+    RateLimiter,
+    ThrottlingMiddleware,
+    open_rate_limit_store,
+    parse_rate_limit,
+)
+from timeline import Timeline, build_timeline, naive
+from users import (
+    assignment_status_id,
+    enrollment_id,
+    is_enrolled,
+    is_teacher,
+    user_course_ids,
+    with_assignment_statuses,
+)
+
+# Per-client budgets for expensive or abuse-prone routes, on top of the
+# default budget every client gets across all routes
+ROUTE_RATE_LIMITS = {
+    ("POST", "/token"): parse_rate_limit(os.getenv("RATE_LIMIT_LOGIN", "10/60")),
+    ("POST", "/quizzes/{quiz_id}/submit"): parse_rate_limit(os.getenv("RATE_LIMIT_QUIZ_SUBMIT", "10/60")),
+    ("POST", "/quizzes/{quiz_id}/attempt/submit"): parse_rate_limit(os.getenv("RATE_LIMIT_QUIZ_SUBMIT", "10/60")),
+    ("POST", "/quizzes/{quiz_id}/submit:batch"): parse_rate_limit(os.getenv("RATE_LIMIT_QUIZ_SUBMIT_BATCH", "30/60")),
+    ("POST", "/courses/{course_id}/discussions"): parse_rate_limit(os.getenv("RATE_LIMIT_NEW_DISCUSSION", "5/60")),
+}
+
+def observe_state(metrics: Metrics, state) -> None:
+    # Counters kept by the caches, limiter and shedder, read on each scrape
+    observe = metrics.registry.observe
+    observe("event_loop_lag_seconds", "gauge", "Event loop lag sampled by the load shedder", lambda: state.load_shedder.lag)
+    observe("load_shed_total", "counter", "Requests turned away with 503", lambda: state.load_shedder.shed)
+    observe("rate_limited_total", "counter", "Requests turned away with 429", lambda: state.rate_limiter.limited)
+    observe("encoded_cache_entries", "gauge", "Bodies in this worker's encoded cache", lambda: len(state.encoded_cache))
+    observe(
+        "encoded_cache_events_total",
+        "counter",
+        "Encoded cache hits, misses, evictions and other events",
+        lambda: state.encoded_cache.stats.as_dict(),
+        labels=("event",),
+    )
+    observe(
+        "token_cache_lookups_total",
+        "counter",
+        "Access token verifications by claims cache result",
+        lambda: {"hit": state.tokens.hits, "miss": state.tokens.misses},
+        labels=("result",),
+    )
+    observe(
+        "compression_events_total",
+        "counter",
+        "Responses compressed, served from the compressed cache or left uncompressed",
+        lambda: state.compressor.stats.events(),
+        labels=("event",),
+    )
+    observe(
+        "compression_bytes_total",
+        "counter",
+        "Response body bytes before and after compression",
+        lambda: {"in": state.compressor.stats.bytes_in, "out": state.compressor.stats.bytes_out},
+        labels=("stage",),
+    )
+    observe("compression_seconds_total", "counter", "Time spent compressing response bodies", lambda: state.compressor.stats.seconds)
+    observe("quiz_attempts_open", "gauge", "Quiz attempts this worker keeps open", lambda: len(state.quiz_sessions))
+    observe(
+        "quiz_attempt_events_total",
+        "counter",
+        "Attempts submitted on expiry, answers autosaved and autosave flushes",
+        lambda: {
+            "expired": state.quiz_sessions.expired,
+            "autosave": state.quiz_sessions.saves,
+            "flush": state.quiz_sessions.flushes,
+        },
+        labels=("event",),
+    )
+
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Canvas Student API")
+# Entities per collection encoded into the cache right after startup
+WARM_CACHE_ENTITIES = int(os.getenv("WARM_CACHE_ENTITIES", "1000"))
 
+async def warm_caches(state) -> None:
+    # Runs once the app is serving, so the first requests after a cold start
+    # find JWT support imported, bodies encoded and quizzes compiled
+    try:
+        await asyncio.to_thread(import_module, "jose.jwt")
+        storage = state.storage
+        for collection, model in (("courses", Course), ("assignments", Assignment), ("quizzes", Quiz)):
+            # Read before loading, so warmed bodies are not skipped by requests at this revision
+            revisions = {collection: (await storage.revisions([collection]))[0]}
+            keys = [key for _, key in await storage.find_keys(collection, limit=WARM_CACHE_ENTITIES)]
+            await encoded_list(storage, state.encoded_cache.at(revisions), collection, model, keys)
+            if collection == "quizzes":
+                for key in keys:
+                    await state.grading.compiled(storage, key)
+    except Exception:
+        logger.exception("Cache warm-up failed")
+
+# Users allowed to bulk import and export, e.g. "admin1,admin2"
+ADMIN_USERS = frozenset(filter(None, os.getenv("ADMIN_USERS", "").split(",")))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One storage backend (and connection pool) shared by every request
+    storage = await open_storage()
+    await seed_storage(storage, os.getenv("SEED_SNAPSHOT_PATH"))
+    app.state.storage = storage
+    app.state.blobs = open_blob_store()
+    app.state.encoded_cache = EncodedCache(open_shared_cache())
+    app.state.compressor = Compressor()
+    app.state.timeline = await build_timeline(storage)
+    app.state.calendar = await build_event_calendar(storage)
+    app.state.broker = Broker()
+    app.state.grading = GradingEngine()
+    app.state.quiz_sessions = QuizSessions(storage, lambda attempt_ids: expire_attempts(app.state, attempt_ids))
+    app.state.tokens = TokenVerifier(jwt_secret())
+    app.state.rate_limiter = RateLimiter(open_rate_limit_store(), routes=ROUTE_RATE_LIMITS)
+    app.state.load_shedder = LoadShedder()
+    app.state.metrics = open_metrics()
+    observe_state(app.state.metrics, app.state)
+    search_snapshot = os.getenv("SEARCH_SNAPSHOT_PATH")
+    app.state.search = await build_search_index(storage, search_snapshot)
+    await app.state.broker.start()
+    await app.state.load_shedder.start()
+    await app.state.quiz_sessions.start()
+    warming = asyncio.create_task(warm_caches(app.state))
+    yield
+    warming.cancel()
+    await app.state.quiz_sessions.close()
+    await app.state.load_shedder.close()
+    if search_snapshot:
+        await save_search_index(app.state.search, storage, search_snapshot)
+    await app.state.broker.close()
+    await app.state.encoded_cache.close()
+    await app.state.rate_limiter.close()
+    await app.state.blobs.close()
+    await storage.close()
+
+# Responses that stay open for minutes: timed to the first byte, not
+# counted as in flight and never run inside a batch
+STREAMING_PATHS = ["/stream", "/events.ics"]
+
+app = FastAPI(title="Canvas Student API", lifespan=lifespan, default_response_class=ORJSONResponse)
+# Separates time in route functions from response validation and encoding
+app.router.route_class = TimedRoute
+
+# Added before CORS so 429 and 503 responses still carry CORS headers
+app.add_middleware(ThrottlingMiddleware, streaming=STREAMING_PATHS, exempt=["/", "/metrics"])
 # Add CORS middleware to allow frontend to communicate with backend
 app.add_middleware(
     CORSMiddleware,
@@ -24,7 +213,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Retry-After", "Content-Range", "Upload-Offset"],
 )
+app.add_middleware(CacheHeadersMiddleware)
+# Outside CacheHeadersMiddleware, so compressed bodies can be cached by ETag
+app.add_middleware(CompressionMiddleware)
+# Outermost, so throttled and failed requests are recorded too
+app.add_middleware(MetricsMiddleware, streaming=STREAMING_PATHS, exempt=["/metrics"])
+app.add_exception_handler(NotModified, not_modified_handler)
 
 # Models
 class Course(BaseModel):
@@ -36,11 +232,6 @@ class Course(BaseModel):
     term: Optional[str] = None
     description: Optional[str] = None
 
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
-
 class Assignment(BaseModel):
     id: str
     course_id: str
@@ -49,11 +240,6 @@ class Assignment(BaseModel):
     points: Optional[int] = None
     status: Optional[str] = None  # "graded", "submitted", "not submitted"
     description: Optional[str] = None
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
 class Event(BaseModel):
     id: str
@@ -63,11 +249,17 @@ class Event(BaseModel):
     location: Optional[str] = None
     course_id: Optional[str] = None
     description: Optional[str] = None
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    recurrence: Optional[str] = None  # iCalendar RRULE, e.g. "FREQ=WEEKLY;COUNT=10"
+
+    @model_validator(mode="after")
+    def check_recurrence(self) -> "Event":
+        # A rule the calendar cannot expand is rejected before it is stored
+        if self.recurrence:
+            try:
+                Recurrence.parse(self.recurrence).last_start(self.start_time)
+            except (OverflowError, TypeError):
+                raise ValueError("Recurrence series is out of range")
+        return self
 
 class Announcement(BaseModel):
     id: str
@@ -75,11 +267,6 @@ class Announcement(BaseModel):
     title: str
     content: str
     date: datetime
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
 class DiscussionPost(BaseModel):
     id: str
@@ -89,11 +276,6 @@ class DiscussionPost(BaseModel):
     author: str
     created_at: datetime
     replies_count: int = 0
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
 class DiscussionReply(BaseModel):
     id: str
@@ -101,11 +283,6 @@ class DiscussionReply(BaseModel):
     content: str
     author: str
     created_at: datetime
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
 class QuizQuestion(BaseModel):
     id: str
@@ -123,646 +300,1177 @@ class Quiz(BaseModel):
     time_limit_minutes: Optional[int] = None
     questions: List[QuizQuestion]
     total_points: int
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
 class QuizSubmission(BaseModel):
+    id: str
     quiz_id: str
     student_id: str
+    # -1 for questions a timed attempt left unanswered
     answers: List[int]
     score: Optional[float] = None
     submitted_at: datetime
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
-
-# Sample data with funny content
-sample_courses = [
-    Course(
-        id="MEME-420",
-        code="MEME-420",
-        name="Advanced Memeology",
-        color="#4682b4",
-        section="Section 69",
-        term="Spring 2025",
-        description="A comprehensive study of internet culture, focusing on the evolution of memes from Doge to modern TikTok trends."
-    ),
-    Course(
-        id="NAPS-303",
-        code="NAPS-303",
-        name="Strategic Napping Techniques",
-        color="#32cd32",
-        section="Section ZZZ",
-        term="Spring 2025",
-        description="Master the art of sleeping through meetings while appearing attentive. Special focus on Zoom camera angles."
-    ),
-    Course(
-        id="PROCR-101",
-        code="PROCR-101",
-        name="Professional Netflix Binging",
-        color="#6a5acd",
-        section="Section 404",
-        term="Spring 2025",
-        description="Learn to optimize your streaming schedule while maintaining the illusion of productivity."
-    ),
-    Course(
-        id="PIZZA-505",
-        code="PIZZA-505",
-        name="Advanced Pizza Studies",
-        color="#dc143c",
-        section="Section NOM",
-        term="Spring 2025",
-        description="Explore the controversial topics in pizza culture, including the ongoing pineapple debate and optimal crust thickness."
-    )
-]
-
-sample_assignments = [
-    Assignment(
-        id="hw1",
-        course_id="PROCR-101",
-        title="Binge Watch Entire Series of The Office",
-        due_date=datetime.now() + timedelta(days=1),
-        points=69,
-        status="not submitted",
-        description="Watch all seasons of The Office and analyze the evolution of Michael Scott's management style."
-    ),
-    Assignment(
-        id="hw2",
-        course_id="MEME-420",
-        title="Create a Viral Cat Meme Portfolio",
-        due_date=datetime.now() + timedelta(hours=4),
-        points=42,
-        status="graded",
-        description="Curate and analyze a collection of cat memes. Bonus points for including Grumpy Cat references."
-    ),
-    Assignment(
-        id="hw4",
-        course_id="NAPS-303",
-        title="Perfect the Art of Looking Awake in Zoom Meetings",
-        due_date=datetime.now() + timedelta(days=2),
-        points=50,
-        status="not submitted",
-        description="Develop and demonstrate techniques for appearing alert while actually sleeping during virtual meetings."
-    ),
-    Assignment(
-        id="hw6",
-        course_id="PIZZA-505",
-        title="Debate: Pineapple on Pizza Ethics",
-        due_date=datetime.now() + timedelta(hours=6),
-        points=75,
-        status="submitted",
-        description="Present a scholarly argument for or against pineapple as a pizza topping. Citations required."
-    )
-]
-
-sample_events = [
-    Event(
-        id="event1",
-        title="Emergency Meme Review",
-        start_time=datetime.now() + timedelta(days=1, hours=2),
-        end_time=datetime.now() + timedelta(days=1, hours=4),
-        location="Virtual Meme Lab",
-        course_id="MEME-420",
-        description="Urgent analysis of viral cat videos. Bring your best reaction GIFs."
-    ),
-    Event(
-        id="event2",
-        title="Advanced Napping Workshop",
-        start_time=datetime.now() + timedelta(days=2),
-        end_time=datetime.now() + timedelta(days=2, hours=3),
-        location="Comfy Couch Auditorium",
-        course_id="NAPS-303",
-        description="Learn to perfect the art of sleeping with your eyes open during Zoom calls."
-    ),
-    Event(
-        id="event3",
-        title="Pizza vs Pineapple Debate",
-        start_time=datetime.now() + timedelta(days=3),
-        end_time=datetime.now() + timedelta(days=3, hours=2),
-        location="Virtual Pizza Kitchen",
-        course_id="PIZZA-505",
-        description="A heated debate on the controversial topic of pineapple on pizza. Snacks provided (no pineapples allowed)."
-    ),
-    Event(
-        id="event4",
-        title="Netflix Marathon Training",
-        start_time=datetime.now() + timedelta(days=4),
-        end_time=datetime.now() + timedelta(days=4, hours=8),
-        location="Your Favorite Couch",
-        course_id="PROCR-101",
-        description="Endurance training for binge-watching. BYOS (Bring Your Own Snacks)."
-    )
-]
-
-sample_announcements = [
-    Announcement(
-        id="ann1",
-        source="DEPARTMENT OF MEMEOLOGY",
-        title="URGENT: New Meme Format Just Dropped",
-        content="Students are required to study the latest viral cat meme for tomorrow's surprise meme quiz. Extra credit for anyone who can make their professor laugh with a SpongeBob reference.",
-        date=datetime.now() - timedelta(hours=2)
-    ),
-    Announcement(
-        id="ann2",
-        source="PROCRASTINATION STUDIES",
-        title="Deadline Extension Workshop: How to Ask for More Time",
-        content="Join us for an interactive workshop on crafting the perfect 'my dog ate my homework' email. Guest speaker: That one student who's never turned anything in on time but somehow has an A.",
-        date=datetime.now() - timedelta(hours=1)
-    ),
-    Announcement(
-        id="ann3",
-        source="CRAFT BEER STUDIES",
-        title="Important: Beer Tasting Lab Rescheduled",
-        content="Due to the professor's unexpected hangover, today's beer tasting lab will be moved to tomorrow. Remember to bring your designated driver permission slips.",
-        date=datetime.now() - timedelta(minutes=30)
-    )
-]
-
-# Add sample discussions
-sample_discussions = [
-    # Memeology Discussions
-    DiscussionPost(
-        id="disc1",
-        course_id="MEME-420",
-        title="The Philosophy of Doge",
-        content="Much discuss, very academic. What makes a meme truly timeless? Let's analyze the staying power of Doge.",
-        author="Meme Scholar",
-        created_at=datetime.now() - timedelta(days=2),
-        replies_count=2
-    ),
-    DiscussionPost(
-        id="disc2",
-        course_id="MEME-420",
-        title="Evolution of SpongeBob Memes",
-        content="From 'Imagination' to 'Mocking SpongeBob', let's trace the evolution of SpongeBob's impact on meme culture.",
-        author="Bikini Bottom Researcher",
-        created_at=datetime.now() - timedelta(days=1),
-        replies_count=1
-    ),
-    DiscussionPost(
-        id="disc3",
-        course_id="MEME-420",
-        title="Cat Memes: A Scientific Classification",
-        content="Proposing a new taxonomy for categorizing cat memes. From Grumpy Cat to Keyboard Cat, where do they all fit?",
-        author="Feline Memeologist",
-        created_at=datetime.now() - timedelta(hours=5),
-        replies_count=4
-    ),
-    
-    # Napping Discussions
-    DiscussionPost(
-        id="disc4",
-        course_id="NAPS-303",
-        title="Best Positions for Zoom Naps",
-        content="Share your tried and tested positions for looking engaged while actually sleeping.",
-        author="Professional Napper",
-        created_at=datetime.now() - timedelta(days=1),
-        replies_count=3
-    ),
-    DiscussionPost(
-        id="disc5",
-        course_id="NAPS-303",
-        title="Advanced Camera Angle Techniques",
-        content="How to position your camera to maximize nap potential while maintaining the illusion of attention.",
-        author="Zoom Master",
-        created_at=datetime.now() - timedelta(hours=8),
-        replies_count=2
-    ),
-    
-    # Netflix Binging Discussions
-    DiscussionPost(
-        id="disc6",
-        course_id="PROCR-101",
-        title="Optimal Snack Placement for Marathon Sessions",
-        content="Strategic snack positioning can make or break a binge session. Let's discuss optimal layouts.",
-        author="Snack Strategist",
-        created_at=datetime.now() - timedelta(hours=12),
-        replies_count=5
-    ),
-    DiscussionPost(
-        id="disc7",
-        course_id="PROCR-101",
-        title="The Psychology of 'One More Episode'",
-        content="Analyzing the cognitive mechanisms behind the 'just one more episode' phenomenon.",
-        author="Binge Psychologist",
-        created_at=datetime.now() - timedelta(hours=3),
-        replies_count=2
-    ),
-    
-    # Pizza Studies Discussions
-    DiscussionPost(
-        id="disc8",
-        course_id="PIZZA-505",
-        title="Pineapple on Pizza: A Scientific Analysis",
-        content="Let's settle this debate once and for all with empirical evidence.",
-        author="Pizza Scientist",
-        created_at=datetime.now() - timedelta(hours=12),
-        replies_count=1
-    ),
-    DiscussionPost(
-        id="disc9",
-        course_id="PIZZA-505",
-        title="The Perfect Crust-to-Sauce Ratio",
-        content="A mathematical approach to optimizing the fundamental pizza equation.",
-        author="Pizza Mathematician",
-        created_at=datetime.now() - timedelta(hours=6),
-        replies_count=3
-    )
-]
-
-# Add sample discussion replies
-sample_discussion_replies = [
-    # Memeology Replies
-    DiscussionReply(
-        id="reply1",
-        post_id="disc1",
-        content="Wow, such insight, very academic!",
-        author="Doge Fan",
-        created_at=datetime.now() - timedelta(days=1)
-    ),
-    DiscussionReply(
-        id="reply2",
-        post_id="disc1",
-        content="I believe the key to Doge's longevity lies in its versatility.",
-        author="Meme Historian",
-        created_at=datetime.now() - timedelta(hours=12)
-    ),
-    DiscussionReply(
-        id="reply3",
-        post_id="disc2",
-        content="The transition from reaction images to meta-commentary was fascinating.",
-        author="Meme Anthropologist",
-        created_at=datetime.now() - timedelta(hours=6)
-    ),
-    
-    # Napping Replies
-    DiscussionReply(
-        id="reply4",
-        post_id="disc4",
-        content="The classic 'thoughtful nodding while sleeping' technique never fails.",
-        author="Sleep Expert",
-        created_at=datetime.now() - timedelta(hours=6)
-    ),
-    DiscussionReply(
-        id="reply5",
-        post_id="disc5",
-        content="Pro tip: Slightly tilted camera angle suggests deep contemplation.",
-        author="Nap Architect",
-        created_at=datetime.now() - timedelta(hours=2)
-    ),
-    
-    # Netflix Replies
-    DiscussionReply(
-        id="reply6",
-        post_id="disc6",
-        content="The 'snack radius' theory changed my binging game completely!",
-        author="Couch Potato PhD",
-        created_at=datetime.now() - timedelta(hours=4)
-    ),
-    
-    # Pizza Replies
-    DiscussionReply(
-        id="reply7",
-        post_id="disc8",
-        content="Your control group needs a blind taste test to be valid.",
-        author="Statistical Pizza Expert",
-        created_at=datetime.now() - timedelta(hours=3)
-    )
-]
-
-# Add sample quizzes
-sample_quizzes = [
-    # Memeology Quizzes
-    Quiz(
-        id="quiz1",
-        course_id="MEME-420",
-        title="Meme History 101",
-        description="Test your knowledge of classic memes",
-        due_date=datetime.now() + timedelta(days=7),
-        time_limit_minutes=30,
-        questions=[
-            QuizQuestion(
-                id="q1",
-                question="What year did the 'Doge' meme first appear?",
-                options=["2010", "2013", "2015", "2017"],
-                correct_option=1,
-                points=5
-            ),
-            QuizQuestion(
-                id="q2",
-                question="Which platform popularized 'Rickrolling'?",
-                options=["4chan", "Reddit", "YouTube", "MySpace"],
-                correct_option=0,
-                points=5
-            ),
-            QuizQuestion(
-                id="q3",
-                question="Who was the original 'Grumpy Cat'?",
-                options=["Tardar Sauce", "Colonel Meow", "Lil Bub", "Maru"],
-                correct_option=0,
-                points=5
-            )
-        ],
-        total_points=15
-    ),
-    Quiz(
-        id="quiz2",
-        course_id="MEME-420",
-        title="Advanced Meme Analysis",
-        description="Demonstrate your understanding of complex meme evolution",
-        due_date=datetime.now() + timedelta(days=14),
-        time_limit_minutes=45,
-        questions=[
-            QuizQuestion(
-                id="q4",
-                question="Which factor most influences a meme's longevity?",
-                options=["Versatility", "Initial popularity", "Platform of origin", "Creator fame"],
-                correct_option=0,
-                points=10
-            ),
-            QuizQuestion(
-                id="q5",
-                question="What makes a crossover meme successful?",
-                options=[
-                    "Compatible contexts",
-                    "Similar popularity levels",
-                    "Same platform origin",
-                    "Matching color schemes"
-                ],
-                correct_option=0,
-                points=10
-            )
-        ],
-        total_points=20
-    ),
-    
-    # Napping Quizzes
-    Quiz(
-        id="quiz3",
-        course_id="NAPS-303",
-        title="Advanced Napping Techniques",
-        description="Prove your mastery of strategic napping",
-        due_date=datetime.now() + timedelta(days=3),
-        time_limit_minutes=20,
-        questions=[
-            QuizQuestion(
-                id="q6",
-                question="What's the optimal nap duration for maximum productivity?",
-                options=["10 minutes", "20 minutes", "30 minutes", "2 hours"],
-                correct_option=1,
-                points=10
-            ),
-            QuizQuestion(
-                id="q7",
-                question="Best position for appearing attentive during video calls?",
-                options=[
-                    "Chin resting on hand",
-                    "Leaning back thoughtfully",
-                    "Constant nodding",
-                    "Frequent position changes"
-                ],
-                correct_option=0,
-                points=10
-            )
-        ],
-        total_points=20
-    ),
-    
-    # Netflix Binging Quizzes
-    Quiz(
-        id="quiz4",
-        course_id="PROCR-101",
-        title="Binge-Watching Fundamentals",
-        description="Essential knowledge for professional streaming",
-        due_date=datetime.now() + timedelta(days=5),
-        time_limit_minutes=25,
-        questions=[
-            QuizQuestion(
-                id="q8",
-                question="Optimal break duration between episodes?",
-                options=["No breaks", "2 minutes", "5 minutes", "15 minutes"],
-                correct_option=1,
-                points=5
-            ),
-            QuizQuestion(
-                id="q9",
-                question="Best snack for minimal keyboard mess?",
-                options=["Popcorn", "Chips", "Chocolate", "Fruit slices"],
-                correct_option=3,
-                points=5
-            )
-        ],
-        total_points=10
-    ),
-    
-    # Pizza Studies Quizzes
-    Quiz(
-        id="quiz5",
-        course_id="PIZZA-505",
-        title="Pizza Theory Fundamentals",
-        description="Test your knowledge of pizza science",
-        due_date=datetime.now() + timedelta(days=5),
-        time_limit_minutes=45,
-        questions=[
-            QuizQuestion(
-                id="q10",
-                question="What is the ideal pizza crust thickness?",
-                options=["Thin as paper", "Medium", "Thick", "Chicago deep dish"],
-                correct_option=1,
-                points=5
-            ),
-            QuizQuestion(
-                id="q11",
-                question="At what temperature should pizza be baked?",
-                options=["350°F", "450°F", "650°F", "800°F"],
-                correct_option=2,
-                points=5
-            ),
-            QuizQuestion(
-                id="q12",
-                question="Most controversial pizza topping historically?",
-                options=["Pineapple", "Anchovies", "Chocolate", "Eggs"],
-                correct_option=0,
-                points=5
-            )
-        ],
-        total_points=15
-    )
-]
+
+class QuizAttempt(BaseModel):
+    id: str
+    quiz_id: str
+    course_id: str
+    student_id: str
+    # None for questions not answered yet
+    answers: List[Optional[int]]
+    status: Literal["in_progress", "grading", "submitted", "timed_out"] = IN_PROGRESS
+    started_at: datetime
+    # None when the quiz has no time limit
+    deadline: Optional[datetime] = None
+    saved_at: datetime
+    submission_id: Optional[str] = None
+
+class BatchSubmission(BaseModel):
+    student_id: str
+    answers: List[int]
+
+class User(BaseModel):
+    id: str
+    name: str
+    email: Optional[str] = None
+
+class Credential(BaseModel):
+    id: str  # user id
+    password_hash: str
+
+class Enrollment(BaseModel):
+    id: str  # "{user_id}:{course_id}"
+    user_id: str
+    course_id: str
+    role: str = "student"  # "student", "teacher"
+
+class AssignmentStatus(BaseModel):
+    id: str  # "{user_id}:{assignment_id}"
+    user_id: str
+    assignment_id: str
+    status: Literal["not submitted", "submitted", "graded"]
+    updated_at: datetime
+
+class Attachment(BaseModel):
+    id: str
+    parent_type: Literal["assignment", "discussion"]
+    parent_id: str  # assignment or discussion post id
+    course_id: str
+    filename: str
+    content_type: str
+    size: int
+    sha256: str  # content digest; identical files share one stored blob
+    uploaded_by: str
+    created_at: datetime
+
+class NewUpload(BaseModel):
+    parent_type: Literal["assignment", "discussion"]
+    parent_id: str
+    filename: str
+    content_type: str = "application/octet-stream"
+    size: int
+
+class Upload(BaseModel):
+    id: str
+    parent_type: Literal["assignment", "discussion"]
+    parent_id: str
+    course_id: str
+    filename: str
+    content_type: str
+    size: int
+    offset: int = 0  # bytes received so far
+    uploaded_by: str
+    created_at: datetime
+    attachment_id: Optional[str] = None  # set once the last byte is in
+
+class BatchedRequest(BaseModel):
+    url: str  # path and query of a GET route, e.g. "/discussions/disc1/replies?limit=20"
+
+class Batch(BaseModel):
+    requests: List[BatchedRequest]
+
+class BatchedResponse(BaseModel):
+    status: int
+    headers: Dict[str, str]  # ETag, Cache-Control, X-Next-Cursor and Retry-After
+    body: Any = None
+
+class BatchResults(BaseModel):
+    responses: List[BatchedResponse]  # in the order of the requests
+
+# Collections the bulk endpoints and CLI load, and the models validating
+# each line. Submissions are export only: importing them would bypass the
+# gradebook's statistics
+BULK_IMPORTS = {
+    "courses": Course,
+    "assignments": Assignment,
+    "events": Event,
+    "announcements": Announcement,
+    "discussions": DiscussionPost,
+    "discussion_replies": DiscussionReply,
+    "quizzes": Quiz,
+    "users": User,
+    "credentials": Credential,
+    "enrollments": Enrollment,
+    "assignment_statuses": AssignmentStatus,
+}
+# Password hashes never leave the server
+BULK_EXPORTS = (BULK_IMPORTS.keys() - {"credentials"}) | {"quiz_submissions"}
+# Collection holding each kind of attachment parent
+ATTACHMENT_PARENTS = {"assignment": "assignments", "discussion": "discussions"}
+TIMELINE_KINDS = {"assignments": "assignment", "events": "event", "announcements": "announcement"}
+
+async def get_storage(request: Request) -> Storage:
+    # Within a batch, reads made by concurrent sub-requests are coalesced
+    return batching_storage() or request.app.state.storage
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+async def get_token_verifier(request: Request) -> TokenVerifier:
+    return request.app.state.tokens
+
+async def get_claims(request: Request, token: str = Depends(oauth2_scheme)) -> dict:
+    # Runs on every authenticated request, so the verifier is read directly
+    # rather than through another dependency
+    try:
+        return request.app.state.tokens.verify(token)
+    except InvalidToken:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+async def get_current_user_id(claims: dict = Depends(get_claims)) -> str:
+    return claims["sub"]
+
+async def get_current_user(claims: dict = Depends(get_claims)) -> dict:
+    # Tokens carry the display name, so authoring needs no user lookup
+    return {"id": claims["sub"], "name": claims["name"]}
+
+async def get_encoded_cache(request: Request) -> RevisionedCache:
+    # At the revisions `conditional` built the ETag from, if the route has one
+    return request.app.state.encoded_cache.at(getattr(request.state, "revisions", {}))
+
+async def get_timeline(request: Request) -> Timeline:
+    return request.app.state.timeline
+
+async def get_calendar(request: Request) -> EventCalendar:
+    return request.app.state.calendar
+
+async def get_broker(request: Request) -> Broker:
+    return request.app.state.broker
+
+async def get_grading(request: Request) -> GradingEngine:
+    return request.app.state.grading
+
+async def get_quiz_sessions(request: Request) -> QuizSessions:
+    return request.app.state.quiz_sessions
+
+async def get_search(request: Request) -> SearchIndex:
+    return request.app.state.search
+
+async def get_blob_store(request: Request) -> BlobStore:
+    return request.app.state.blobs
+
+async def get_metrics(request: Request) -> Metrics:
+    return request.app.state.metrics
+
+async def get_admin_user_id(user_id: str = Depends(get_current_user_id)) -> str:
+    if user_id not in ADMIN_USERS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user_id
 
 # Routes
 @app.get("/")
 async def root():
     return {"message": "Canvas Student API is running"}
 
-@app.get("/courses", response_model=List[Course])
-async def get_courses():
-    return sample_courses
+@app.post("/token")
+async def login(
+    form: OAuth2PasswordRequestForm = Depends(),
+    storage: Storage = Depends(get_storage),
+    tokens: TokenVerifier = Depends(get_token_verifier),
+):
+    user = await storage.get("users", form.username, fields=("id", "name"))
+    credential = await storage.get("credentials", form.username, fields=("password_hash",))
+    # Always runs bcrypt, so unknown usernames take as long as wrong passwords
+    password_hash = credential["password_hash"] if user and credential else None
+    if not await verify_password(form.password, password_hash):
+        raise HTTPException(
+            status_code=401,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return {"access_token": tokens.issue(user["id"], user["name"]), "token_type": "bearer"}
 
-@app.get("/courses/{course_id}", response_model=Course)
-async def get_course(course_id: str):
-    for course in sample_courses:
-        if course.id == course_id:
-            return course
+@app.get("/courses", response_model=List[Course], dependencies=[Depends(conditional("courses"))])
+async def get_courses(
+    page: PageParams = Depends(page_params),
+    storage: Storage = Depends(get_storage),
+    cache: RevisionedCache = Depends(get_encoded_cache),
+):
+    return await paginate(storage, cache, "courses", Course, page)
+
+@app.get("/courses/{course_id}", response_model=Course, dependencies=[Depends(conditional("courses"))])
+async def get_course(
+    course_id: str,
+    storage: Storage = Depends(get_storage),
+    cache: RevisionedCache = Depends(get_encoded_cache),
+):
+    body = await encoded_one(storage, cache, "courses", Course, course_id)
+    if body:
+        return JSONBytesResponse(body)
     raise HTTPException(status_code=404, detail="Course not found")
 
-@app.get("/assignments", response_model=List[Assignment])
-async def get_assignments():
-    return sample_assignments
+@app.get("/assignments", response_model=List[Assignment], dependencies=[Depends(conditional("assignments"))])
+async def get_assignments(
+    page: PageParams = Depends(page_params),
+    storage: Storage = Depends(get_storage),
+    cache: RevisionedCache = Depends(get_encoded_cache),
+):
+    return await paginate(storage, cache, "assignments", Assignment, page)
 
-@app.get("/assignments/{assignment_id}", response_model=Assignment)
-async def get_assignment(assignment_id: str):
-    for assignment in sample_assignments:
-        if assignment.id == assignment_id:
-            return assignment
+@app.get(
+    "/assignments/{assignment_id}",
+    response_model=Assignment,
+    dependencies=[Depends(conditional("assignments"))],
+)
+async def get_assignment(
+    assignment_id: str,
+    storage: Storage = Depends(get_storage),
+    cache: RevisionedCache = Depends(get_encoded_cache),
+):
+    body = await encoded_one(storage, cache, "assignments", Assignment, assignment_id)
+    if body:
+        return JSONBytesResponse(body)
     raise HTTPException(status_code=404, detail="Assignment not found")
 
-@app.get("/events", response_model=List[Event])
-async def get_events():
-    return sample_events
+@app.get("/events", response_model=List[Event], dependencies=[Depends(conditional("events"))])
+async def get_events(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    course_id: Optional[str] = None,
+    page: PageParams = Depends(page_params),
+    storage: Storage = Depends(get_storage),
+    cache: RevisionedCache = Depends(get_encoded_cache),
+    calendar: EventCalendar = Depends(get_calendar),
+):
+    if start is None and end is None:
+        where = {"course_id": course_id} if course_id else None
+        return await paginate(storage, cache, "events", Event, page, where)
 
-@app.get("/announcements", response_model=List[Announcement])
-async def get_announcements():
-    return sample_announcements
+    # Calendar view: every occurrence overlapping the window, recurring
+    # events expanded only within it
+    if start is None or end is None:
+        raise HTTPException(status_code=400, detail="start and end must be given together")
+    start, end = naive(start), naive(end)
+    if end < start or end - start > MAX_RANGE:
+        raise HTTPException(status_code=400, detail=f"Range must be ordered and at most {MAX_RANGE.days} days")
+    return ORJSONResponse(calendar.window(start, end, course_id))
 
-@app.get("/dashboard")
-async def get_dashboard():
-    # Group items by date for the dashboard
-    today = datetime.now()
-    
-    # Organize events and assignments by date
-    dashboard = {
-        "courses": sample_courses,
-        "upcoming": []
-    }
-    
-    # Add assignments to upcoming items
-    for assignment in sample_assignments:
-        dashboard["upcoming"].append({
-            "type": "assignment",
-            "id": assignment.id,
-            "course_id": assignment.course_id,
-            "title": assignment.title,
-            "due_date": assignment.due_date.isoformat(),
-            "points": assignment.points,
-            "status": assignment.status
-        })
-        
-    # Add events to upcoming items
-    for event in sample_events:
-        dashboard["upcoming"].append({
-            "type": "event",
-            "id": event.id,
-            "title": event.title,
-            "start_time": event.start_time.isoformat(),
-            "end_time": event.end_time.isoformat(),
-            "location": event.location,
-            "course_id": event.course_id
-        })
-        
-    # Add announcements to upcoming items
-    for announcement in sample_announcements:
-        dashboard["upcoming"].append({
-            "type": "announcement",
-            "id": announcement.id,
-            "source": announcement.source,
-            "title": announcement.title,
-            "content": announcement.content,
-            "date": announcement.date.isoformat()
-        })
-    
-    # Sort all upcoming items by date
-    dashboard["upcoming"] = sorted(
-        dashboard["upcoming"],
-        key=lambda x: x.get("date") or x.get("due_date") or x.get("start_time")
+@app.get("/events.ics", dependencies=[Depends(conditional("events"))])
+async def export_events(
+    course_id: Optional[str] = None,
+    calendar: EventCalendar = Depends(get_calendar),
+):
+    # Recurring events are exported once with their RRULE
+    return StreamingResponse(ics_stream(calendar.events(course_id)), media_type="text/calendar")
+
+@app.put("/assignments/{assignment_id}/status", response_model=AssignmentStatus)
+async def set_assignment_status(
+    assignment_id: str,
+    status: Literal["not submitted", "submitted", "graded"],
+    user_id: str = Depends(get_current_user_id),
+    storage: Storage = Depends(get_storage),
+):
+    assignment = await storage.get("assignments", assignment_id, fields=("course_id",))
+    if not assignment:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    if not await is_enrolled(storage, user_id, assignment["course_id"]):
+        raise HTTPException(status_code=403, detail="Not enrolled in this course")
+
+    # Statuses are per user, so the shared assignment document is untouched
+    assignment_status = AssignmentStatus(
+        id=assignment_status_id(user_id, assignment_id),
+        user_id=user_id,
+        assignment_id=assignment_id,
+        status=status,
+        updated_at=datetime.now()
     )
-    
-    return dashboard
+    await storage.upsert("assignment_statuses", assignment_status)
+    return assignment_status
+
+@app.get(
+    "/announcements",
+    response_model=List[Announcement],
+    dependencies=[Depends(conditional("announcements"))],
+)
+async def get_announcements(
+    page: PageParams = Depends(page_params),
+    storage: Storage = Depends(get_storage),
+    cache: RevisionedCache = Depends(get_encoded_cache),
+):
+    return await paginate(storage, cache, "announcements", Announcement, page)
 
-@app.get("/courses/{course_id}/discussions", response_model=List[DiscussionPost])
-async def get_course_discussions(course_id: str):
-    discussions = [d for d in sample_discussions if d.course_id == course_id]
-    return discussions
+@app.get(
+    "/dashboard",
+    dependencies=[Depends(conditional(
+        "courses", "assignments", "events", "announcements", "enrollments", "assignment_statuses",
+        vary=get_current_user_id,
+    ))],
+)
+async def get_dashboard(
+    request: Request,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    limit: Optional[int] = Query(None, ge=1),
+    user_id: str = Depends(get_current_user_id),
+    storage: Storage = Depends(get_storage),
+    cache: RevisionedCache = Depends(get_encoded_cache),
+    timeline: Timeline = Depends(get_timeline),
+):
+    async def load() -> bytes:
+        course_ids = await user_course_ids(storage, user_id)
+        courses = await storage.get_many("courses", course_ids)
+        # Each course's items are kept sorted by date, so this is a k-way
+        # merge of one slice per enrolled course
+        upcoming = timeline.window(start, end, limit, course_ids)
+        return orjson.dumps({
+            "courses": sorted(courses, key=lambda course: course["id"]),
+            "upcoming": await with_assignment_statuses(storage, user_id, upcoming)
+        })
+
+    # The ETag covers the user, the query and the revisions of everything the
+    # dashboard reads, so a cached body never needs invalidating
+    etag = request.state.cache_headers["ETag"]
+    return JSONBytesResponse(await cache.get_or_load("dashboard", etag, load))
 
-@app.get("/discussions/{post_id}/replies", response_model=List[DiscussionReply])
-async def get_discussion_replies(post_id: str):
-    replies = [r for r in sample_discussion_replies if r.post_id == post_id]
-    return replies
+@app.get(
+    "/courses/{course_id}/discussions",
+    response_model=List[DiscussionPost],
+    dependencies=[Depends(conditional("discussions"))],
+)
+async def get_course_discussions(
+    course_id: str,
+    page: PageParams = Depends(page_params),
+    storage: Storage = Depends(get_storage),
+    cache: RevisionedCache = Depends(get_encoded_cache),
+):
+    return await paginate(storage, cache, "discussions", DiscussionPost, page, {"course_id": course_id})
+
+@app.get(
+    "/discussions/{post_id}/replies",
+    response_model=List[DiscussionReply],
+    dependencies=[Depends(conditional("discussion_replies"))],
+)
+async def get_discussion_replies(
+    post_id: str,
+    page: PageParams = Depends(page_params),
+    storage: Storage = Depends(get_storage),
+    cache: RevisionedCache = Depends(get_encoded_cache),
+):
+    return await paginate(storage, cache, "discussion_replies", DiscussionReply, page, {"post_id": post_id})
 
 @app.post("/courses/{course_id}/discussions", response_model=DiscussionPost)
-async def create_discussion(course_id: str, title: str, content: str):
+async def create_discussion(
+    course_id: str,
+    title: str,
+    content: str,
+    user: dict = Depends(get_current_user),
+    storage: Storage = Depends(get_storage),
+    broker: Broker = Depends(get_broker),
+    search: SearchIndex = Depends(get_search),
+):
+    if not await is_enrolled(storage, user["id"], course_id):
+        raise HTTPException(status_code=403, detail="Not enrolled in this course")
+
     new_post = DiscussionPost(
-        id=f"disc{len(sample_discussions) + 1}",
+        id=new_id("disc"),
         course_id=course_id,
         title=title,
         content=content,
-        author="Current User",  # In a real app, this would come from auth
+        author=user["name"],
         created_at=datetime.now(),
         replies_count=0
     )
-    sample_discussions.append(new_post)
+    await storage.insert("discussions", new_post)
+    index_document(search, "discussions", new_post.model_dump())
+    await broker.publish([course_topic(course_id)], "discussion.created", new_post.model_dump_json().encode())
     return new_post
 
 @app.post("/discussions/{post_id}/replies", response_model=DiscussionReply)
-async def create_reply(post_id: str, content: str):
+async def create_reply(
+    post_id: str,
+    content: str,
+    user: dict = Depends(get_current_user),
+    storage: Storage = Depends(get_storage),
+    cache: RevisionedCache = Depends(get_encoded_cache),
+    broker: Broker = Depends(get_broker),
+    search: SearchIndex = Depends(get_search),
+):
+    post = await storage.get("discussions", post_id, fields=("course_id",))
+    if not post:
+        raise HTTPException(status_code=404, detail="Discussion not found")
+    course_id = post["course_id"]
+    if not await is_enrolled(storage, user["id"], course_id):
+        raise HTTPException(status_code=403, detail="Not enrolled in this course")
+
     new_reply = DiscussionReply(
-        id=f"reply{len(sample_discussion_replies) + 1}",
+        id=new_id("reply"),
         post_id=post_id,
         content=content,
-        author="Current User",  # In a real app, this would come from auth
+        author=user["name"],
         created_at=datetime.now()
     )
-    sample_discussion_replies.append(new_reply)
+    await storage.insert("discussion_replies", new_reply)
     
-    # Update reply count
-    for post in sample_discussions:
-        if post.id == post_id:
-            post.replies_count += 1
-            break
+    # Update reply count with an atomic increment, so concurrent replies are never lost
+    await storage.increment("discussions", post_id, "replies_count")
+    await cache.invalidate("discussions", post_id)
+
+    index_document(search, "discussion_replies", new_reply.model_dump(), course_id)
+
+    # Notify subscribers of the thread and of the course it belongs to
+    topics = [post_topic(post_id), course_topic(course_id)]
+    await broker.publish(topics, "reply.created", new_reply.model_dump_json().encode())
             
     return new_reply
 
-@app.get("/courses/{course_id}/quizzes", response_model=List[Quiz])
-async def get_course_quizzes(course_id: str):
-    quizzes = [q for q in sample_quizzes if q.course_id == course_id]
-    return quizzes
+async def attachment_course(storage: Storage, user_id: str, parent_type: str, parent_id: str) -> str:
+    # Course of the assignment or post; only its members may attach to it
+    parent = await storage.get(ATTACHMENT_PARENTS[parent_type], parent_id, fields=("course_id",))
+    if not parent:
+        raise HTTPException(status_code=404, detail=f"{parent_type.capitalize()} not found")
+    if not await is_enrolled(storage, user_id, parent["course_id"]):
+        raise HTTPException(status_code=403, detail="Not enrolled in this course")
+    return parent["course_id"]
+
+async def check_grader(storage: Storage, user_id: str, course_id: Optional[str]) -> None:
+    # Grading on behalf of students and quiz statistics are for the
+    # course's teachers and admins
+    if user_id not in ADMIN_USERS and not await is_teacher(storage, user_id, course_id):
+        raise HTTPException(status_code=403, detail="Teacher access required")
+
+async def can_read_attachment(storage: Storage, user_id: str, attachment: dict) -> bool:
+    # Submissions are private to the student and the course's teachers;
+    # files on a discussion are visible to the whole course
+    if attachment["parent_type"] == "assignment" and attachment["uploaded_by"] != user_id:
+        return await is_teacher(storage, user_id, attachment["course_id"])
+    return await is_enrolled(storage, user_id, attachment["course_id"])
+
+async def create_attachment(storage: Storage, broker: Broker, **fields) -> Attachment:
+    attachment = Attachment(id=new_id("att"), created_at=datetime.now(), **fields)
+    await storage.insert("attachments", attachment)
+    if attachment.parent_type == "discussion":
+        topics = [post_topic(attachment.parent_id), course_topic(attachment.course_id)]
+        await broker.publish(topics, "attachment.created", attachment.model_dump_json().encode())
+    return attachment
+
+async def receive_attachment(
+    request: Request,
+    parent_type: str,
+    parent_id: str,
+    filename: str,
+    user_id: str,
+    storage: Storage,
+    blobs: BlobStore,
+    broker: Broker,
+) -> Attachment:
+    # The body is the file itself, streamed to the blob store as it arrives;
+    # a multipart form would be spooled to a temporary file first
+    course_id = await attachment_course(storage, user_id, parent_type, parent_id)
+    try:
+        declared = int(request.headers.get("content-length", "0"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Content-Length header")
+    if declared > MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Attachments are limited to {MAX_BYTES} bytes")
+    try:
+        sha256, size = await blobs.put(request.stream())
+    except TooLarge:
+        raise HTTPException(status_code=413, detail=f"Attachments are limited to {MAX_BYTES} bytes")
+    return await create_attachment(
+        storage,
+        broker,
+        parent_type=parent_type,
+        parent_id=parent_id,
+        course_id=course_id,
+        filename=filename,
+        content_type=request.headers.get("content-type", "application/octet-stream"),
+        size=size,
+        sha256=sha256,
+        uploaded_by=user_id,
+    )
+
+@app.post("/assignments/{assignment_id}/attachments", response_model=Attachment, status_code=201)
+async def upload_submission(
+    assignment_id: str,
+    filename: str,
+    request: Request,
+    user_id: str = Depends(get_current_user_id),
+    storage: Storage = Depends(get_storage),
+    blobs: BlobStore = Depends(get_blob_store),
+    broker: Broker = Depends(get_broker),
+):
+    return await receive_attachment(request, "assignment", assignment_id, filename, user_id, storage, blobs, broker)
+
+@app.post("/discussions/{post_id}/attachments", response_model=Attachment, status_code=201)
+async def upload_discussion_attachment(
+    post_id: str,
+    filename: str,
+    request: Request,
+    user_id: str = Depends(get_current_user_id),
+    storage: Storage = Depends(get_storage),
+    blobs: BlobStore = Depends(get_blob_store),
+    broker: Broker = Depends(get_broker),
+):
+    return await receive_attachment(request, "discussion", post_id, filename, user_id, storage, blobs, broker)
+
+@app.get(
+    "/assignments/{assignment_id}/attachments",
+    response_model=List[Attachment],
+    dependencies=[Depends(conditional("attachments", vary=get_current_user_id))],
+)
+async def get_submissions(
+    assignment_id: str,
+    page: PageParams = Depends(page_params),
+    user_id: str = Depends(get_current_user_id),
+    storage: Storage = Depends(get_storage),
+    cache: RevisionedCache = Depends(get_encoded_cache),
+):
+    course_id = await attachment_course(storage, user_id, "assignment", assignment_id)
+    where = {"parent_id": assignment_id, "parent_type": "assignment"}
+    if not await is_teacher(storage, user_id, course_id):
+        # Students see only their own submissions
+        where["uploaded_by"] = user_id
+    return await paginate(storage, cache, "attachments", Attachment, page, where)
+
+@app.get(
+    "/discussions/{post_id}/attachments",
+    response_model=List[Attachment],
+    dependencies=[Depends(conditional("attachments"))],
+)
+async def get_discussion_attachments(
+    post_id: str,
+    page: PageParams = Depends(page_params),
+    user_id: str = Depends(get_current_user_id),
+    storage: Storage = Depends(get_storage),
+    cache: RevisionedCache = Depends(get_encoded_cache),
+):
+    await attachment_course(storage, user_id, "discussion", post_id)
+    where = {"parent_id": post_id, "parent_type": "discussion"}
+    return await paginate(storage, cache, "attachments", Attachment, page, where)
+
+@app.get("/attachments/{attachment_id}")
+async def download_attachment(
+    attachment_id: str,
+    request: Request,
+    user_id: str = Depends(get_current_user_id),
+    storage: Storage = Depends(get_storage),
+    blobs: BlobStore = Depends(get_blob_store),
+):
+    # Supports Range and If-Range, so interrupted downloads resume and
+    # media can seek
+    attachment = await storage.get("attachments", attachment_id)
+    if not attachment or not await can_read_attachment(storage, user_id, attachment):
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    return attachment_response(blobs, attachment, request.headers)
+
+@app.post("/uploads", response_model=Upload, status_code=201)
+async def start_upload(
+    new_upload: NewUpload,
+    user_id: str = Depends(get_current_user_id),
+    storage: Storage = Depends(get_storage),
+):
+    # A resumable upload: the file is sent with PATCH in as many parts as
+    # the client likes, and after a dropped connection GET says where to
+    # continue from
+    if not 0 <= new_upload.size <= MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Attachments are limited to {MAX_BYTES} bytes")
+    course_id = await attachment_course(storage, user_id, new_upload.parent_type, new_upload.parent_id)
+    upload = Upload(
+        id=new_id("upl"),
+        course_id=course_id,
+        uploaded_by=user_id,
+        created_at=datetime.now(),
+        **new_upload.model_dump(),
+    )
+    await storage.insert("uploads", upload)
+    return upload
+
+async def get_own_upload(storage: Storage, user_id: str, upload_id: str) -> Upload:
+    upload = await storage.get("uploads", upload_id)
+    if not upload or upload["uploaded_by"] != user_id:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return Upload(**upload)
+
+@app.get("/uploads/{upload_id}", response_model=Upload)
+async def get_upload(
+    upload_id: str,
+    user_id: str = Depends(get_current_user_id),
+    storage: Storage = Depends(get_storage),
+):
+    return await get_own_upload(storage, user_id, upload_id)
+
+def offset_conflict(upload: Upload) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail=f"Upload is at offset {upload.offset}",
+        headers={"Upload-Offset": str(upload.offset)},
+    )
+
+@app.patch("/uploads/{upload_id}", response_model=Upload)
+async def append_upload(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., description="Bytes already received, from the upload's offset"),
+    user_id: str = Depends(get_current_user_id),
+    storage: Storage = Depends(get_storage),
+    blobs: BlobStore = Depends(get_blob_store),
+    broker: Broker = Depends(get_broker),
+):
+    async with upload_lock(upload_id):
+        upload = await get_own_upload(storage, user_id, upload_id)
+        if upload.attachment_id:
+            return upload
+        if upload_offset != upload.offset:
+            raise offset_conflict(upload)
+        body = rechunk(limited(request.stream(), upload.size - upload.offset))
+        try:
+            written = await blobs.write_part(upload_id, upload.offset, body)
+            error = None
+        except PartialWrite as e:
+            # Bytes that made it before a dropped connection still count
+            written, error = e.written, e.__cause__
+        # The lock only covers this worker, so the offset advances only from
+        # the one this part was written at; a part another worker finished
+        # first wins
+        if written and not await storage.update_if(
+            "uploads", upload_id, {"offset": upload.offset}, {"offset": upload.offset + written}
+        ):
+            upload = await get_own_upload(storage, user_id, upload_id)
+            raise offset_conflict(upload)
+        upload.offset += written
+        if isinstance(error, TooLarge):
+            raise HTTPException(status_code=413, detail=f"Upload is {upload.size} bytes in total")
+        if error is not None:
+            raise error
+
+        if upload.offset == upload.size:
+            sha256 = await blobs.finish(upload_id)
+            attachment = await create_attachment(
+                storage,
+                broker,
+                sha256=sha256,
+                **upload.model_dump(include={
+                    "parent_type", "parent_id", "course_id", "filename", "content_type", "size", "uploaded_by",
+                }),
+            )
+            upload.attachment_id = attachment.id
+            await storage.upsert("uploads", upload)
+    return upload
+
+async def refresh_derived(state, collection: str, docs: List[dict]) -> None:
+    # Bulk writes bypass the write routes, so bring this worker's caches and
+    # indexes up to date here. Only this worker's: the others see the import
+    # in the timeline, calendar and search once they restart
+    await state.encoded_cache.invalidate_many(collection, [doc["id"] for doc in docs])
+    if collection in TIMELINE_KINDS:
+        state.timeline.extend(TIMELINE_KINDS[collection], docs)
+    if collection == "events":
+        for doc in docs:
+            state.calendar.upsert(doc)
+    if collection in INDEXED:
+        post_courses = {}
+        if collection == "discussion_replies":
+            post_ids = {doc["post_id"] for doc in docs}
+            posts = await state.storage.get_many("discussions", post_ids, fields=("id", "course_id"))
+            post_courses = {post["id"]: post["course_id"] for post in posts}
+        for doc in docs:
+            index_document(state.search, collection, doc, post_courses.get(doc.get("post_id")))
+
+@app.post("/bulk/{collection}/import")
+async def bulk_import(
+    collection: str,
+    request: Request,
+    job: Optional[str] = None,
+    batch_size: int = Query(1000, ge=1, le=10000),
+    admin_id: str = Depends(get_admin_user_id),
+    storage: Storage = Depends(get_storage),
+):
+    # NDJSON body, parsed as it arrives; re-sending a file under the same
+    # job resumes after the last written batch
+    if collection not in BULK_IMPORTS:
+        raise HTTPException(status_code=404, detail="Collection cannot be imported")
 
-@app.get("/quizzes/{quiz_id}", response_model=Quiz)
-async def get_quiz(quiz_id: str):
-    for quiz in sample_quizzes:
-        if quiz.id == quiz_id:
-            return quiz
+    async def on_batch(collection: str, docs: List[dict]) -> None:
+        await refresh_derived(request.app.state, collection, docs)
+
+    result = await import_ndjson(
+        storage, collection, BULK_IMPORTS[collection], request.stream(), job, batch_size, on_batch
+    )
+    return result.as_dict()
+
+@app.get("/bulk/jobs/{job}")
+async def get_bulk_job(
+    job: str,
+    admin_id: str = Depends(get_admin_user_id),
+    storage: Storage = Depends(get_storage),
+):
+    progress = await storage.counters(JOBS_COLLECTION, job)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job": job, **progress}
+
+@app.get("/bulk/{collection}/export")
+async def bulk_export(
+    collection: str,
+    request: Request,
+    batch_size: int = Query(1000, ge=1, le=10000),
+    admin_id: str = Depends(get_admin_user_id),
+    storage: Storage = Depends(get_storage),
+):
+    # Indexed fields in the query filter the export, e.g. ?quiz_id=quiz1
+    # for one quiz's gradebook
+    if collection not in BULK_EXPORTS:
+        raise HTTPException(status_code=404, detail="Collection cannot be exported")
+    indexes = COLLECTIONS[collection].indexes
+    where = {name: value for name, value in request.query_params.items() if name in indexes}
+    return StreamingResponse(
+        export_ndjson(storage, collection, where or None, batch_size),
+        media_type="application/x-ndjson",
+    )
+
+@app.post("/batch", response_model=BatchResults)
+async def run_batched_requests(
+    batch: Batch,
+    request: Request,
+    storage: Storage = Depends(get_storage),
+):
+    # Sub-requests authenticate themselves with the forwarded Authorization
+    if not batch.requests or len(batch.requests) > MAX_BATCH_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"A batch holds 1 to {MAX_BATCH_REQUESTS} requests")
+    if any(not item.url.startswith("/") for item in batch.requests):
+        raise HTTPException(status_code=400, detail="Batched URLs must be paths on this API")
+    urls = [item.url for item in batch.requests]
+    responses = await run_batch(request.app, request.scope, storage, urls, streaming=STREAMING_PATHS)
+    # Bodies are already encoded, so they are spliced in rather than decoded
+    return JSONBytesResponse(b'{"responses":[' + b",".join(
+        b'{"status":%d,"headers":%s,"body":%s}' % (response.status, orjson.dumps(response.headers), response.body or b"null")
+        for response in responses
+    ) + b"]}")
+
+@app.get("/cache/stats")
+async def get_cache_stats(cache: RevisionedCache = Depends(get_encoded_cache)):
+    return {"entries": len(cache), **cache.stats.as_dict()}
+
+@app.get("/metrics", include_in_schema=False)
+async def export_metrics(metrics: Metrics = Depends(get_metrics)):
+    # Prometheus text format, scraped by the monitoring stack
+    return Response(metrics.registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.get("/search")
+async def search_content(
+    q: str = Query(..., min_length=1),
+    course_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    search: SearchIndex = Depends(get_search),
+):
+    # Ranked matches across discussions, replies, announcements and assignments
+    return search.search(q, course_id, limit)
+
+@app.get("/stream")
+async def stream_updates(
+    course_id: List[str] = Query([]),
+    post_id: List[str] = Query([]),
+    announcements: bool = False,
+    broker: Broker = Depends(get_broker),
+):
+    # Server-Sent Events for new posts and replies in the given courses and
+    # threads, plus announcements when requested
+    topics = [course_topic(c) for c in course_id] + [post_topic(p) for p in post_id]
+    if announcements:
+        topics.append(ANNOUNCEMENTS_TOPIC)
+    if not topics:
+        raise HTTPException(status_code=400, detail="Subscribe to at least one course, post or announcements")
+    return StreamingResponse(
+        broker.stream(topics),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get(
+    "/courses/{course_id}/quizzes",
+    response_model=List[Quiz],
+    dependencies=[Depends(conditional("quizzes"))],
+)
+async def get_course_quizzes(
+    course_id: str,
+    page: PageParams = Depends(page_params),
+    storage: Storage = Depends(get_storage),
+    cache: RevisionedCache = Depends(get_encoded_cache),
+):
+    return await paginate(storage, cache, "quizzes", Quiz, page, {"course_id": course_id})
+
+@app.get("/quizzes/{quiz_id}", response_model=Quiz, dependencies=[Depends(conditional("quizzes"))])
+async def get_quiz(
+    quiz_id: str,
+    storage: Storage = Depends(get_storage),
+    cache: RevisionedCache = Depends(get_encoded_cache),
+):
+    body = await encoded_one(storage, cache, "quizzes", Quiz, quiz_id)
+    if body:
+        return JSONBytesResponse(body)
     raise HTTPException(status_code=404, detail="Quiz not found")
 
+async def finish_attempts(
+    storage: Storage, grading: GradingEngine, attempts: List[QuizAttempt], status: str
+) -> Dict[str, QuizSubmission]:
+    """Grade and record claimed attempts, one batch per quiz; returns their submissions by attempt id.
+
+    Each attempt's submission takes the id reserved when it was claimed,
+    so grading a reclaimed attempt again rewrites the same submission, and
+    only the grading that moves the attempt out of `grading` counts it in
+    the quiz stats.
+    """
+    submitted_at = datetime.now()
+    submissions: Dict[str, QuizSubmission] = {}
+    for quiz_id, group in split_by_quiz(attempts).items():
+        quiz = await grading.compiled(storage, quiz_id)
+        if quiz is None:
+            # The quiz is gone, so there is nothing to grade against
+            await finish_claims(storage, group, status)
+            continue
+        rows = [grading_answers(attempt.answers, quiz.question_count) for attempt in group]
+        marked = quiz.mark(answer_matrix(rows, quiz.question_count))
+        scores = quiz.score(marked)
+        graded = [
+            QuizSubmission.model_construct(
+                id=attempt.submission_id,
+                quiz_id=quiz_id,
+                student_id=attempt.student_id,
+                answers=row,
+                score=score,
+                submitted_at=submitted_at,
+            )
+            for attempt, row, score in zip(group, rows, scores.tolist())
+        ]
+        # Submissions are written first: an attempt left grading by a crash
+        # in between is graded again once its claim is stale, not lost
+        await storage.upsert_many(SUBMISSIONS_COLLECTION, graded)
+        finished = await finish_claims(storage, group, status)
+        # A crash between finishing and counting leaves the stats one short,
+        # never counts an attempt twice
+        await count_submissions(storage, quiz_id, quiz, marked[finished], scores[finished])
+        for attempt, submission in zip(group, graded):
+            submissions[attempt.id] = submission
+    return submissions
+
+async def finish_claims(storage: Storage, attempts: List[QuizAttempt], status: str) -> List[int]:
+    """Move claimed attempts to their final `status`; the positions of those this call moved."""
+    moved = await asyncio.gather(*(
+        storage.update_if(
+            ATTEMPTS_COLLECTION,
+            attempt.id,
+            {"status": GRADING, "submission_id": attempt.submission_id},
+            {"status": status},
+        )
+        for attempt in attempts
+    ))
+    return [i for i, done in enumerate(moved) if done]
+
+async def claim_attempt(storage: Storage, attempt: QuizAttempt, where: Dict[str, Any], **changes: Any) -> Optional[QuizAttempt]:
+    """Claim `attempt` for grading if its stored fields still equal `where`; the claimed attempt, or None.
+
+    The claim reserves a submission id, unless `changes` carries one, and
+    stamps `saved_at` with the claim time, along with any other `changes`,
+    in one conditional update, so of several workers claiming the same
+    attempt only one wins.
+    """
+    changes = {"submission_id": new_id("sub"), **changes, "status": GRADING, "saved_at": datetime.now()}
+    if not await storage.update_if(ATTEMPTS_COLLECTION, attempt.id, where, changes):
+        return None
+    return attempt.model_copy(update=changes)
+
+async def expire_attempts(state, attempt_ids: List[str]) -> None:
+    # Called by the session clock, on every worker holding these attempts:
+    # each claims them in storage, so only one grades each attempt
+    sessions: QuizSessions = state.quiz_sessions
+    unsaved = {key: sessions.close_attempt(key) for key in attempt_ids}
+    now = datetime.now()
+    claims = []
+    stale = {}
+    for doc in await state.storage.get_many(ATTEMPTS_COLLECTION, attempt_ids):
+        attempt = QuizAttempt.model_validate(doc)
+        if attempt.status == IN_PROGRESS:
+            # Answers this worker still holds are newer than the stored ones
+            latest = unsaved[attempt.id]
+            answers = {"answers": latest.answers} if latest is not None else {}
+            claims.append(claim_attempt(state.storage, attempt, {"status": IN_PROGRESS}, **answers))
+        elif attempt.status == GRADING and (now - attempt.saved_at).total_seconds() >= ATTEMPT_CLAIM_TIMEOUT_SECONDS:
+            # Claimed by a worker that stopped before grading it; the claim
+            # time tells whether it was a submission or an expiry
+            stale[attempt.id] = "submitted" if sessions.in_time(attempt.deadline, attempt.saved_at) else "timed_out"
+            # The submission id is kept, so a submission the stopped worker
+            # already wrote is replaced rather than duplicated
+            claims.append(claim_attempt(
+                state.storage,
+                attempt,
+                {"status": GRADING, "saved_at": attempt.saved_at},
+                submission_id=attempt.submission_id,
+            ))
+    claimed = [attempt for attempt in await asyncio.gather(*claims) if attempt is not None]
+    # Graded from storage, with the answers the claim wrote
+    docs = await state.storage.get_many(ATTEMPTS_COLLECTION, [attempt.id for attempt in claimed])
+    attempts = [QuizAttempt.model_validate(doc) for doc in docs]
+    for status in ("submitted", "timed_out"):
+        group = [attempt for attempt in attempts if stale.get(attempt.id, "timed_out") == status]
+        if group:
+            await finish_attempts(state.storage, state.grading, group, status)
+
+async def load_attempt(storage: Storage, sessions: QuizSessions, key: str) -> Optional[QuizAttempt]:
+    doc = await storage.get(ATTEMPTS_COLLECTION, key)
+    if doc is None:
+        return None
+    attempt = QuizAttempt.model_validate(doc)
+    # Answers saved since the last flush are newer than the stored attempt,
+    # as long as no worker has submitted it meanwhile
+    unsaved = sessions.unsaved(key)
+    if unsaved is not None and attempt.status == IN_PROGRESS:
+        return unsaved
+    return attempt
+
+def check_answers(answers: List[Optional[int]], question_count: int) -> None:
+    if len(answers) != question_count:
+        raise HTTPException(status_code=400, detail="Invalid number of answers")
+    try:
+        answer_matrix([grading_answers(answers, question_count)], question_count)
+    except OverflowError:
+        raise HTTPException(status_code=400, detail="Answer out of range")
+
+def check_in_progress(sessions: QuizSessions, attempt: Optional[QuizAttempt]) -> QuizAttempt:
+    # The status is the stored one, whichever worker submitted the attempt
+    if attempt is None:
+        raise HTTPException(status_code=404, detail="No attempt started for this quiz")
+    if attempt.status != IN_PROGRESS:
+        raise HTTPException(status_code=409, detail="Attempt already submitted")
+    if not sessions.in_time(attempt.deadline):
+        # The session clock submits the answers saved in time
+        raise HTTPException(status_code=409, detail="Time limit exceeded")
+    return attempt
+
+async def submit_attempt(
+    storage: Storage,
+    grading: GradingEngine,
+    sessions: QuizSessions,
+    quiz_id: str,
+    user_id: str,
+    answers: List[Optional[int]],
+) -> QuizSubmission:
+    attempt = check_in_progress(sessions, await load_attempt(storage, sessions, attempt_id(user_id, quiz_id)))
+    sessions.close_attempt(attempt.id)
+    # Loses to an expiry or another submission that claimed it first, on
+    # this worker or any other
+    claimed = await claim_attempt(storage, attempt, {"status": IN_PROGRESS}, answers=answers)
+    if claimed is None:
+        raise HTTPException(status_code=409, detail="Attempt already submitted")
+    submissions = await finish_attempts(storage, grading, [claimed], "submitted")
+    return submissions[claimed.id]
+
+@app.post("/quizzes/{quiz_id}/attempt", response_model=QuizAttempt)
+async def start_quiz_attempt(
+    quiz_id: str,
+    user_id: str = Depends(get_current_user_id),
+    storage: Storage = Depends(get_storage),
+    grading: GradingEngine = Depends(get_grading),
+    sessions: QuizSessions = Depends(get_quiz_sessions),
+):
+    quiz = await grading.compiled(storage, quiz_id)
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    if not await is_enrolled(storage, user_id, quiz.course_id):
+        raise HTTPException(status_code=403, detail="Not enrolled in this course")
+    key = attempt_id(user_id, quiz_id)
+    attempt = await load_attempt(storage, sessions, key)
+    if attempt is not None:
+        if attempt.status != IN_PROGRESS:
+            raise HTTPException(status_code=409, detail="Quiz already attempted")
+        # Resuming keeps the original deadline
+        return attempt
+    started_at = datetime.now()
+    attempt = QuizAttempt(
+        id=key,
+        quiz_id=quiz_id,
+        course_id=quiz.course_id,
+        student_id=user_id,
+        answers=[None] * quiz.question_count,
+        started_at=started_at,
+        deadline=started_at + timedelta(minutes=quiz.time_limit_minutes) if quiz.time_limit_minutes else None,
+        saved_at=started_at,
+    )
+    # Stored before the clock starts, so the deadline outlives this worker
+    await storage.upsert(ATTEMPTS_COLLECTION, attempt)
+    sessions.open(key, attempt.deadline)
+    return attempt
+
+@app.get("/quizzes/{quiz_id}/attempt", response_model=QuizAttempt)
+async def get_quiz_attempt(
+    quiz_id: str,
+    user_id: str = Depends(get_current_user_id),
+    storage: Storage = Depends(get_storage),
+    sessions: QuizSessions = Depends(get_quiz_sessions),
+):
+    attempt = await load_attempt(storage, sessions, attempt_id(user_id, quiz_id))
+    if attempt is None:
+        raise HTTPException(status_code=404, detail="No attempt started for this quiz")
+    return attempt
+
+@app.put("/quizzes/{quiz_id}/attempt/answers", response_model=QuizAttempt)
+async def save_quiz_attempt_answers(
+    quiz_id: str,
+    answers: List[Optional[int]],
+    user_id: str = Depends(get_current_user_id),
+    storage: Storage = Depends(get_storage),
+    grading: GradingEngine = Depends(get_grading),
+    sessions: QuizSessions = Depends(get_quiz_sessions),
+):
+    quiz = await grading.compiled(storage, quiz_id)
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    check_answers(answers, quiz.question_count)
+    attempt = check_in_progress(sessions, await load_attempt(storage, sessions, attempt_id(user_id, quiz_id)))
+    # Kept in memory and written with the next flush, together with every
+    # other attempt saved meanwhile
+    attempt = attempt.model_copy(update={"answers": answers, "saved_at": datetime.now()})
+    sessions.save(attempt)
+    return attempt
+
+@app.post("/quizzes/{quiz_id}/attempt/submit", response_model=QuizSubmission)
+async def submit_quiz_attempt(
+    quiz_id: str,
+    answers: List[Optional[int]] = Body(...),
+    user_id: str = Depends(get_current_user_id),
+    storage: Storage = Depends(get_storage),
+    grading: GradingEngine = Depends(get_grading),
+    sessions: QuizSessions = Depends(get_quiz_sessions),
+):
+    # The answers are required: the latest autosave may still be buffered
+    # on another worker, which this one cannot see
+    quiz = await grading.compiled(storage, quiz_id)
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    check_answers(answers, quiz.question_count)
+    return await submit_attempt(storage, grading, sessions, quiz_id, user_id, answers)
+
 @app.post("/quizzes/{quiz_id}/submit", response_model=QuizSubmission)
-async def submit_quiz(quiz_id: str, answers: List[int]):
-    quiz = next((q for q in sample_quizzes if q.id == quiz_id), None)
+async def submit_quiz(
+    quiz_id: str,
+    answers: List[int],
+    user_id: str = Depends(get_current_user_id),
+    storage: Storage = Depends(get_storage),
+    grading: GradingEngine = Depends(get_grading),
+    sessions: QuizSessions = Depends(get_quiz_sessions),
+):
+    quiz = await grading.compiled(storage, quiz_id)
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
+    if not await is_enrolled(storage, user_id, quiz.course_id):
+        raise HTTPException(status_code=403, detail="Not enrolled in this course")
         
-    if len(answers) != len(quiz.questions):
+    if len(answers) != quiz.question_count:
         raise HTTPException(status_code=400, detail="Invalid number of answers")
+
+    if quiz.time_limit_minutes:
+        # Timed quizzes are only taken through an attempt, started in time
+        check_answers(answers, quiz.question_count)
+        return await submit_attempt(storage, grading, sessions, quiz_id, user_id, answers)
         
-    # Calculate score
-    correct_answers = sum(1 for i, answer in enumerate(answers) 
-                        if answer == quiz.questions[i].correct_option)
-    score = (correct_answers / len(quiz.questions)) * quiz.total_points
+    # Calculate score, weighting each question by its points
+    try:
+        marked = quiz.mark(answer_matrix([answers], quiz.question_count))
+    except OverflowError:
+        raise HTTPException(status_code=400, detail="Answer out of range")
+    scores = quiz.score(marked)
     
     submission = QuizSubmission(
+        id=new_id("sub"),
         quiz_id=quiz_id,
-        student_id="current_user",  # In a real app, this would come from auth
+        student_id=user_id,
         answers=answers,
-        score=score,
+        score=float(scores[0]),
         submitted_at=datetime.now()
     )
+    await record_submissions(storage, quiz_id, quiz, [submission], marked, scores)
     
     return submission
 
+@app.post("/quizzes/{quiz_id}/submit:batch", response_model=List[QuizSubmission])
+async def submit_quiz_batch(
+    quiz_id: str,
+    submissions: List[BatchSubmission],
+    user_id: str = Depends(get_current_user_id),
+    storage: Storage = Depends(get_storage),
+    grading: GradingEngine = Depends(get_grading),
+):
+    quiz = await grading.compiled(storage, quiz_id)
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    await check_grader(storage, user_id, quiz.course_id)
+
+    # Only enrolled students, and none in the middle of a timed attempt,
+    # which they must finish themselves; one lookup each for the batch
+    student_ids = [s.student_id for s in submissions]
+    enrolled = {doc["user_id"] for doc in await storage.get_many(
+        "enrollments", [enrollment_id(student, quiz.course_id) for student in student_ids], fields=("user_id",)
+    )}
+    not_enrolled = [i for i, student in enumerate(student_ids) if student not in enrolled]
+    if not_enrolled:
+        raise HTTPException(status_code=403, detail={"message": "Not enrolled in this course", "submissions": not_enrolled})
+    in_progress = {doc["student_id"] for doc in await storage.get_many(
+        ATTEMPTS_COLLECTION, [attempt_id(student, quiz_id) for student in student_ids], fields=("student_id", "status")
+    ) if doc["status"] in (IN_PROGRESS, GRADING)}
+    open_attempts = [i for i, student in enumerate(student_ids) if student in in_progress]
+    if open_attempts:
+        raise HTTPException(status_code=409, detail={"message": "Attempt in progress", "submissions": open_attempts})
+
+    try:
+        answers = answer_matrix([s.answers for s in submissions], quiz.question_count)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"message": "Invalid number of answers", "submissions": e.args[0]})
+    except OverflowError:
+        raise HTTPException(status_code=400, detail="Answer out of range")
+
+    # Grade the whole batch in one vectorized pass
+    marked = quiz.mark(answers)
+    scores = quiz.score(marked)
+    submitted_at = datetime.now()
+    # Inputs are already validated, so skip re-validating every submission
+    graded = [
+        QuizSubmission.model_construct(
+            id=new_id("sub"),
+            quiz_id=quiz_id,
+            student_id=submission.student_id,
+            answers=submission.answers,
+            score=score,
+            submitted_at=submitted_at,
+        )
+        for submission, score in zip(submissions, scores.tolist())
+    ]
+    await record_submissions(storage, quiz_id, quiz, graded, marked, scores)
+    return ORJSONResponse([submission.__dict__ for submission in graded])
+
+@app.get("/quizzes/{quiz_id}/stats")
+async def get_quiz_stats(
+    quiz_id: str,
+    user_id: str = Depends(get_current_user_id),
+    storage: Storage = Depends(get_storage),
+    grading: GradingEngine = Depends(get_grading),
+):
+    quiz = await grading.compiled(storage, quiz_id)
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    await check_grader(storage, user_id, quiz.course_id)
+    return await quiz_stats(storage, quiz_id, quiz)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
@@ -0,0 +1,307 @@
+import asyncio
+import functools
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from fastapi.routing import APIRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from profiler import RequestProfiler, open_request_profiler
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+# Route label of requests that matched no route, so unknown paths do not
+# create a series each
+UNMATCHED = "<unmatched>"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[str, LabelValues, float]
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> Iterator[Sample]:
+        for label_values, value in self._values.items():
+            yield "", label_values, value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *label_values: str, amount: float = 1) -> None:
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram:
+    """Cumulative buckets per label set, plus the sum and count of observations."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels) + ("le",)
+        self.buckets = tuple(buckets)
+        # Per label set: a count per bucket (the last one is +Inf), then the sum
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def samples(self) -> Iterator[Sample]:
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for label_values, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield "_bucket", label_values + (bound,), cumulative
+            yield "_sum", label_values, total[0]
+            yield "_count", label_values, cumulative
+
+
+class Observed:
+    """A counter or gauge read from elsewhere when scraped, e.g. cache stats.
+
+    `read` returns the value, or with `labels` a dict from label value (or
+    tuple of values) to value.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        kind: str,
+        read: Callable[[], Union[float, Dict]],
+        labels: Sequence[str] = (),
+    ):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labels = tuple(labels)
+        self.read = read
+
+    def samples(self) -> Iterator[Sample]:
+        values = self.read()
+        if not self.labels:
+            yield "", (), values
+            return
+        for label_values, value in values.items():
+            yield "", label_values if isinstance(label_values, tuple) else (label_values,), value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def add(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def observe(self, name: str, kind: str, help: str, read: Callable, labels: Sequence[str] = ()) -> Observed:
+        return self.add(Observed(name, help, kind, read, labels))
+
+    def render(self) -> bytes:
+        """Every metric in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, label_values, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(metric.labels, label_values)} {_format_value(value)}")
+        return ("\n".join(lines) + "\n").encode()
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues) -> str:
+    if not values:
+        return ""
+    pairs = (f'{name}="{_escape_label(value)}"' for name, value in zip(names, values))
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _escape_help(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+class Metrics:
+    """The HTTP instruments recorded by `MetricsMiddleware`, in one registry.
+
+    Anything else worth exporting, such as cache or limiter counters, is
+    added to `registry` with `registry.observe`.
+    """
+
+    def __init__(self, profiler: Optional[RequestProfiler] = None):
+        self.registry = Registry()
+        self.profiler = profiler
+        add = self.registry.add
+        self.requests = add(Counter("http_requests_total", "Requests by route and status", ("method", "route", "status")))
+        self.in_flight = add(Gauge("http_requests_in_flight", "Requests being handled, excluding open streams"))
+        self.duration = add(Histogram(
+            "http_request_duration_seconds",
+            "Time to the end of the response; time to the first byte for streams",
+            ("method", "route"),
+        ))
+        self.handler = add(Histogram(
+            "http_handler_duration_seconds",
+            "Time spent in the route function itself",
+            ("method", "route"),
+        ))
+        self.serialization = add(Histogram(
+            "http_serialization_duration_seconds",
+            "Time from the route function returning to the response starting",
+            ("method", "route"),
+        ))
+        self.response_size = add(Histogram(
+            "http_response_size_bytes",
+            "Response body size",
+            ("method", "route"),
+            buckets=SIZE_BUCKETS,
+        ))
+
+
+def open_metrics() -> Metrics:
+    return Metrics(open_request_profiler())
+
+
+class RequestTiming:
+    __slots__ = ("handler_start", "handler_end")
+
+    def __init__(self):
+        self.handler_start = 0.0
+        self.handler_end = 0.0
+
+
+# Set by the middleware for each request and filled in by `TimedRoute`
+_timing: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+
+def _timed(endpoint: Callable) -> Callable:
+    # The wrapper keeps the endpoint's signature (via __wrapped__), so
+    # FastAPI resolves the same parameters and dependencies
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed_async(*args, **kwargs):
+            timing = _timing.get()
+            if timing is None:
+                return await endpoint(*args, **kwargs)
+            timing.handler_start = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                timing.handler_end = time.perf_counter()
+
+        return timed_async
+
+    @functools.wraps(endpoint)
+    def timed_sync(*args, **kwargs):
+        timing = _timing.get()
+        if timing is None:
+            return endpoint(*args, **kwargs)
+        timing.handler_start = time.perf_counter()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            timing.handler_end = time.perf_counter()
+
+    return timed_sync
+
+
+class TimedRoute(APIRoute):
+    """Route that records when its function starts and returns.
+
+    What happens after the function returns, validating against
+    `response_model` and encoding the body, is reported as serialization.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _timed(endpoint), **kwargs)
+
+
+class MetricsMiddleware:
+    """Records latency, size, handler and serialization time per route template.
+
+    Metrics live on `app.state.metrics`, created in the lifespan. Paths in
+    `streaming` are timed to their first byte and left out of the in-flight
+    gauge; paths in `exempt` are not recorded. A request sent with
+    `X-Profile: 1` is also sampled when a profiler is configured.
+    """
+
+    def __init__(self, app: ASGIApp, streaming: Iterable[str] = (), exempt: Iterable[str] = ()):
+        self.app = app
+        self.streaming = frozenset(streaming)
+        self.exempt = frozenset(exempt)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+        metrics: Metrics = scope["app"].state.metrics
+        streaming = scope["path"] in self.streaming
+        status = 500
+        size = 0
+        first_byte = 0.0
+
+        async def send_measured(message: Message) -> None:
+            nonlocal status, size, first_byte
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                first_byte = time.perf_counter()
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        profile = None
+        if metrics.profiler is not None and (b"x-profile", b"1") in scope["headers"]:
+            profile = metrics.profiler.start()
+        timing = RequestTiming()
+        token = _timing.set(timing)
+        if not streaming:
+            metrics.in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_measured)
+        finally:
+            end = time.perf_counter()
+            if not streaming:
+                metrics.in_flight.dec()
+            _timing.reset(token)
+            route = scope.get("route")
+            labels = (scope["method"], route.path if route is not None else UNMATCHED)
+            metrics.requests.inc(*labels, str(status))
+            metrics.duration.observe((first_byte or end) - start if streaming else end - start, *labels)
+            metrics.response_size.observe(size, *labels)
+            if timing.handler_end:
+                metrics.handler.observe(timing.handler_end - timing.handler_start, *labels)
+                if first_byte:
+                    metrics.serialization.observe(max(first_byte - timing.handler_end, 0.0), *labels)
+            if profile is not None:
+                await metrics.profiler.finish(profile, end - start, *labels)
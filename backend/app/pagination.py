@@ -0,0 +1,116 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple, Type, get_args
+
+from fastapi import HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+from cache import EncodedCache
+from serialization import JSONBytesResponse, encoded_list
+from storage import COLLECTIONS, Storage
+from timeline import naive
+
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageParams:
+    def __init__(self, after: Optional[Tuple[Any, str]], limit: Optional[int], fields: Optional[List[str]]):
+        self.after = after
+        self.limit = limit
+        self.fields = fields
+
+
+async def page_params(
+    cursor: Optional[str] = Query(None, description=f"Opaque cursor from the {NEXT_CURSOR_HEADER} response header"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to include in each item"),
+) -> PageParams:
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    return PageParams(decode_cursor(cursor) if cursor else None, limit, selected)
+
+
+def encode_cursor(value: Any, key: str) -> str:
+    if isinstance(value, datetime):
+        payload = ["d", value.isoformat(), key]
+    else:
+        payload = ["v", value, key]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    try:
+        kind, value, key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if kind == "d":
+            value = datetime.fromisoformat(value)
+        elif kind != "v":
+            raise ValueError(kind)
+        if not isinstance(key, str):
+            raise TypeError(key)
+        return value, key
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def order_type(model: Type[BaseModel], field: str) -> type:
+    """The type of the values a collection is ordered by, without Optional."""
+    annotation = model.model_fields[field].annotation
+    return next((arg for arg in get_args(annotation) if arg is not type(None)), annotation)
+
+
+def check_cursor(after: Tuple[Any, str], model: Type[BaseModel], order_by: str) -> Tuple[Any, str]:
+    """`after` with an order value of the order field's type; anything else is a 400.
+
+    Compared against stored values, a cursor value of another type would
+    fail deep inside the storage backend instead.
+    """
+    value, key = after
+    expected = order_type(model, order_by)
+    if expected is datetime and isinstance(value, datetime):
+        # Stored dates are naive
+        return naive(value), key
+    if expected is float and isinstance(value, int) and not isinstance(value, bool):
+        return float(value), key
+    if type(value) is expected:
+        return value, key
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def paginate(
+    storage: Storage,
+    cache: EncodedCache,
+    collection: str,
+    model: Type[BaseModel],
+    page: PageParams,
+    where: Optional[dict] = None,
+):
+    """Fetch one keyset page of a collection in its stable list order.
+
+    The cursor for the following page is returned in the X-Next-Cursor
+    header. Full items are served from the pre-encoded entity cache, so the
+    page query itself only fetches ids and order values. Sparse fieldsets
+    are encoded per request.
+    """
+    if page.fields is not None:
+        unknown = [f for f in page.fields if f not in model.model_fields]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    after = check_cursor(page.after, model, COLLECTIONS[collection].order_by) if page.after is not None else None
+    limit = page.limit + 1 if page.limit is not None else None
+    keys = await storage.find_keys(collection, where, after=after, limit=limit)
+
+    headers = {}
+    if page.limit is not None and len(keys) > page.limit:
+        keys = keys[:page.limit]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(*keys[-1])
+    ids = [key for _, key in keys]
+
+    if page.fields is None:
+        body = await encoded_list(storage, cache, collection, model, ids)
+        return JSONBytesResponse(body, headers=headers)
+    docs = {doc["id"]: doc for doc in await storage.get_many(collection, ids, {"id", *page.fields})}
+    return ORJSONResponse([docs[key] for key in ids if key in docs], headers=headers)
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StackSampler:
+    """Samples the Python stack of every thread on a background thread.
+
+    Samples are kept as counts of folded stacks, the format flamegraph.pl,
+    speedscope and similar tools read: the thread name and frames from the
+    outermost in, joined by `;`. Because the event loop interleaves
+    requests, a sample taken while one request is profiled may show another
+    request's work; profile on a quiet worker when that matters.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = 0
+        self._stacks: "Counter[str]" = Counter()
+        self._names: Dict[int, str] = {}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> "Counter[str]":
+        self._stopped.set()
+        self._thread.join()
+        return self._stacks
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident != me:
+                    self._stacks[self._thread_name(ident) + ";" + _fold(frame)] += 1
+            self.samples += 1
+
+    def _thread_name(self, ident: int) -> str:
+        name = self._names.get(ident)
+        if name is None:
+            self._names = {thread.ident: thread.name for thread in threading.enumerate()}
+            name = self._names.get(ident, str(ident))
+        return name
+
+
+def _fold(frame) -> str:
+    names: List[str] = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.reverse()
+    return ";".join(names)
+
+
+def folded(stacks: "Counter[str]") -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class RequestProfiler:
+    """Samples requests that ask for it and keeps the slow ones.
+
+    A profile slower than `slow` seconds is written to `directory` as a
+    `.folded` file. One request is profiled at a time, so the sampler never
+    runs more than once per process.
+    """
+
+    def __init__(self, directory: str, slow: float, interval: float):
+        self.directory = Path(directory)
+        self.slow = slow
+        self.interval = interval
+        self._active = False
+
+    def start(self) -> Optional[StackSampler]:
+        if self._active:
+            return None
+        self._active = True
+        sampler = StackSampler(self.interval)
+        sampler.start()
+        return sampler
+
+    async def finish(self, sampler: StackSampler, duration: float, method: str, route: str) -> Optional[Path]:
+        try:
+            stacks = await asyncio.to_thread(sampler.stop)
+        finally:
+            self._active = False
+        if duration < self.slow or not stacks:
+            return None
+        slug = "".join(char if char.isalnum() else "_" for char in route.strip("/")) or "root"
+        path = self.directory / f"{time.strftime('%Y%m%dT%H%M%S')}-{method}-{slug}-{int(duration * 1000)}ms.folded"
+        await asyncio.to_thread(self._write, path, folded(stacks))
+        logger.warning("Slow request %s %s took %.0f ms; profile written to %s", method, route, duration * 1000, path)
+        return path
+
+    def _write(self, path: Path, content: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+
+def open_request_profiler() -> Optional[RequestProfiler]:
+    """The profiler configured by `PROFILE_DIR`, or None when profiling is off."""
+    directory = os.getenv("PROFILE_DIR")
+    if not directory:
+        return None
+    return RequestProfiler(
+        directory,
+        slow=float(os.getenv("PROFILE_SLOW_MS", "200")) / 1000,
+        interval=float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000,
+    )
@@ -0,0 +1,131 @@
+import asyncio
+import os
+from typing import AsyncIterator, Callable, Dict, Iterable, NamedTuple, Set, Tuple
+
+
+class Message(NamedTuple):
+    topics: Tuple[str, ...]
+    event: str
+    # Complete SSE frame, encoded once and shared by every subscriber
+    frame: bytes
+
+
+def sse_frame(event: str, data: bytes) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + data + b"\n\n"
+
+
+def course_topic(course_id: str) -> str:
+    return f"course:{course_id}"
+
+
+def post_topic(post_id: str) -> str:
+    return f"post:{post_id}"
+
+
+ANNOUNCEMENTS_TOPIC = "announcements"
+
+
+class Subscription:
+    """A subscriber's bounded inbox.
+
+    When a slow consumer's queue is full the oldest message is dropped so
+    publishers never block; `dropped` tells the stream to warn the client
+    that it should refetch.
+    """
+
+    def __init__(self, topics: Iterable[str], max_queue: int):
+        self.topics = frozenset(topics)
+        self.dropped = 0
+        self._queue: "asyncio.Queue[Message]" = asyncio.Queue(max_queue)
+
+    def deliver(self, message: Message) -> None:
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(message)
+
+    async def get(self) -> Message:
+        return await self._queue.get()
+
+
+class LocalBackend:
+    """Delivers published messages to subscribers in this process only.
+
+    Other backends (e.g. Redis pub/sub) implement the same three methods to
+    fan out across worker processes.
+    """
+
+    def __init__(self):
+        self._dispatch: Callable[[Message], None] = lambda message: None
+
+    async def start(self, dispatch: Callable[[Message], None]) -> None:
+        self._dispatch = dispatch
+
+    async def publish(self, message: Message) -> None:
+        self._dispatch(message)
+
+    async def close(self) -> None:
+        pass
+
+
+class Broker:
+    """Topic based fan-out of new posts, replies and announcements."""
+
+    def __init__(self, backend=None, max_queue: int = int(os.getenv("PUBSUB_MAX_QUEUE", "100"))):
+        self.backend = backend or LocalBackend()
+        self.max_queue = max_queue
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+
+    async def start(self) -> None:
+        await self.backend.start(self._dispatch)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        subscription = Subscription(topics, self.max_queue)
+        for topic in subscription.topics:
+            self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for topic in subscription.topics:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    async def publish(self, topics: Iterable[str], event: str, data: bytes) -> None:
+        await self.backend.publish(Message(tuple(topics), event, sse_frame(event, data)))
+
+    def _dispatch(self, message: Message) -> None:
+        # A subscriber to several of the message's topics still gets it once
+        recipients: Set[Subscription] = set()
+        for topic in message.topics:
+            recipients.update(self._subscribers.get(topic, ()))
+        for subscription in recipients:
+            subscription.deliver(message)
+
+    async def stream(self, topics: Iterable[str], heartbeat: float = 15.0) -> AsyncIterator[bytes]:
+        """SSE byte stream of the topics; unsubscribes when the client goes away.
+
+        The subscription is made on the first iteration, so a stream that is
+        never sent, such as one inside a batch, leaves no subscriber behind.
+        Messages published after the client sees `connected` are delivered.
+        """
+        subscription = self.subscribe(topics)
+        try:
+            yield b": connected\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if subscription.dropped:
+                    yield sse_frame("lagged", str(subscription.dropped).encode())
+                    subscription.dropped = 0
+                yield message.frame
+        finally:
+            self.unsubscribe(subscription)
@@ -0,0 +1,64 @@
+import sys
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+
+class Record:
+    """Compact, slotted copy of a model's field values, kept by the memory backend.
+
+    A Pydantic instance carries a `__dict__` plus bookkeeping such as the
+    set of fields explicitly set, which costs several hundred bytes per
+    document before any values are counted. A record stores only the
+    values in slots. Lists become tuples and nested models become records;
+    `dump` turns them back into the plain dicts and lists the storage API
+    returns.
+    """
+
+    __slots__ = ()
+    _fields: Tuple[str, ...] = ()
+
+    def dump(self, fields: Optional[Iterable[str]] = None) -> dict:
+        if fields is None:
+            names = self._fields
+        else:
+            wanted = set(fields)
+            names = [name for name in self._fields if name in wanted]
+        doc = {}
+        for name in names:
+            value = getattr(self, name)
+            if type(value) is tuple:
+                value = [item.dump() if isinstance(item, Record) else item for item in value]
+            elif isinstance(value, Record):
+                value = value.dump()
+            doc[name] = value
+        return doc
+
+
+_record_types: Dict[Type[BaseModel], Type[Record]] = {}
+
+
+def record_type(model: Type[BaseModel]) -> Type[Record]:
+    cls = _record_types.get(model)
+    if cls is None:
+        fields = tuple(model.model_fields)
+        cls = type(f"{model.__name__}Record", (Record,), {"__slots__": fields, "_fields": fields})
+        _record_types[model] = cls
+    return cls
+
+
+def to_record(item: BaseModel, interned: FrozenSet[str] = frozenset()) -> Record:
+    """A record of `item`; strings in `interned` fields share one copy per distinct value."""
+    cls = record_type(type(item))
+    record = cls.__new__(cls)
+    for name in record._fields:
+        value = getattr(item, name)
+        if type(value) is str:
+            if name in interned:
+                value = sys.intern(value)
+        elif type(value) is list:
+            value = tuple(to_record(v) if isinstance(v, BaseModel) else v for v in value)
+        elif isinstance(value, BaseModel):
+            value = to_record(value)
+        setattr(record, name, value)
+    return record
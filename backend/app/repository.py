@@ -0,0 +1,166 @@
+from bisect import bisect_left, bisect_right, insort
+from itertools import count
+from typing import Any, Dict, Generic, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class Repository(Generic[T]):
+    """In-memory collection with a primary-key hash index and secondary indexes.
+
+    Lookups by primary key are O(1) and lookups through a secondary index are
+    O(k) in the number of matching items. Every mutation goes through `add`,
+    `update` or `remove` so the indexes never drift from the stored items.
+
+    Items are kept sorted by `(order_by, key)` (insertion order when
+    `order_by` is not set), both overall and inside each secondary index
+    bucket, so keyset pages start with a bisect instead of a scan.
+    """
+
+    def __init__(
+        self,
+        items: Iterable[T] = (),
+        key: str = "id",
+        indexes: Iterable[str] = (),
+        order_by: Optional[str] = None,
+    ):
+        self._key = key
+        self._order_by = order_by
+        self._seq = count()
+        self._items: Dict[Any, T] = {}
+        self._sort_keys: Dict[Any, Tuple[Any, Any]] = {}
+        self._order: List[Tuple[Any, Any]] = []
+        # index name -> indexed value -> sorted sort keys of the matching items
+        self._indexes: Dict[str, Dict[Any, List[Tuple[Any, Any]]]] = {name: {} for name in indexes}
+        for item in items:
+            self.add(item)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[T]:
+        return self.iter_from()
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._items
+
+    def get(self, key: Any) -> Optional[T]:
+        return self._items.get(key)
+
+    def all(self) -> List[T]:
+        return list(self)
+
+    def filter_by(self, index: str, value: Any) -> List[T]:
+        return list(self.iter_from(index, value))
+
+    def sort_key(self, item: T) -> Tuple[Any, Any]:
+        """The `(order value, primary key)` pair used as a keyset cursor."""
+        return self._sort_keys[getattr(item, self._key)]
+
+    def iter_from(
+        self,
+        index: Optional[str] = None,
+        value: Any = None,
+        after: Optional[Tuple[Any, Any]] = None,
+    ) -> Iterator[T]:
+        """Iterate in sort order, optionally within an index bucket and past a cursor."""
+        return (self._items[key] for _, key in self.sort_keys_from(index, value, after))
+
+    def sort_keys_from(
+        self,
+        index: Optional[str] = None,
+        value: Any = None,
+        after: Optional[Tuple[Any, Any]] = None,
+    ) -> Iterator[Tuple[Any, Any]]:
+        """Like `iter_from`, but yields the sort keys without touching the items."""
+        if index is None:
+            keys = self._order
+        elif index not in self._indexes:
+            raise KeyError(f"No index on '{index}'")
+        else:
+            keys = self._indexes[index].get(value, [])
+        start = bisect_right(keys, after) if after is not None else 0
+        return _walk(keys, start)
+
+    def add(self, item: T) -> T:
+        key = getattr(item, self._key)
+        if key in self._items:
+            raise ValueError(f"Duplicate key '{key}'")
+        order = getattr(item, self._order_by) if self._order_by else next(self._seq)
+        self._index(key, item, (order, key))
+        return item
+
+    def update(self, key: Any, **changes: Any) -> T:
+        item = self._items[key]
+        if self._key in changes:
+            raise ValueError("Primary key cannot be changed")
+        moved = any(name in self._indexes or name == self._order_by for name in changes)
+        if not moved:
+            for name, value in changes.items():
+                setattr(item, name, value)
+            return item
+        sort_key = self._sort_keys[key]
+        previous = {name: getattr(item, name) for name in changes}
+        self._unindex(key, item)
+        for name, value in changes.items():
+            setattr(item, name, value)
+        order = getattr(item, self._order_by) if self._order_by else sort_key[0]
+        try:
+            self._index(key, item, (order, key))
+        except Exception:
+            # Put the item back as it was, so a rejected update changes nothing
+            for name, value in previous.items():
+                setattr(item, name, value)
+            self._index(key, item, sort_key)
+            raise
+        return item
+
+    def remove(self, key: Any) -> T:
+        item = self._items[key]
+        self._unindex(key, item)
+        return item
+
+    def _index(self, key: Any, item: T, sort_key: Tuple[Any, Any]) -> None:
+        # Sorted lists first: a sort key that does not compare with the others
+        # (say an aware datetime among naive ones) raises before the maps
+        # refer to the item, and the lists already updated are rolled back
+        insort(self._order, sort_key)
+        placed: List[Tuple[Any, Any]] = []
+        try:
+            for name, index in self._indexes.items():
+                value = getattr(item, name)
+                insort(index.setdefault(value, []), sort_key)
+                placed.append((index, value))
+        except Exception:
+            _discard(self._order, sort_key)
+            for index, value in placed:
+                _discard(index[value], sort_key)
+                if not index[value]:
+                    del index[value]
+            raise
+        self._items[key] = item
+        self._sort_keys[key] = sort_key
+
+    def _unindex(self, key: Any, item: T) -> None:
+        sort_key = self._sort_keys.pop(key)
+        del self._items[key]
+        _discard(self._order, sort_key)
+        for name, index in self._indexes.items():
+            value = getattr(item, name)
+            bucket = index.get(value)
+            if bucket is not None:
+                _discard(bucket, sort_key)
+                if not bucket:
+                    del index[value]
+
+
+def _walk(keys: List[Tuple[Any, Any]], start: int) -> Iterator[Tuple[Any, Any]]:
+    # Walk by position so a page never copies the rest of the bucket
+    for i in range(start, len(keys)):
+        yield keys[i]
+
+
+def _discard(keys: List[Tuple[Any, Any]], sort_key: Tuple[Any, Any]) -> None:
+    i = bisect_left(keys, sort_key)
+    if i < len(keys) and keys[i] == sort_key:
+        del keys[i]
@@ -0,0 +1,534 @@
+"""The demo tenant every empty storage backend is seeded with.
+
+Imported by the lifespan only when a collection needs seeding and no seed
+snapshot is configured, so a cold start against seeded storage never
+builds these models.
+"""
+from datetime import datetime, timedelta
+
+from main import (
+    Announcement,
+    Assignment,
+    AssignmentStatus,
+    Course,
+    Credential,
+    DiscussionPost,
+    DiscussionReply,
+    Enrollment,
+    Event,
+    Quiz,
+    QuizQuestion,
+    User,
+)
+from users import NOT_SUBMITTED, assignment_status_id, enrollment_id
+
+# Sample data with funny content
+sample_courses = [
+    Course(
+        id="MEME-420",
+        code="MEME-420",
+        name="Advanced Memeology",
+        color="#4682b4",
+        section="Section 69",
+        term="Spring 2025",
+        description="A comprehensive study of internet culture, focusing on the evolution of memes from Doge to modern TikTok trends."
+    ),
+    Course(
+        id="NAPS-303",
+        code="NAPS-303",
+        name="Strategic Napping Techniques",
+        color="#32cd32",
+        section="Section ZZZ",
+        term="Spring 2025",
+        description="Master the art of sleeping through meetings while appearing attentive. Special focus on Zoom camera angles."
+    ),
+    Course(
+        id="PROCR-101",
+        code="PROCR-101",
+        name="Professional Netflix Binging",
+        color="#6a5acd",
+        section="Section 404",
+        term="Spring 2025",
+        description="Learn to optimize your streaming schedule while maintaining the illusion of productivity."
+    ),
+    Course(
+        id="PIZZA-505",
+        code="PIZZA-505",
+        name="Advanced Pizza Studies",
+        color="#dc143c",
+        section="Section NOM",
+        term="Spring 2025",
+        description="Explore the controversial topics in pizza culture, including the ongoing pineapple debate and optimal crust thickness."
+    )
+]
+
+sample_assignments = [
+    Assignment(
+        id="hw1",
+        course_id="PROCR-101",
+        title="Binge Watch Entire Series of The Office",
+        due_date=datetime.now() + timedelta(days=1),
+        points=69,
+        status="not submitted",
+        description="Watch all seasons of The Office and analyze the evolution of Michael Scott's management style."
+    ),
+    Assignment(
+        id="hw2",
+        course_id="MEME-420",
+        title="Create a Viral Cat Meme Portfolio",
+        due_date=datetime.now() + timedelta(hours=4),
+        points=42,
+        status="graded",
+        description="Curate and analyze a collection of cat memes. Bonus points for including Grumpy Cat references."
+    ),
+    Assignment(
+        id="hw4",
+        course_id="NAPS-303",
+        title="Perfect the Art of Looking Awake in Zoom Meetings",
+        due_date=datetime.now() + timedelta(days=2),
+        points=50,
+        status="not submitted",
+        description="Develop and demonstrate techniques for appearing alert while actually sleeping during virtual meetings."
+    ),
+    Assignment(
+        id="hw6",
+        course_id="PIZZA-505",
+        title="Debate: Pineapple on Pizza Ethics",
+        due_date=datetime.now() + timedelta(hours=6),
+        points=75,
+        status="submitted",
+        description="Present a scholarly argument for or against pineapple as a pizza topping. Citations required."
+    )
+]
+
+sample_events = [
+    Event(
+        id="event1",
+        title="Emergency Meme Review",
+        start_time=datetime.now() + timedelta(days=1, hours=2),
+        end_time=datetime.now() + timedelta(days=1, hours=4),
+        location="Virtual Meme Lab",
+        course_id="MEME-420",
+        description="Urgent analysis of viral cat videos. Bring your best reaction GIFs."
+    ),
+    Event(
+        id="event2",
+        title="Advanced Napping Workshop",
+        start_time=datetime.now() + timedelta(days=2),
+        end_time=datetime.now() + timedelta(days=2, hours=3),
+        location="Comfy Couch Auditorium",
+        course_id="NAPS-303",
+        description="Learn to perfect the art of sleeping with your eyes open during Zoom calls."
+    ),
+    Event(
+        id="event3",
+        title="Pizza vs Pineapple Debate",
+        start_time=datetime.now() + timedelta(days=3),
+        end_time=datetime.now() + timedelta(days=3, hours=2),
+        location="Virtual Pizza Kitchen",
+        course_id="PIZZA-505",
+        description="A heated debate on the controversial topic of pineapple on pizza. Snacks provided (no pineapples allowed)."
+    ),
+    Event(
+        id="event4",
+        title="Netflix Marathon Training",
+        start_time=datetime.now() + timedelta(days=4),
+        end_time=datetime.now() + timedelta(days=4, hours=8),
+        location="Your Favorite Couch",
+        course_id="PROCR-101",
+        description="Endurance training for binge-watching. BYOS (Bring Your Own Snacks)."
+    ),
+    Event(
+        id="event5",
+        title="Weekly Snack Break Office Hours",
+        start_time=datetime.now() + timedelta(days=1, hours=6),
+        end_time=datetime.now() + timedelta(days=1, hours=7),
+        location="Break Room",
+        course_id="PROCR-101",
+        description="Drop in with questions about putting things off until later.",
+        recurrence="FREQ=WEEKLY;COUNT=12"
+    )
+]
+
+sample_announcements = [
+    Announcement(
+        id="ann1",
+        source="DEPARTMENT OF MEMEOLOGY",
+        title="URGENT: New Meme Format Just Dropped",
+        content="Students are required to study the latest viral cat meme for tomorrow's surprise meme quiz. Extra credit for anyone who can make their professor laugh with a SpongeBob reference.",
+        date=datetime.now() - timedelta(hours=2)
+    ),
+    Announcement(
+        id="ann2",
+        source="PROCRASTINATION STUDIES",
+        title="Deadline Extension Workshop: How to Ask for More Time",
+        content="Join us for an interactive workshop on crafting the perfect 'my dog ate my homework' email. Guest speaker: That one student who's never turned anything in on time but somehow has an A.",
+        date=datetime.now() - timedelta(hours=1)
+    ),
+    Announcement(
+        id="ann3",
+        source="CRAFT BEER STUDIES",
+        title="Important: Beer Tasting Lab Rescheduled",
+        content="Due to the professor's unexpected hangover, today's beer tasting lab will be moved to tomorrow. Remember to bring your designated driver permission slips.",
+        date=datetime.now() - timedelta(minutes=30)
+    )
+]
+
+# Add sample discussions
+sample_discussions = [
+    # Memeology Discussions
+    DiscussionPost(
+        id="disc1",
+        course_id="MEME-420",
+        title="The Philosophy of Doge",
+        content="Much discuss, very academic. What makes a meme truly timeless? Let's analyze the staying power of Doge.",
+        author="Meme Scholar",
+        created_at=datetime.now() - timedelta(days=2),
+        replies_count=2
+    ),
+    DiscussionPost(
+        id="disc2",
+        course_id="MEME-420",
+        title="Evolution of SpongeBob Memes",
+        content="From 'Imagination' to 'Mocking SpongeBob', let's trace the evolution of SpongeBob's impact on meme culture.",
+        author="Bikini Bottom Researcher",
+        created_at=datetime.now() - timedelta(days=1),
+        replies_count=1
+    ),
+    DiscussionPost(
+        id="disc3",
+        course_id="MEME-420",
+        title="Cat Memes: A Scientific Classification",
+        content="Proposing a new taxonomy for categorizing cat memes. From Grumpy Cat to Keyboard Cat, where do they all fit?",
+        author="Feline Memeologist",
+        created_at=datetime.now() - timedelta(hours=5),
+        replies_count=4
+    ),
+    
+    # Napping Discussions
+    DiscussionPost(
+        id="disc4",
+        course_id="NAPS-303",
+        title="Best Positions for Zoom Naps",
+        content="Share your tried and tested positions for looking engaged while actually sleeping.",
+        author="Professional Napper",
+        created_at=datetime.now() - timedelta(days=1),
+        replies_count=3
+    ),
+    DiscussionPost(
+        id="disc5",
+        course_id="NAPS-303",
+        title="Advanced Camera Angle Techniques",
+        content="How to position your camera to maximize nap potential while maintaining the illusion of attention.",
+        author="Zoom Master",
+        created_at=datetime.now() - timedelta(hours=8),
+        replies_count=2
+    ),
+    
+    # Netflix Binging Discussions
+    DiscussionPost(
+        id="disc6",
+        course_id="PROCR-101",
+        title="Optimal Snack Placement for Marathon Sessions",
+        content="Strategic snack positioning can make or break a binge session. Let's discuss optimal layouts.",
+        author="Snack Strategist",
+        created_at=datetime.now() - timedelta(hours=12),
+        replies_count=5
+    ),
+    DiscussionPost(
+        id="disc7",
+        course_id="PROCR-101",
+        title="The Psychology of 'One More Episode'",
+        content="Analyzing the cognitive mechanisms behind the 'just one more episode' phenomenon.",
+        author="Binge Psychologist",
+        created_at=datetime.now() - timedelta(hours=3),
+        replies_count=2
+    ),
+    
+    # Pizza Studies Discussions
+    DiscussionPost(
+        id="disc8",
+        course_id="PIZZA-505",
+        title="Pineapple on Pizza: A Scientific Analysis",
+        content="Let's settle this debate once and for all with empirical evidence.",
+        author="Pizza Scientist",
+        created_at=datetime.now() - timedelta(hours=12),
+        replies_count=1
+    ),
+    DiscussionPost(
+        id="disc9",
+        course_id="PIZZA-505",
+        title="The Perfect Crust-to-Sauce Ratio",
+        content="A mathematical approach to optimizing the fundamental pizza equation.",
+        author="Pizza Mathematician",
+        created_at=datetime.now() - timedelta(hours=6),
+        replies_count=3
+    )
+]
+
+# Add sample discussion replies
+sample_discussion_replies = [
+    # Memeology Replies
+    DiscussionReply(
+        id="reply1",
+        post_id="disc1",
+        content="Wow, such insight, very academic!",
+        author="Doge Fan",
+        created_at=datetime.now() - timedelta(days=1)
+    ),
+    DiscussionReply(
+        id="reply2",
+        post_id="disc1",
+        content="I believe the key to Doge's longevity lies in its versatility.",
+        author="Meme Historian",
+        created_at=datetime.now() - timedelta(hours=12)
+    ),
+    DiscussionReply(
+        id="reply3",
+        post_id="disc2",
+        content="The transition from reaction images to meta-commentary was fascinating.",
+        author="Meme Anthropologist",
+        created_at=datetime.now() - timedelta(hours=6)
+    ),
+    
+    # Napping Replies
+    DiscussionReply(
+        id="reply4",
+        post_id="disc4",
+        content="The classic 'thoughtful nodding while sleeping' technique never fails.",
+        author="Sleep Expert",
+        created_at=datetime.now() - timedelta(hours=6)
+    ),
+    DiscussionReply(
+        id="reply5",
+        post_id="disc5",
+        content="Pro tip: Slightly tilted camera angle suggests deep contemplation.",
+        author="Nap Architect",
+        created_at=datetime.now() - timedelta(hours=2)
+    ),
+    
+    # Netflix Replies
+    DiscussionReply(
+        id="reply6",
+        post_id="disc6",
+        content="The 'snack radius' theory changed my binging game completely!",
+        author="Couch Potato PhD",
+        created_at=datetime.now() - timedelta(hours=4)
+    ),
+    
+    # Pizza Replies
+    DiscussionReply(
+        id="reply7",
+        post_id="disc8",
+        content="Your control group needs a blind taste test to be valid.",
+        author="Statistical Pizza Expert",
+        created_at=datetime.now() - timedelta(hours=3)
+    )
+]
+
+# Add sample quizzes
+sample_quizzes = [
+    # Memeology Quizzes
+    Quiz(
+        id="quiz1",
+        course_id="MEME-420",
+        title="Meme History 101",
+        description="Test your knowledge of classic memes",
+        due_date=datetime.now() + timedelta(days=7),
+        time_limit_minutes=30,
+        questions=[
+            QuizQuestion(
+                id="q1",
+                question="What year did the 'Doge' meme first appear?",
+                options=["2010", "2013", "2015", "2017"],
+                correct_option=1,
+                points=5
+            ),
+            QuizQuestion(
+                id="q2",
+                question="Which platform popularized 'Rickrolling'?",
+                options=["4chan", "Reddit", "YouTube", "MySpace"],
+                correct_option=0,
+                points=5
+            ),
+            QuizQuestion(
+                id="q3",
+                question="Who was the original 'Grumpy Cat'?",
+                options=["Tardar Sauce", "Colonel Meow", "Lil Bub", "Maru"],
+                correct_option=0,
+                points=5
+            )
+        ],
+        total_points=15
+    ),
+    Quiz(
+        id="quiz2",
+        course_id="MEME-420",
+        title="Advanced Meme Analysis",
+        description="Demonstrate your understanding of complex meme evolution",
+        due_date=datetime.now() + timedelta(days=14),
+        time_limit_minutes=45,
+        questions=[
+            QuizQuestion(
+                id="q4",
+                question="Which factor most influences a meme's longevity?",
+                options=["Versatility", "Initial popularity", "Platform of origin", "Creator fame"],
+                correct_option=0,
+                points=10
+            ),
+            QuizQuestion(
+                id="q5",
+                question="What makes a crossover meme successful?",
+                options=[
+                    "Compatible contexts",
+                    "Similar popularity levels",
+                    "Same platform origin",
+                    "Matching color schemes"
+                ],
+                correct_option=0,
+                points=10
+            )
+        ],
+        total_points=20
+    ),
+    
+    # Napping Quizzes
+    Quiz(
+        id="quiz3",
+        course_id="NAPS-303",
+        title="Advanced Napping Techniques",
+        description="Prove your mastery of strategic napping",
+        due_date=datetime.now() + timedelta(days=3),
+        time_limit_minutes=20,
+        questions=[
+            QuizQuestion(
+                id="q6",
+                question="What's the optimal nap duration for maximum productivity?",
+                options=["10 minutes", "20 minutes", "30 minutes", "2 hours"],
+                correct_option=1,
+                points=10
+            ),
+            QuizQuestion(
+                id="q7",
+                question="Best position for appearing attentive during video calls?",
+                options=[
+                    "Chin resting on hand",
+                    "Leaning back thoughtfully",
+                    "Constant nodding",
+                    "Frequent position changes"
+                ],
+                correct_option=0,
+                points=10
+            )
+        ],
+        total_points=20
+    ),
+    
+    # Netflix Binging Quizzes
+    Quiz(
+        id="quiz4",
+        course_id="PROCR-101",
+        title="Binge-Watching Fundamentals",
+        description="Essential knowledge for professional streaming",
+        due_date=datetime.now() + timedelta(days=5),
+        time_limit_minutes=25,
+        questions=[
+            QuizQuestion(
+                id="q8",
+                question="Optimal break duration between episodes?",
+                options=["No breaks", "2 minutes", "5 minutes", "15 minutes"],
+                correct_option=1,
+                points=5
+            ),
+            QuizQuestion(
+                id="q9",
+                question="Best snack for minimal keyboard mess?",
+                options=["Popcorn", "Chips", "Chocolate", "Fruit slices"],
+                correct_option=3,
+                points=5
+            )
+        ],
+        total_points=10
+    ),
+    
+    # Pizza Studies Quizzes
+    Quiz(
+        id="quiz5",
+        course_id="PIZZA-505",
+        title="Pizza Theory Fundamentals",
+        description="Test your knowledge of pizza science",
+        due_date=datetime.now() + timedelta(days=5),
+        time_limit_minutes=45,
+        questions=[
+            QuizQuestion(
+                id="q10",
+                question="What is the ideal pizza crust thickness?",
+                options=["Thin as paper", "Medium", "Thick", "Chicago deep dish"],
+                correct_option=1,
+                points=5
+            ),
+            QuizQuestion(
+                id="q11",
+                question="At what temperature should pizza be baked?",
+                options=["350°F", "450°F", "650°F", "800°F"],
+                correct_option=2,
+                points=5
+            ),
+            QuizQuestion(
+                id="q12",
+                question="Most controversial pizza topping historically?",
+                options=["Pineapple", "Anchovies", "Chocolate", "Eggs"],
+                correct_option=0,
+                points=5
+            )
+        ],
+        total_points=15
+    )
+]
+
+sample_users = [
+    User(id="student1", name="Current User", email="current.user@example.edu"),
+    User(id="student2", name="Sleepy Sam", email="sleepy.sam@example.edu"),
+]
+
+# Both demo users log in with "password123"
+sample_credentials = [
+    Credential(id="student1", password_hash="$2b$12$cFSm3NIHIj95wzEnXC2sieP5K1OJqWcg9rxSkv4CSTbYuDdlZHSji"),
+    Credential(id="student2", password_hash="$2b$12$d3lNhBZGRDJgt7LiVNHZHewct01Ka9UfoU4JrpVreKUmNIx1wD9By"),
+]
+
+sample_enrollments = [
+    Enrollment(id=enrollment_id(user_id, course_id), user_id=user_id, course_id=course_id)
+    for user_id, course_ids in (
+        ("student1", ["MEME-420", "NAPS-303", "PROCR-101", "PIZZA-505"]),
+        ("student2", ["NAPS-303", "PIZZA-505"]),
+    )
+    for course_id in course_ids
+]
+
+# The demo student's progress; assignments without a record are "not submitted"
+sample_assignment_statuses = [
+    AssignmentStatus(
+        id=assignment_status_id("student1", assignment.id),
+        user_id="student1",
+        assignment_id=assignment.id,
+        status=assignment.status,
+        updated_at=datetime.now()
+    )
+    for assignment in sample_assignments
+    if assignment.status and assignment.status != NOT_SUBMITTED
+]
+
+sample_data = {
+    "courses": sample_courses,
+    "assignments": sample_assignments,
+    "events": sample_events,
+    "announcements": sample_announcements,
+    "discussions": sample_discussions,
+    "discussion_replies": sample_discussion_replies,
+    "quizzes": sample_quizzes,
+    "users": sample_users,
+    "credentials": sample_credentials,
+    "enrollments": sample_enrollments,
+    "assignment_statuses": sample_assignment_statuses,
+}
@@ -0,0 +1,214 @@
+import heapq
+import math
+import os
+import pickle
+import re
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TOKEN_RE = re.compile(r"\w+")
+# Title terms count this many times towards a document's term frequencies
+TITLE_WEIGHT = 2
+# Prefix terms expand to at most this many vocabulary terms
+MAX_PREFIX_EXPANSION = 50
+SNAPSHOT_VERSION = 1
+
+# Collection -> (document type, text fields, reference fields) indexed for
+# search; discussions come before replies so replies can inherit a course
+INDEXED = {
+    "discussions": ("discussion", ("title", "content"), ("course_id",)),
+    "discussion_replies": ("reply", ("content",), ("post_id",)),
+    "announcements": ("announcement", ("title", "content"), ()),
+    "assignments": ("assignment", ("title", "description"), ("course_id",)),
+}
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+class SearchIndex:
+    """In-process inverted index with BM25 ranking and prefix matching.
+
+    Documents are added or replaced one at a time as they are written, and
+    the whole index can be pickled to a snapshot file so a restart only
+    has to load it.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        # term -> {doc number: term frequency}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        # Sorted vocabulary for prefix lookups
+        self._terms: List[str] = []
+        # doc number -> (type, id, course_id, post_id, title, length, terms)
+        self._docs: Dict[int, tuple] = {}
+        self._numbers: Dict[Tuple[str, str], int] = {}
+        self._next = 0
+        self._total_length = 0
+        # Revisions of the indexed collections this index reflects
+        self.revisions: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(
+        self,
+        doc_type: str,
+        doc_id: str,
+        title: Optional[str],
+        body: Iterable[Optional[str]],
+        course_id: Optional[str] = None,
+        post_id: Optional[str] = None,
+    ) -> None:
+        self.remove(doc_type, doc_id)
+        terms = Counter(tokenize(title))
+        for term in terms:
+            terms[term] *= TITLE_WEIGHT
+        for text in body:
+            terms.update(tokenize(text))
+
+        number = self._next
+        self._next += 1
+        length = sum(terms.values())
+        self._docs[number] = (doc_type, doc_id, course_id, post_id, title, length, tuple(terms))
+        self._numbers[(doc_type, doc_id)] = number
+        self._total_length += length
+        for term, tf in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                insort(self._terms, term)
+            postings[number] = tf
+
+    def remove(self, doc_type: str, doc_id: str) -> bool:
+        number = self._numbers.pop((doc_type, doc_id), None)
+        if number is None:
+            return False
+        doc = self._docs.pop(number)
+        self._total_length -= doc[5]
+        for term in doc[6]:
+            postings = self._postings[term]
+            del postings[number]
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect_left(self._terms, term)]
+        return True
+
+    def search(self, query: str, course_id: Optional[str] = None, limit: int = 20) -> List[dict]:
+        """Top matches for `query`; the last term (or any ending in `*`) also matches as a prefix."""
+        words = query.split()
+        if not words or not self._docs:
+            return []
+        terms: Dict[str, None] = {}
+        for i, word in enumerate(words):
+            prefix = word.endswith("*") or i == len(words) - 1
+            for token in tokenize(word):
+                terms[token] = None
+                if prefix:
+                    terms.update(dict.fromkeys(self._expand(token)))
+
+        n = len(self._docs)
+        avg_length = self._total_length / n
+        matched = [self._postings[term] for term in terms if term in self._postings]
+        if len(matched) > 1:
+            # Terms in over half the corpus add almost nothing to BM25 but
+            # cost the most to score, so drop them when rarer terms remain
+            rare = [postings for postings in matched if len(postings) <= n / 2]
+            matched = rare or matched
+        scores: Dict[int, float] = {}
+        for postings in matched:
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for number, tf in postings.items():
+                doc = self._docs[number]
+                if course_id is not None and doc[2] != course_id:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * doc[5] / avg_length)
+                scores[number] = scores.get(number, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        results = []
+        for number, score in heapq.nlargest(limit, scores.items(), key=lambda item: item[1]):
+            doc_type, doc_id, doc_course, post_id, title, _, _ = self._docs[number]
+            results.append({
+                "type": doc_type,
+                "id": doc_id,
+                "course_id": doc_course,
+                "post_id": post_id,
+                "title": title,
+                "score": score,
+            })
+        return results
+
+    def _expand(self, prefix: str) -> List[str]:
+        start = bisect_left(self._terms, prefix)
+        expanded = []
+        for term in self._terms[start:start + MAX_PREFIX_EXPANSION]:
+            if not term.startswith(prefix):
+                break
+            expanded.append(term)
+        return expanded
+
+    def save(self, path: str) -> None:
+        # Write then rename so a crash never leaves a truncated snapshot
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump((SNAPSHOT_VERSION, self.__dict__), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["SearchIndex"]:
+        """The snapshot at `path`, or None when it is missing or from another version."""
+        try:
+            with open(path, "rb") as f:
+                version, state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        if version != SNAPSHOT_VERSION:
+            return None
+        index = cls()
+        index.__dict__.update(state)
+        return index
+
+
+def index_document(index: SearchIndex, collection: str, doc: dict, course_id: Optional[str] = None) -> None:
+    doc_type, fields, _ = INDEXED[collection]
+    title = doc.get("title")
+    body = [doc.get(field) for field in fields if field != "title"]
+    index.add(doc_type, doc["id"], title, body, course_id or doc.get("course_id"), doc.get("post_id"))
+
+
+async def build_search_index(storage, snapshot_path: Optional[str] = None) -> SearchIndex:
+    """Load the snapshot if it matches the stored data, otherwise index everything."""
+    # Read before indexing, so a write landing during the build leaves the
+    # index looking stale rather than fresh
+    revisions = await storage.revisions(INDEXED)
+    if snapshot_path:
+        index = SearchIndex.load(snapshot_path)
+        if index is not None and index.revisions == revisions:
+            return index
+
+    index = SearchIndex()
+    post_courses = {}
+    for collection, (_, fields, references) in INDEXED.items():
+        for doc in await storage.find(collection, fields=("id", *references, *fields)):
+            if collection == "discussions":
+                post_courses[doc["id"]] = doc["course_id"]
+            index_document(index, collection, doc, post_courses.get(doc.get("post_id")))
+    index.revisions = revisions
+    return index
+
+
+async def save_search_index(index: SearchIndex, storage, snapshot_path: str) -> bool:
+    """Save the index if it is still a snapshot of the revisions it was built from.
+
+    The index keeps the revisions read before it was built. Any write since,
+    from this process or another, bumps them, and the index may or may not
+    hold that write, so it is not saved; the next start indexes everything.
+    """
+    if await storage.revisions(INDEXED) != index.revisions:
+        return False
+    index.save(snapshot_path)
+    return True
@@ -0,0 +1,127 @@
+"""Seeding empty storage from the sample data or a prebuilt snapshot of it.
+
+A snapshot holds each collection's documents as plain rows. Loading one
+is a single unpickle followed by validation in pydantic-core, with none
+of the Python that builds the sample models. Build one with
+
+    python seeding.py seed.snapshot
+
+and point SEED_SNAPSHOT_PATH at it. The sample data's dates are relative
+to startup, so a snapshot's dates are moved forward by the time since it
+was built.
+"""
+import argparse
+import logging
+import os
+import pickle
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, ValidationError
+
+from storage import Storage
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+# Collections the sample data fills; nothing is built when none is empty
+SEED_COLLECTIONS = (
+    "courses",
+    "assignments",
+    "events",
+    "announcements",
+    "discussions",
+    "discussion_replies",
+    "quizzes",
+    "users",
+    "credentials",
+    "enrollments",
+    "assignment_statuses",
+)
+
+SeedData = Dict[str, List[BaseModel]]
+
+
+def sample_data() -> SeedData:
+    # Imported here, so the sample models are only built when needed
+    from sampledata import sample_data
+
+    return sample_data
+
+
+def save_seed_snapshot(data: SeedData, path: str) -> None:
+    collections = {}
+    for name, items in data.items():
+        if items:
+            model = type(items[0])
+            rows = [tuple(item.model_dump().values()) for item in items]
+            collections[name] = (model, tuple(model.model_fields), rows)
+    # Write then rename so a crash never leaves a truncated snapshot
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump((SNAPSHOT_VERSION, datetime.now(), collections), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_seed_snapshot(path: str) -> Optional[SeedData]:
+    """The snapshot at `path`, or None when it is missing, from another version or no longer valid."""
+    try:
+        with open(path, "rb") as f:
+            version, built_at, collections = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError, ImportError):
+        logger.warning("Seed snapshot %s could not be read; using the sample data", path)
+        return None
+    if version != SNAPSHOT_VERSION:
+        return None
+
+    shift = datetime.now() - built_at
+    data = {}
+    try:
+        for name, (model, fields, rows) in collections.items():
+            dated = _datetime_positions(model, fields)
+            data[name] = [model.model_validate(dict(zip(fields, _shifted(row, dated, shift)))) for row in rows]
+    except ValidationError:
+        # The models changed since the snapshot was built
+        logger.warning("Seed snapshot %s no longer matches the models; using the sample data", path)
+        return None
+    return data
+
+
+def _datetime_positions(model, fields) -> List[int]:
+    annotations = {name: field.annotation for name, field in model.model_fields.items()}
+    return [i for i, name in enumerate(fields) if annotations.get(name) in (datetime, Optional[datetime])]
+
+
+def _shifted(row: tuple, positions: List[int], shift: timedelta) -> tuple:
+    if not positions:
+        return row
+    row = list(row)
+    for i in positions:
+        if row[i] is not None:
+            row[i] += shift
+    return row
+
+
+async def seed_storage(storage: Storage, snapshot_path: Optional[str] = None) -> None:
+    """Seed the collections that are still empty, from the snapshot when one is given and loads."""
+    empty = [name for name in SEED_COLLECTIONS if await storage.count(name) == 0]
+    if not empty:
+        return
+    data = load_seed_snapshot(snapshot_path) if snapshot_path else None
+    if data is None:
+        data = sample_data()
+    await storage.seed({name: data[name] for name in empty if name in data})
+
+
+def main_() -> None:
+    parser = argparse.ArgumentParser(description="Write the sample data to a seed snapshot.")
+    parser.add_argument("path")
+    args = parser.parse_args()
+    # The models are defined with the routes
+    import main  # noqa: F401
+
+    save_seed_snapshot(sample_data(), args.path)
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,48 @@
+from typing import Dict, Iterable, List, Optional, Type
+
+from fastapi import Response
+from pydantic import BaseModel
+
+from cache import EncodedCache
+from storage import Storage
+
+
+class JSONBytesResponse(Response):
+    """Response for bodies that are already encoded JSON bytes."""
+
+    media_type = "application/json"
+
+
+def encode(model: Type[BaseModel], doc: dict) -> bytes:
+    return model.model_validate(doc).model_dump_json().encode()
+
+
+async def encoded_one(
+    storage: Storage,
+    cache: EncodedCache,
+    collection: str,
+    model: Type[BaseModel],
+    key: str,
+) -> Optional[bytes]:
+    async def load() -> Optional[bytes]:
+        doc = await storage.get(collection, key)
+        return encode(model, doc) if doc is not None else None
+
+    return await cache.get_or_load(collection, key, load)
+
+
+async def encoded_list(
+    storage: Storage,
+    cache: EncodedCache,
+    collection: str,
+    model: Type[BaseModel],
+    keys: Iterable[str],
+) -> bytes:
+    """A JSON array of the given entities, fetching only the uncached ones."""
+    keys = list(keys)
+
+    async def load(missing: List[str]) -> Dict[str, bytes]:
+        return {doc["id"]: encode(model, doc) for doc in await storage.get_many(collection, missing)}
+
+    bodies = await cache.get_or_load_many(collection, keys, load)
+    return b"[" + b",".join(bodies[key] for key in keys if key in bodies) + b"]"
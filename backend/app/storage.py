@@ -0,0 +1,496 @@
+import os
+import sys
+import time
+from abc import ABC, abstractmethod
+from itertools import islice
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from pydantic import BaseModel
+
+from records import Record, to_record
+from repository import Repository
+
+
+class CollectionSpec(NamedTuple):
+    # Field giving the stable list order; ties are broken by id
+    order_by: str
+    # Secondary indexes maintained by every backend
+    indexes: Tuple[str, ...] = ()
+    # Fields with few distinct values; the memory backend keeps one copy of
+    # each value, as it already does for indexed fields
+    interned: Tuple[str, ...] = ()
+
+
+COLLECTIONS: Dict[str, CollectionSpec] = {
+    "courses": CollectionSpec("id"),
+    "assignments": CollectionSpec("due_date", ("course_id",), ("status",)),
+    "events": CollectionSpec("start_time", ("course_id",), ("location", "recurrence")),
+    "announcements": CollectionSpec("date", (), ("source",)),
+    "discussions": CollectionSpec("created_at", ("course_id",), ("author",)),
+    "discussion_replies": CollectionSpec("created_at", ("post_id",), ("author",)),
+    "quizzes": CollectionSpec("due_date", ("course_id",)),
+    # Append-only: submissions are never updated once written
+    "quiz_submissions": CollectionSpec("submitted_at", ("quiz_id",), ("student_id",)),
+    # Timed attempts, keyed "{user_id}:{quiz_id}"; startup reopens those
+    # still in progress through the status index
+    "quiz_attempts": CollectionSpec("started_at", ("status", "quiz_id"), ("student_id",)),
+    "users": CollectionSpec("id"),
+    # Password hashes, kept apart from user documents; keyed by user id
+    "credentials": CollectionSpec("id"),
+    # Keyed "{user_id}:{course_id}", so a membership check is a key lookup;
+    # the user_id index maps a user to their course set
+    "enrollments": CollectionSpec("course_id", ("user_id", "course_id"), ("role",)),
+    # A user's own status for an assignment, keyed "{user_id}:{assignment_id}"
+    "assignment_statuses": CollectionSpec("assignment_id", ("user_id",), ("status",)),
+    # Files attached to an assignment (submissions) or a discussion post;
+    # the content itself is in the blob store, keyed by its digest
+    "attachments": CollectionSpec("created_at", ("parent_id",), ("parent_type", "content_type", "uploaded_by")),
+    # Resumable uploads in progress, with the bytes received so far
+    "uploads": CollectionSpec("created_at", (), ("parent_type", "content_type", "uploaded_by")),
+}
+
+# MongoDB collection holding one revision counter per data collection
+REVISIONS_COLLECTION = "revisions"
+
+
+class Storage(ABC):
+    """Async document storage used by the API routes.
+
+    Documents are returned as plain dicts. Passing `fields` limits the
+    returned keys so callers only fetch what they actually render.
+
+    `find` returns documents ordered by the collection's `order_by` field
+    and id. `after` is a keyset cursor, the `(order value, id)` pair of the
+    last document already seen, and `limit` caps the number returned.
+
+    Every write bumps the written collection's revision, a counter that only
+    ever increases, so readers can tell whether a collection changed.
+    """
+
+    @abstractmethod
+    async def get(self, collection: str, key: str, fields: Optional[Iterable[str]] = None) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def get_many(self, collection: str, keys: Iterable[str], fields: Optional[Iterable[str]] = None) -> List[dict]:
+        """Documents for the given ids, in no particular order; unknown ids are skipped."""
+        ...
+
+    @abstractmethod
+    async def find(
+        self,
+        collection: str,
+        where: Optional[Dict[str, Any]] = None,
+        fields: Optional[Iterable[str]] = None,
+        after: Optional[Tuple[Any, str]] = None,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def find_keys(
+        self,
+        collection: str,
+        where: Optional[Dict[str, Any]] = None,
+        after: Optional[Tuple[Any, str]] = None,
+        limit: Optional[int] = None,
+    ) -> List[Tuple[Any, str]]:
+        """The `(order value, id)` pairs `find` would return, without the documents."""
+        ...
+
+    @abstractmethod
+    async def find_keys_grouped(
+        self,
+        collection: str,
+        field: str,
+        values: Iterable[Any],
+        limit: Optional[int] = None,
+    ) -> Dict[Any, List[Tuple[Any, str]]]:
+        """`find_keys` with `{field: value}` for each of `values`, as one query.
+
+        `field` must be one of the collection's indexes; `limit` caps each
+        value's keys. Every value is in the result, empty when nothing
+        matches.
+        """
+        ...
+
+    @abstractmethod
+    async def exists(self, collection: str, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def count(self, collection: str) -> int:
+        ...
+
+    @abstractmethod
+    async def insert(self, collection: str, item: BaseModel) -> None:
+        ...
+
+    @abstractmethod
+    async def insert_many(self, collection: str, items: List[BaseModel]) -> None:
+        ...
+
+    @abstractmethod
+    async def upsert(self, collection: str, item: BaseModel) -> None:
+        """Insert `item`, replacing any document with the same id."""
+        ...
+
+    @abstractmethod
+    async def upsert_many(self, collection: str, items: List[BaseModel]) -> None:
+        """`upsert` for every item, as one bulk write and one revision bump."""
+        ...
+
+    @abstractmethod
+    async def increment(self, collection: str, key: str, field: str, amount: int = 1) -> None:
+        ...
+
+    @abstractmethod
+    async def update_if(self, collection: str, key: str, where: Dict[str, Any], changes: Dict[str, Any]) -> bool:
+        """Set `changes` on the document if its fields equal `where`; whether it did.
+
+        The check and the write are one atomic step, so of several workers
+        making the same change only one succeeds.
+        """
+        ...
+
+    @abstractmethod
+    async def update_many_if(self, collection: str, where: Dict[str, Any], changes: Dict[str, Dict[str, Any]]) -> None:
+        """`update_if` for each key in `changes`, as one bulk write and one revision bump."""
+        ...
+
+    @abstractmethod
+    async def seed(self, data: Dict[str, List[BaseModel]]) -> None:
+        """Load initial data into collections that are still empty."""
+        ...
+
+    @abstractmethod
+    async def revisions(self, collections: Iterable[str]) -> List[int]:
+        """Current revision of each collection, in the order given."""
+        ...
+
+    @abstractmethod
+    async def accumulate(self, collection: str, key: str, increments: Dict[str, float]) -> None:
+        """Add to the named counters of a flat counter document, creating it if needed."""
+        ...
+
+    @abstractmethod
+    async def counters(self, collection: str, key: str) -> Optional[Dict[str, float]]:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryStorage(Storage):
+    """In-process storage backed by indexed repositories.
+
+    Used for local development and as a stand-in for MongoDB in tests.
+    Documents are held as compact records rather than the models they
+    were written as, and only become dicts when read.
+    """
+
+    def __init__(self):
+        self._repos: Dict[str, Repository[Record]] = {
+            name: Repository(indexes=spec.indexes, order_by=spec.order_by) for name, spec in COLLECTIONS.items()
+        }
+        self._interned = {name: frozenset(spec.indexes + spec.interned) for name, spec in COLLECTIONS.items()}
+        # Start from the clock so revisions keep increasing across restarts
+        base = time.time_ns()
+        self._revisions: Dict[str, int] = {name: base for name in COLLECTIONS}
+        self._counters: Dict[str, Dict[str, Dict[str, float]]] = {}
+
+    async def get(self, collection, key, fields=None):
+        item = self._repos[collection].get(key)
+        return item.dump(fields) if item is not None else None
+
+    async def get_many(self, collection, keys, fields=None):
+        repo = self._repos[collection]
+        return [item.dump(fields) for item in map(repo.get, keys) if item is not None]
+
+    async def find(self, collection, where=None, fields=None, after=None, limit=None):
+        repo = self._repos[collection]
+        where = dict(where or {})
+        # Serve one equality from an index, filter the rest while walking
+        indexed = next((name for name in where if name in COLLECTIONS[collection].indexes), None)
+        if indexed:
+            items = repo.iter_from(indexed, where.pop(indexed), after=after)
+        else:
+            items = repo.iter_from(after=after)
+        if where:
+            items = (i for i in items if all(getattr(i, k) == v for k, v in where.items()))
+        return [item.dump(fields) for item in islice(items, limit)]
+
+    async def find_keys(self, collection, where=None, after=None, limit=None):
+        repo = self._repos[collection]
+        where = dict(where or {})
+        indexed = next((name for name in where if name in COLLECTIONS[collection].indexes), None)
+        value = where.pop(indexed) if indexed else None
+        if not where:
+            return list(islice(repo.sort_keys_from(indexed, value, after=after), limit))
+        items = repo.iter_from(indexed, value, after=after)
+        items = (i for i in items if all(getattr(i, k) == v for k, v in where.items()))
+        return [repo.sort_key(item) for item in islice(items, limit)]
+
+    async def find_keys_grouped(self, collection, field, values, limit=None):
+        repo = self._repos[collection]
+        return {value: list(islice(repo.sort_keys_from(field, value), limit)) for value in values}
+
+    async def exists(self, collection, key):
+        return key in self._repos[collection]
+
+    async def count(self, collection):
+        return len(self._repos[collection])
+
+    async def insert(self, collection, item):
+        self._repos[collection].add(to_record(item, self._interned[collection]))
+        self._revisions[collection] += 1
+
+    async def insert_many(self, collection, items):
+        repo = self._repos[collection]
+        interned = self._interned[collection]
+        for item in items:
+            repo.add(to_record(item, interned))
+        self._revisions[collection] += 1
+
+    async def upsert(self, collection, item):
+        await self.upsert_many(collection, [item])
+
+    async def upsert_many(self, collection, items):
+        repo = self._repos[collection]
+        interned = self._interned[collection]
+        for item in items:
+            if item.id in repo:
+                repo.remove(item.id)
+            repo.add(to_record(item, interned))
+        self._revisions[collection] += 1
+
+    async def increment(self, collection, key, field, amount=1):
+        repo = self._repos[collection]
+        item = repo.get(key)
+        if item is not None:
+            # Nothing awaits between the read and the write, so concurrent
+            # requests on the event loop cannot lose an increment
+            repo.update(key, **{field: getattr(item, field) + amount})
+            self._revisions[collection] += 1
+
+    async def update_if(self, collection, key, where, changes):
+        updated = self._update_if(collection, key, where, changes)
+        if updated:
+            self._revisions[collection] += 1
+        return updated
+
+    async def update_many_if(self, collection, where, changes):
+        updated = [key for key, fields in changes.items() if self._update_if(collection, key, where, fields)]
+        if updated:
+            self._revisions[collection] += 1
+
+    def _update_if(self, collection, key, where, changes) -> bool:
+        # Checked and written with nothing awaited in between, so no other
+        # request can change the document meanwhile
+        repo = self._repos[collection]
+        item = repo.get(key)
+        if item is None or any(getattr(item, name) != value for name, value in where.items()):
+            return False
+        interned = self._interned[collection]
+        repo.update(key, **{name: _record_value(name, value, interned) for name, value in changes.items()})
+        return True
+
+    async def seed(self, data):
+        for name, items in data.items():
+            repo = self._repos[name]
+            if not len(repo):
+                interned = self._interned[name]
+                for item in items:
+                    repo.add(to_record(item, interned))
+                self._revisions[name] += 1
+
+    async def revisions(self, collections):
+        return [self._revisions[name] for name in collections]
+
+    async def accumulate(self, collection, key, increments):
+        counters = self._counters.setdefault(collection, {}).setdefault(key, {})
+        for name, amount in increments.items():
+            counters[name] = counters.get(name, 0) + amount
+
+    async def counters(self, collection, key):
+        counters = self._counters.get(collection, {}).get(key)
+        return dict(counters) if counters is not None else None
+
+
+class MongoStorage(Storage):
+    """MongoDB storage built on motor with a single shared connection pool."""
+
+    def __init__(self, url: str, db_name: str):
+        # Imported lazily so the in-memory backend works without motor installed
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        self._client = AsyncIOMotorClient(
+            url,
+            maxPoolSize=int(os.getenv("MONGODB_MAX_POOL_SIZE", "100")),
+            minPoolSize=int(os.getenv("MONGODB_MIN_POOL_SIZE", "10")),
+            maxIdleTimeMS=int(os.getenv("MONGODB_MAX_IDLE_MS", "60000")),
+            waitQueueTimeoutMS=int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "5000")),
+            serverSelectionTimeoutMS=int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+            retryWrites=True,
+        )
+        self._db = self._client[db_name]
+
+    async def ensure_indexes(self) -> None:
+        for name, spec in COLLECTIONS.items():
+            collection = self._db[name]
+            await collection.create_index("id", unique=True)
+            # Compound indexes serve keyset pages in list order without sorting
+            await collection.create_index([(spec.order_by, 1), ("id", 1)])
+            for field in spec.indexes:
+                await collection.create_index([(field, 1), (spec.order_by, 1), ("id", 1)])
+
+    async def get(self, collection, key, fields=None):
+        return await self._db[collection].find_one({"id": key}, _projection(fields))
+
+    async def get_many(self, collection, keys, fields=None):
+        cursor = self._db[collection].find({"id": {"$in": list(keys)}}, _projection(fields))
+        return await cursor.to_list(length=None)
+
+    async def find(self, collection, where=None, fields=None, after=None, limit=None):
+        order_by = COLLECTIONS[collection].order_by
+        query = dict(where or {})
+        if after is not None:
+            value, key = after
+            query["$or"] = [{order_by: {"$gt": value}}, {order_by: value, "id": {"$gt": key}}]
+        cursor = self._db[collection].find(query, _projection(fields)).sort([(order_by, 1), ("id", 1)])
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(length=None)
+
+    async def find_keys(self, collection, where=None, after=None, limit=None):
+        order_by = COLLECTIONS[collection].order_by
+        docs = await self.find(collection, where, (order_by, "id"), after=after, limit=limit)
+        return [(doc[order_by], doc["id"]) for doc in docs]
+
+    async def find_keys_grouped(self, collection, field, values, limit=None):
+        order_by = COLLECTIONS[collection].order_by
+        values = list(values)
+        # Sorted on the (field, order_by, id) index, then each value's keys
+        # collected in that order
+        pipeline = [
+            {"$match": {field: {"$in": values}}},
+            {"$sort": {field: 1, order_by: 1, "id": 1}},
+            {"$group": {"_id": f"${field}", "keys": {"$push": [f"${order_by}", "$id"]}}},
+        ]
+        if limit is not None:
+            pipeline.append({"$project": {"keys": {"$slice": ["$keys", limit]}}})
+        grouped = {value: [] for value in values}
+        async for group in self._db[collection].aggregate(pipeline):
+            grouped[group["_id"]] = [tuple(key) for key in group["keys"]]
+        return grouped
+
+    async def exists(self, collection, key):
+        return await self._db[collection].find_one({"id": key}, {"_id": 1}) is not None
+
+    async def count(self, collection):
+        return await self._db[collection].estimated_document_count()
+
+    async def insert(self, collection, item):
+        await self._db[collection].insert_one(item.model_dump())
+        await self._bump(collection)
+
+    async def insert_many(self, collection, items):
+        if items:
+            await self._db[collection].insert_many([item.model_dump() for item in items], ordered=False)
+            await self._bump(collection)
+
+    async def upsert(self, collection, item):
+        await self._db[collection].replace_one({"id": item.id}, item.model_dump(), upsert=True)
+        await self._bump(collection)
+
+    async def upsert_many(self, collection, items):
+        if items:
+            from pymongo import ReplaceOne
+
+            requests = [ReplaceOne({"id": item.id}, item.model_dump(), upsert=True) for item in items]
+            await self._db[collection].bulk_write(requests, ordered=False)
+            await self._bump(collection)
+
+    async def increment(self, collection, key, field, amount=1):
+        result = await self._db[collection].update_one({"id": key}, {"$inc": {field: amount}})
+        if result.modified_count:
+            await self._bump(collection)
+
+    async def update_if(self, collection, key, where, changes):
+        # One update_one, so the match and the write are atomic across workers
+        result = await self._db[collection].update_one({**where, "id": key}, {"$set": dict(changes)})
+        if result.modified_count:
+            await self._bump(collection)
+        return bool(result.matched_count)
+
+    async def update_many_if(self, collection, where, changes):
+        if changes:
+            from pymongo import UpdateOne
+
+            requests = [UpdateOne({**where, "id": key}, {"$set": dict(fields)}) for key, fields in changes.items()]
+            result = await self._db[collection].bulk_write(requests, ordered=False)
+            if result.modified_count:
+                await self._bump(collection)
+
+    async def seed(self, data):
+        for name, items in data.items():
+            collection = self._db[name]
+            if items and await collection.estimated_document_count() == 0:
+                await collection.insert_many([item.model_dump() for item in items], ordered=False)
+                await self._bump(name)
+
+    async def revisions(self, collections):
+        collections = list(collections)
+        cursor = self._db[REVISIONS_COLLECTION].find({"_id": {"$in": collections}})
+        found = {doc["_id"]: doc["rev"] for doc in await cursor.to_list(length=None)}
+        return [found.get(name, 0) for name in collections]
+
+    async def accumulate(self, collection, key, increments):
+        # A single $inc per call, so concurrent workers' updates compose atomically
+        await self._db[collection].update_one({"_id": key}, {"$inc": dict(increments)}, upsert=True)
+
+    async def counters(self, collection, key):
+        doc = await self._db[collection].find_one({"_id": key})
+        if doc is None:
+            return None
+        doc.pop("_id")
+        return doc
+
+    async def _bump(self, collection: str) -> None:
+        # Shared by every worker, so all of them agree on what changed
+        await self._db[REVISIONS_COLLECTION].update_one({"_id": collection}, {"$inc": {"rev": 1}}, upsert=True)
+
+    async def close(self):
+        self._client.close()
+
+
+def _record_value(name: str, value: Any, interned: FrozenSet[str]) -> Any:
+    # The form to_record stores a field value in
+    if type(value) is list:
+        return tuple(value)
+    if type(value) is str and name in interned:
+        return sys.intern(value)
+    return value
+
+
+def _projection(fields: Optional[Iterable[str]]) -> dict:
+    projection = {"_id": 0}
+    if fields is not None:
+        projection.update({field: 1 for field in fields})
+    return projection
+
+
+async def open_storage() -> Storage:
+    """Create the storage backend selected by STORAGE_BACKEND.
+
+    Defaults to MongoDB when MONGODB_URL is set and to the in-memory backend
+    otherwise.
+    """
+    backend = os.getenv("STORAGE_BACKEND") or ("mongo" if os.getenv("MONGODB_URL") else "memory")
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "mongo":
+        storage = MongoStorage(os.getenv("MONGODB_URL", "mongodb://localhost:27017"), os.getenv("DB_NAME", "canvas_db"))
+        await storage.ensure_indexes()
+        return storage
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}'")
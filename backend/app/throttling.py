@@ -0,0 +1,273 @@
+import asyncio
+import logging
+import math
+import os
+import re
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Pattern, Tuple
+
+from starlette.routing import compile_path
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimit(NamedTuple):
+    requests: int
+    period: float  # seconds
+
+    @property
+    def interval(self) -> float:
+        return self.period / self.requests
+
+
+class MemoryRateLimitStore:
+    """Rate limit state for this process only.
+
+    Stand-in for a shared store: with several workers each one enforces
+    the full budget on its own. `RedisRateLimitStore` implements the same
+    `take` so all workers share one budget per client.
+    """
+
+    # Expired buckets are swept after this many new ones
+    SWEEP_EVERY = 10_000
+
+    def __init__(self):
+        self._tats: Dict[str, float] = {}
+        self._added = 0
+
+    async def take(self, key: str, limit: RateLimit) -> float:
+        """Spend one request from `key`'s budget; returns 0, or seconds until allowed."""
+        now = time.monotonic()
+        tat = self._tats.get(key)
+        if tat is None:
+            self._added += 1
+            if self._added >= self.SWEEP_EVERY:
+                self._sweep(now)
+        retry_after, new_tat = _gcra(now, tat, limit)
+        if not retry_after:
+            self._tats[key] = new_tat
+        return retry_after
+
+    async def close(self) -> None:
+        pass
+
+    def _sweep(self, now: float) -> None:
+        self._added = 0
+        self._tats = {key: tat for key, tat in self._tats.items() if tat > now}
+
+
+def _gcra(now: float, tat: Optional[float], limit: RateLimit) -> Tuple[float, float]:
+    # Generic cell rate algorithm: a token bucket stored as the single
+    # "theoretical arrival time" at which the bucket is full again
+    tat = max(tat or now, now)
+    new_tat = tat + limit.interval
+    allow_at = new_tat - limit.period
+    return (allow_at - now if allow_at > now else 0.0), new_tat
+
+
+# Same algorithm as `_gcra`, atomic in Redis and timed by the Redis clock so
+# workers with skewed clocks agree
+_GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + interval
+local allow_at = new_tat - period
+if allow_at > now then return tostring(allow_at - now) end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return '0'
+"""
+
+
+class RedisRateLimitStore:
+    """Rate limit state shared by every worker through Redis."""
+
+    def __init__(self, url: str):
+        # Imported lazily so the app runs without redis installed
+        from redis.asyncio import Redis
+
+        self._redis = Redis.from_url(url)
+        self._script = self._redis.register_script(_GCRA_SCRIPT)
+
+    async def take(self, key: str, limit: RateLimit) -> float:
+        try:
+            return float(await self._script(keys=[key], args=[limit.interval, limit.period]))
+        except Exception:
+            # An unavailable limiter must not take the API down with it
+            logger.exception("Rate limit store unavailable; allowing request")
+            return 0.0
+
+    async def close(self) -> None:
+        await self._redis.close()
+
+
+def open_rate_limit_store():
+    url = os.getenv("RATE_LIMIT_REDIS_URL")
+    return RedisRateLimitStore(url) if url else MemoryRateLimitStore()
+
+
+def parse_rate_limit(value: str) -> RateLimit:
+    """`"600/60"` -> 600 requests per 60 seconds."""
+    requests, _, period = value.partition("/")
+    return RateLimit(int(requests), float(period or 60))
+
+
+class RateLimiter:
+    """Per-client budgets: one across all routes plus tighter per-route ones.
+
+    Route budgets are keyed by method and path template, e.g.
+    `("POST", "/quizzes/{quiz_id}/submit")`, and are spent in addition to
+    the default budget.
+    """
+
+    def __init__(
+        self,
+        store,
+        default: RateLimit = parse_rate_limit(os.getenv("RATE_LIMIT_DEFAULT", "600/60")),
+        routes: Optional[Dict[Tuple[str, str], RateLimit]] = None,
+    ):
+        self.store = store
+        self.default = default
+        self.limited = 0
+        self._routes: List[Tuple[str, Pattern, str, RateLimit]] = [
+            (method, compile_path(path)[0], path, limit) for (method, path), limit in (routes or {}).items()
+        ]
+
+    async def check(self, method: str, path: str, client: str) -> float:
+        """0 when the request may proceed, otherwise seconds until it would be allowed."""
+        retry_after = await self.store.take(f"ratelimit:*:{client}", self.default)
+        if not retry_after:
+            for route_method, pattern, template, limit in self._routes:
+                if method == route_method and pattern.match(path):
+                    retry_after = await self.store.take(f"ratelimit:{method} {template}:{client}", limit)
+                    break
+        if retry_after:
+            self.limited += 1
+        return retry_after
+
+    async def close(self) -> None:
+        await self.store.close()
+
+
+class LoadShedder:
+    """Turns requests away while the process is overloaded.
+
+    Overload means too many requests in flight or an event loop running
+    late. Lag is sampled by a background task that times a short sleep, and
+    only counts once two samples in a row are late, so a single stall such
+    as a GC pause or a burst of writes is absorbed instead of shed.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = int(os.getenv("SHED_MAX_IN_FLIGHT", "1000")),
+        max_lag: float = float(os.getenv("SHED_MAX_LAG_MS", "200")) / 1000,
+        interval: float = 0.05,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_lag = max_lag
+        self.interval = interval
+        self.in_flight = 0
+        self.lag = 0.0
+        self._late = 0.0
+        self.shed = 0
+        self._monitor: Optional[asyncio.Task] = None
+
+    def overloaded(self) -> bool:
+        return self.in_flight >= self.max_in_flight or self.lag > self.max_lag
+
+    async def start(self) -> None:
+        self._monitor = asyncio.create_task(self._watch_lag())
+
+    async def close(self) -> None:
+        if self._monitor is not None:
+            self._monitor.cancel()
+
+    async def _watch_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.record(loop.time() - start - self.interval)
+
+    def record(self, late: float) -> None:
+        """Take a lag sample: seconds the loop woke late from the monitor's sleep."""
+        # The lower of the last two samples: sustained lag, which clears as
+        # soon as the loop is on time again
+        self.lag = min(late, self._late)
+        self._late = late
+
+
+class ThrottlingMiddleware:
+    """Load shedding (503) and rate limiting (429), both with Retry-After.
+
+    The limiter and shedder live on `app.state` and are created in the
+    lifespan. Long-lived responses such as event streams are exempt from
+    the in-flight count, and paths listed in `exempt` are never throttled.
+    """
+
+    def __init__(self, app: ASGIApp, streaming: Iterable[str] = (), exempt: Iterable[str] = ()):
+        self.app = app
+        self.streaming = frozenset(streaming)
+        self.exempt = frozenset(exempt)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+        state = scope["app"].state
+        shedder: LoadShedder = state.load_shedder
+        if shedder.overloaded():
+            shedder.shed += 1
+            await _reject(send, 503, "Server overloaded, retry shortly", 1)
+            return
+
+        retry_after = await state.rate_limiter.check(scope["method"], scope["path"], _client_key(scope))
+        if retry_after:
+            await _reject(send, 429, "Too many requests", retry_after)
+            return
+
+        if scope["path"] in self.streaming:
+            await self.app(scope, receive, send)
+            return
+        shedder.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            shedder.in_flight -= 1
+
+
+_BEARER = re.compile(rb"^bearer\s+(\S+)$", re.IGNORECASE)
+
+
+def _client_key(scope: Scope) -> str:
+    # Budgets follow the authenticated user, falling back to the client IP
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            match = _BEARER.match(value)
+            if match:
+                try:
+                    return "user:" + scope["app"].state.tokens.verify(match.group(1).decode())["sub"]
+                except Exception:
+                    pass
+            break
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+async def _reject(send: Send, status: int, detail: str, retry_after: float) -> None:
+    body = b'{"detail":"' + detail.encode() + b'"}'
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(math.ceil(retry_after)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,168 @@
+import heapq
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from itertools import chain, count, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Dashboard item type -> the field its position on the timeline is keyed by
+DATE_FIELDS = {
+    "assignment": "due_date",
+    "event": "start_time",
+    "announcement": "date",
+}
+
+
+def assignment_entry(assignment: dict) -> dict:
+    return {
+        "type": "assignment",
+        "id": assignment["id"],
+        "course_id": assignment["course_id"],
+        "title": assignment["title"],
+        "due_date": assignment["due_date"].isoformat(),
+        "points": assignment["points"],
+        "status": assignment["status"]
+    }
+
+
+def event_entry(event: dict) -> dict:
+    return {
+        "type": "event",
+        "id": event["id"],
+        "title": event["title"],
+        "start_time": event["start_time"].isoformat(),
+        "end_time": event["end_time"].isoformat(),
+        "location": event["location"],
+        "course_id": event["course_id"]
+    }
+
+
+def announcement_entry(announcement: dict) -> dict:
+    return {
+        "type": "announcement",
+        "id": announcement["id"],
+        "source": announcement["source"],
+        "title": announcement["title"],
+        "content": announcement["content"],
+        "date": announcement["date"].isoformat()
+    }
+
+
+ENTRY_BUILDERS = {
+    "assignment": assignment_entry,
+    "event": event_entry,
+    "announcement": announcement_entry,
+}
+
+# Fields each item type needs from storage to build its entry
+ENTRY_FIELDS = {
+    "assignment": ("id", "course_id", "title", "due_date", "points", "status"),
+    "event": ("id", "title", "start_time", "end_time", "location", "course_id"),
+    "announcement": ("id", "source", "title", "content", "date"),
+}
+
+
+class _Stream:
+    """One course's entries, sorted by (datetime, insertion sequence)."""
+
+    __slots__ = ("keys", "entries")
+
+    def __init__(self):
+        self.keys: List[Tuple[datetime, int]] = []
+        self.entries: List[dict] = []
+
+
+class Timeline:
+    """Date-ordered dashboard items, partitioned into per-course streams.
+
+    Entries are serialized once when an item is added or changed and kept
+    sorted by their real datetime within their course's stream. Items
+    without a course, such as announcements, form a stream everyone sees.
+    Reading a window is a bisect per visible stream and a k-way merge of
+    the slices, so its cost depends on the user's courses, not on the
+    whole catalog. Items with the same datetime keep their insertion order.
+    """
+
+    def __init__(self):
+        self._streams: Dict[Optional[str], _Stream] = {}
+        self._positions: Dict[Tuple[str, str], Tuple[Optional[str], Tuple[datetime, int]]] = {}
+        self._seq = count()
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def upsert(self, kind: str, item: dict) -> None:
+        self.remove(kind, item["id"])
+        course_id = item.get("course_id")
+        stream = self._streams.get(course_id)
+        if stream is None:
+            stream = self._streams[course_id] = _Stream()
+        key = (item[DATE_FIELDS[kind]], next(self._seq))
+        index = bisect_right(stream.keys, key)
+        stream.keys.insert(index, key)
+        stream.entries.insert(index, ENTRY_BUILDERS[kind](item))
+        self._positions[(kind, item["id"])] = (course_id, key)
+
+    def extend(self, kind: str, items: Iterable[dict]) -> None:
+        for item in items:
+            self.upsert(kind, item)
+
+    def remove(self, kind: str, item_id: str) -> bool:
+        position = self._positions.pop((kind, item_id), None)
+        if position is None:
+            return False
+        course_id, key = position
+        stream = self._streams[course_id]
+        index = bisect_left(stream.keys, key)
+        del stream.keys[index]
+        del stream.entries[index]
+        if not stream.keys:
+            del self._streams[course_id]
+        return True
+
+    def window(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        course_ids: Optional[Iterable[str]] = None,
+    ) -> List[dict]:
+        """Entries dated within [start, end], oldest first, at most `limit`.
+
+        With `course_ids`, only those courses' items and the items without
+        a course are included.
+        """
+        start, end = naive(start), naive(end)
+        if course_ids is None:
+            streams = list(self._streams.values())
+        else:
+            streams = [self._streams[c] for c in chain((None,), course_ids) if c in self._streams]
+        runs = []
+        for stream in streams:
+            lo = bisect_left(stream.keys, (start,)) if start is not None else 0
+            hi = bisect_right(stream.keys, (end, float("inf"))) if end is not None else len(stream.keys)
+            if limit is not None:
+                hi = min(hi, lo + limit)
+            if lo < hi:
+                runs.append(_run(stream, lo, hi))
+        # Keys are unique, so the merge never has to compare entries
+        return [entry for _, entry in islice(heapq.merge(*runs), limit)]
+
+
+def _run(stream: _Stream, lo: int, hi: int) -> Iterator[Tuple[Tuple[datetime, int], dict]]:
+    keys, entries = stream.keys, stream.entries
+    for i in range(lo, hi):
+        yield keys[i], entries[i]
+
+
+def naive(value: Optional[datetime]) -> Optional[datetime]:
+    # Stored dates are naive local times; align aware query bounds with them
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+async def build_timeline(storage) -> Timeline:
+    timeline = Timeline()
+    for kind, collection in (("assignment", "assignments"), ("event", "events"), ("announcement", "announcements")):
+        timeline.extend(kind, await storage.find(collection, fields=ENTRY_FIELDS[kind]))
+    return timeline
@@ -0,0 +1,42 @@
+from typing import List
+
+from storage import Storage
+
+# Status of an assignment the user has no status record for
+NOT_SUBMITTED = "not submitted"
+
+
+def enrollment_id(user_id: str, course_id: str) -> str:
+    return f"{user_id}:{course_id}"
+
+
+def assignment_status_id(user_id: str, assignment_id: str) -> str:
+    return f"{user_id}:{assignment_id}"
+
+
+async def user_course_ids(storage: Storage, user_id: str) -> List[str]:
+    """Ids of the courses `user_id` is enrolled in, served by the enrollment index."""
+    enrollments = await storage.find("enrollments", where={"user_id": user_id}, fields=("course_id",))
+    return [enrollment["course_id"] for enrollment in enrollments]
+
+
+async def is_enrolled(storage: Storage, user_id: str, course_id: str) -> bool:
+    return await storage.exists("enrollments", enrollment_id(user_id, course_id))
+
+
+async def is_teacher(storage: Storage, user_id: str, course_id: str) -> bool:
+    enrollment = await storage.get("enrollments", enrollment_id(user_id, course_id), fields=("role",))
+    return enrollment is not None and enrollment["role"] == "teacher"
+
+
+async def with_assignment_statuses(storage: Storage, user_id: str, entries: List[dict]) -> List[dict]:
+    """Dashboard entries with each assignment's status replaced by the user's own."""
+    keys = [assignment_status_id(user_id, entry["id"]) for entry in entries if entry["type"] == "assignment"]
+    if not keys:
+        return entries
+    docs = await storage.get_many("assignment_statuses", keys, fields=("assignment_id", "status"))
+    statuses = {doc["assignment_id"]: doc["status"] for doc in docs}
+    return [
+        {**entry, "status": statuses.get(entry["id"], NOT_SUBMITTED)} if entry["type"] == "assignment" else entry
+        for entry in entries
+    ]
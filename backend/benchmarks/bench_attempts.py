@@ -0,0 +1,186 @@
+"""Timed quiz attempts: timer wheel vs one task per attempt, and autosave coalescing.
+
+For each number of concurrent attempts, with deadlines spread over the
+next hour, reports:
+
+- timers: time and memory to schedule every deadline, once as a sleeping
+  asyncio task per attempt and once on the `TimerWheel`, then the wheel's
+  cost per tick and to expire every attempt across the hour
+- autosaves: each attempt saving `--saves` times, written one upsert per
+  save and through `QuizSessions`, which writes one batch per flush
+
+Run from the backend directory:
+
+    python benchmarks/bench_attempts.py --sizes 10000 50000 --saves 20
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+import main  # noqa: E402
+from attempts import ATTEMPTS_COLLECTION, QuizSessions, TimerWheel  # noqa: E402
+from storage import MemoryStorage  # noqa: E402
+
+WINDOW_SECONDS = 3600
+
+
+def deadlines(count: int, now: float) -> list:
+    return [now + random.uniform(0, WINDOW_SECONDS) for _ in range(count)]
+
+
+async def time_tasks(due: list, now: float) -> dict:
+    # The approach the wheel replaces: a task sleeping until each deadline
+    async def expire_at(deadline: float) -> None:
+        await asyncio.sleep(deadline - now)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(expire_at(deadline)) for deadline in due]
+    await asyncio.sleep(0)  # let every task reach its sleep
+    seconds = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return {"schedule_seconds": seconds, "memory_bytes": memory}
+
+
+def time_wheel(due: list, now: float) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    wheel: TimerWheel[int] = TimerWheel(now=now)
+    for key, deadline in enumerate(due):
+        wheel.schedule(key, deadline)
+    seconds = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    expired = 0
+    ticks = 0
+    while len(wheel):
+        ticks += 1
+        expired += len(wheel.advance(now + ticks))
+    assert expired == len(due)
+    expire_seconds = time.perf_counter() - start
+    return {
+        "schedule_seconds": seconds,
+        "memory_bytes": memory,
+        "tick_seconds": expire_seconds / ticks,
+        "expire_seconds": expire_seconds,
+    }
+
+
+class CountingStorage(MemoryStorage):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    async def upsert_many(self, collection, items):
+        self.writes += 1
+        await super().upsert_many(collection, items)
+
+    async def update_many_if(self, collection, where, changes):
+        self.writes += 1
+        await super().update_many_if(collection, where, changes)
+
+
+def attempts(count: int) -> list:
+    now = datetime.now()
+    return [
+        main.QuizAttempt(
+            id=f"student{i}:quiz",
+            quiz_id="quiz",
+            course_id="course",
+            student_id=f"student{i}",
+            answers=[None] * 40,
+            started_at=now,
+            deadline=now + timedelta(hours=1),
+            saved_at=now,
+        )
+        for i in range(count)
+    ]
+
+
+async def time_autosaves(count: int, saves: int) -> dict:
+    results = {}
+    for approach in ("upsert per save", "coalesced"):
+        storage = CountingStorage()
+        sessions = QuizSessions(storage, lambda attempt_ids: asyncio.sleep(0))
+        opened = attempts(count)
+        # Flushes only update attempts stored as in progress
+        await storage.upsert_many(ATTEMPTS_COLLECTION, opened)
+        storage.writes = 0
+        for attempt in opened:
+            sessions.open(attempt.id, attempt.deadline)
+        start = time.perf_counter()
+        for round_ in range(saves):
+            for attempt in opened:
+                answers = list(attempt.answers)
+                answers[round_ % len(answers)] = round_ % 4
+                saved = attempt.model_copy(update={"answers": answers})
+                if approach == "coalesced":
+                    sessions.save(saved)
+                else:
+                    await storage.upsert(ATTEMPTS_COLLECTION, saved)
+            if approach == "coalesced" and round_ % 2:
+                # Two saves per attempt between flushes
+                await sessions.flush()
+        await sessions.flush()
+        results[approach] = {"seconds": time.perf_counter() - start, "writes": storage.writes}
+    return results
+
+
+async def measure(args: argparse.Namespace) -> dict:
+    results = {}
+    print(f"{'attempts':>9} {'approach':<16} {'schedule':>10} {'memory':>10} {'per tick':>10} {'expire all':>11}")
+    for size in args.sizes:
+        now = time.time()
+        due = deadlines(size, now)
+        tasks = await time_tasks(due, now)
+        wheel = time_wheel(due, now)
+        results[f"{size} timers"] = {"tasks": tasks, "wheel": wheel}
+        print(
+            f"{size:>9} {'task per attempt':<16} {tasks['schedule_seconds'] * 1e3:>7.1f} ms "
+            f"{tasks['memory_bytes'] / 2**20:>7.1f} MB"
+        )
+        print(
+            f"{size:>9} {'timer wheel':<16} {wheel['schedule_seconds'] * 1e3:>7.1f} ms "
+            f"{wheel['memory_bytes'] / 2**20:>7.1f} MB {wheel['tick_seconds'] * 1e6:>7.1f} us "
+            f"{wheel['expire_seconds'] * 1e3:>8.1f} ms"
+        )
+
+    print(f"\n{'attempts':>9} {'saves':>6} {'approach':<16} {'writes':>8} {'total':>10}")
+    for size in args.sizes:
+        autosaves = await time_autosaves(size, args.saves)
+        results[f"{size} autosaves"] = autosaves
+        for approach, result in autosaves.items():
+            print(f"{size:>9} {args.saves:>6} {approach:<16} {result['writes']:>8} {result['seconds'] * 1e3:>7.0f} ms")
+    return results
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--saves", type=int, default=20, help="autosaves per attempt")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    results = asyncio.run(measure(args))
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main_()
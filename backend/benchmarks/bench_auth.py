@@ -0,0 +1,133 @@
+"""Cost of authentication: token verification per request and bcrypt logins.
+
+Compares an open route with one behind the bearer-token dependency, with
+and without the claims cache. It then measures event-loop latency while
+logins are in flight, with bcrypt run inline vs on the hashing pool;
+login throughput scales with AUTH_HASH_WORKERS up to the core count.
+Run from the backend directory:
+
+    python benchmarks/bench_auth.py --requests 5000
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+import bcrypt  # noqa: E402
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI  # noqa: E402
+
+import main  # noqa: E402
+import sampledata  # noqa: E402
+from auth import TokenVerifier, verify_password  # noqa: E402
+
+SECRET = "bench-secret"
+PASSWORD_HASH = sampledata.sample_credentials[0].password_hash  # "password123"
+
+
+def bench_app(tokens: TokenVerifier) -> FastAPI:
+    app = FastAPI()
+    app.state.tokens = tokens
+
+    @app.get("/open")
+    async def open_route():
+        return {}
+
+    @app.get("/protected")
+    async def protected_route(user_id: str = Depends(main.get_current_user_id)):
+        return {}
+
+    @app.post("/login/inline")
+    async def login_inline():
+        # What a naive handler does: bcrypt on the event loop
+        return {"ok": bcrypt.checkpw(b"password123", PASSWORD_HASH.encode())}
+
+    @app.post("/login/pool")
+    async def login_pool():
+        return {"ok": await verify_password("password123", PASSWORD_HASH)}
+
+    return app
+
+
+async def per_request_us(client: httpx.AsyncClient, path: str, requests: int) -> float:
+    await client.get(path)
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = await client.get(path)
+    assert response.status_code == 200, response.text
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+async def loop_lag_during_logins(client: httpx.AsyncClient, path: str, logins: int) -> List[float]:
+    """How late a 5 ms timer fires while the logins run, in ms."""
+    lags: List[float] = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append((time.perf_counter() - start) * 1e3 - 5)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    await asyncio.gather(*(client.post(path) for _ in range(logins)))
+    done.set()
+    await task
+    return lags
+
+
+async def run(requests: int, logins: int) -> None:
+    cached = TokenVerifier(SECRET)
+    uncached = TokenVerifier(SECRET, max_entries=0)
+    token = cached.issue("student1", "Current User")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    results = {}
+    for label, tokens in (("cached", cached), ("uncached", uncached)):
+        app = bench_app(tokens)
+        async with httpx.AsyncClient(app=app, base_url="http://bench", headers=headers) as client:
+            results["open"] = await per_request_us(client, "/open", requests)
+            results[label] = await per_request_us(client, "/protected", requests)
+    print(f"open route:                 {results['open']:7.1f} us/request")
+    for label in ("cached", "uncached"):
+        overhead = results[label] - results["open"]
+        print(f"protected, {label + ' claims':<16}{results[label]:7.1f} us/request (+{overhead:.1f} us)")
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        uncached.verify(token)
+    decode_us = (time.perf_counter() - start) / requests * 1e6
+    start = time.perf_counter()
+    for _ in range(requests):
+        cached.verify(token)
+    hit_us = (time.perf_counter() - start) / requests * 1e6
+    print(f"verify: {decode_us:.1f} us decoding, {hit_us:.2f} us from the cache")
+
+    app = bench_app(cached)
+    async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=120) as client:
+        for path in ("/login/inline", "/login/pool"):
+            start = time.perf_counter()
+            lags = await loop_lag_during_logins(client, path, logins)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{logins} logins via {path}: {logins / elapsed:.1f} logins/s, "
+                f"event loop lag p50 {statistics.median(lags):.1f} ms, max {max(lags):.1f} ms"
+            )
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--logins", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.logins))
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,180 @@
+"""Bytes on the wire and CPU per request with response compression.
+
+Seeds a synthetic tenant and fetches the large JSON payloads: the
+dashboard, a course's quizzes with their questions, a discussion thread
+and the course list. For each payload it reports:
+
+- every coding at its per-request and cached level: compressed size and
+  time to compress
+- requests through the app per Accept-Encoding: bytes on the wire and
+  process CPU per request, once compressing every response (cold) and
+  once served from the compressed cache (warm)
+- a size sweep of the course list cut short, for tuning
+  COMPRESSION_MIN_BYTES: below it compression saves too few bytes to pay
+  for its CPU
+
+The synthetic text draws on a small vocabulary, so ratios are somewhat
+better than real course content gets. Run from the backend directory:
+
+    python benchmarks/bench_compression.py --courses 200 --requests 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+# Benchmarks measure the handlers, not the rate limits
+for name in (
+    "RATE_LIMIT_DEFAULT",
+    "RATE_LIMIT_LOGIN",
+    "RATE_LIMIT_QUIZ_SUBMIT",
+    "RATE_LIMIT_QUIZ_SUBMIT_BATCH",
+    "RATE_LIMIT_NEW_DISCUSSION",
+):
+    os.environ.setdefault(name, "1000000000/1")
+os.environ.setdefault("SHED_MAX_IN_FLIGHT", "1000000")
+os.environ.setdefault("SHED_MAX_LAG_MS", "60000")
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+import synthetic  # noqa: E402
+from compression import CACHED_LEVELS, LEVELS, available_codecs  # noqa: E402
+
+SIZES = (128, 256, 512, 768, 1024, 1536, 2048, 4096, 8192)
+
+
+def payload_paths(seeded: synthetic.Seeded) -> Dict[str, str]:
+    return {
+        "dashboard": "/dashboard",
+        "course quizzes": f"/courses/{seeded.enrolled[0]}/quizzes",
+        "discussion thread": f"/discussions/{seeded.enrolled_discussions[0]}/replies",
+        "course list": "/courses",
+    }
+
+
+def time_codec(codec, body: bytes, level: int, repeat: int) -> tuple:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compressed = codec(body, level)
+        samples.append(time.perf_counter() - start)
+    return len(compressed), statistics.median(samples)
+
+
+def codec_table(bodies: Dict[str, bytes], repeat: int) -> dict:
+    codecs = available_codecs()
+    results = {}
+    print(f"{'payload':<20} {'coding':<12} {'bytes':>9} {'ratio':>7} {'compress':>11}")
+    for name, body in bodies.items():
+        print(f"{name:<20} {'identity':<12} {len(body):>9}")
+        for coding, codec in codecs.items():
+            for kind, level in (("request", LEVELS[coding]), ("cached", CACHED_LEVELS[coding])):
+                size, seconds = time_codec(codec, body, level, repeat)
+                label = f"{coding}-{level}"
+                results[f"{name} {label}"] = {"bytes": size, "identity": len(body), "seconds": seconds, "level": kind}
+                print(f"{'':<20} {label:<12} {size:>9} {size / len(body):>7.1%} {seconds * 1e6:>8.0f} us")
+    return results
+
+
+async def fetch_raw(client: httpx.AsyncClient, path: str, headers: Dict[str, str]) -> bytes:
+    # Read undecoded, so neither the size nor the CPU includes httpx
+    # decompressing gzip and br
+    async with client.stream("GET", path, headers=headers) as response:
+        assert response.status_code == 200, response.status_code
+        return b"".join([chunk async for chunk in response.aiter_raw()])
+
+
+async def wire_table(paths: Dict[str, str], requests: int) -> dict:
+    results = {}
+    encodings = ["identity"] + list(main.app.state.compressor.encodings)
+    compressor = main.app.state.compressor
+    async with httpx.AsyncClient(app=main.app, base_url="http://bench", headers=synthetic_headers()) as client:
+        print(f"\n{'payload':<20} {'accept':<10} {'wire bytes':>10} {'cold cpu':>11} {'warm cpu':>11}")
+        for name, path in paths.items():
+            for encoding in encodings:
+                headers = {"Accept-Encoding": encoding}
+                wire = len(await fetch_raw(client, path, headers))
+                cpu = {}
+                for phase in ("cold", "warm"):
+                    start = time.process_time()
+                    for _ in range(requests):
+                        if phase == "cold":
+                            compressor.clear()
+                        await fetch_raw(client, path, headers)
+                    cpu[phase] = (time.process_time() - start) / requests
+                results[f"{name} {encoding}"] = {"wire_bytes": wire, **{f"{phase}_cpu": t for phase, t in cpu.items()}}
+                print(
+                    f"{name:<20} {encoding:<10} {wire:>10} {cpu['cold'] * 1e6:>8.0f} us {cpu['warm'] * 1e6:>8.0f} us"
+                )
+    return results
+
+
+def size_sweep(body: bytes, repeat: int) -> dict:
+    # Prefixes of the course list, closed off so each is valid JSON
+    items = json.loads(body)
+    codecs = available_codecs()
+    results = {}
+    print(f"\n{'size':>6}" + "".join(f" {coding + ' saved':>12} {'us':>6}" for coding in codecs))
+    for target in SIZES:
+        count = 1
+        while count < len(items) and len(json.dumps(items[: count + 1]).encode()) <= target:
+            count += 1
+        sample = json.dumps(items[:count]).encode()
+        if len(sample) in results:
+            continue
+        row = {}
+        cells = []
+        for coding, codec in codecs.items():
+            size, seconds = time_codec(codec, sample, LEVELS[coding], repeat)
+            row[coding] = {"saved": len(sample) - size, "seconds": seconds}
+            cells.append(f" {len(sample) - size:>12} {seconds * 1e6:>6.0f}")
+        results[len(sample)] = row
+        print(f"{len(sample):>6}" + "".join(cells))
+    return results
+
+
+def synthetic_headers() -> Dict[str, str]:
+    token = main.app.state.tokens.issue(synthetic.BENCH_USER, "Bench Student")
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def measure(seeded: synthetic.Seeded, args: argparse.Namespace) -> dict:
+    paths = payload_paths(seeded)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(app=main.app, base_url="http://bench", headers=synthetic_headers()) as client:
+            bodies = {}
+            for name, path in paths.items():
+                response = await client.get(path, headers={"Accept-Encoding": "identity"})
+                assert response.status_code == 200, response.text
+                bodies[name] = response.content
+        results = {"codecs": codec_table(bodies, args.repeat)}
+        results["wire"] = await wire_table(paths, args.requests)
+        results["sizes"] = size_sweep(bodies["course list"], args.repeat)
+    return results
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--courses", type=int, default=200)
+    parser.add_argument("--replies", type=int, default=40, help="replies per discussion")
+    parser.add_argument("--questions", type=int, default=40, help="questions per quiz")
+    parser.add_argument("--requests", type=int, default=500, help="requests per payload and coding")
+    parser.add_argument("--repeat", type=int, default=20, help="compressions timed per codec")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    seeded = synthetic.seed(synthetic.Scale(courses=args.courses, replies=args.replies, questions=args.questions))
+    results = asyncio.run(measure(seeded, args))
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main_()
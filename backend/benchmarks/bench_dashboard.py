@@ -0,0 +1,137 @@
+"""Per-user /dashboard latency in a large tenant.
+
+Seeds a synthetic catalog, enrolls one student in a handful of courses
+and measures /dashboard for that student. Cold requests vary the window
+so every one misses the response cache and merges the course streams
+again; warm requests repeat one URL. Run from the backend directory:
+
+    python benchmarks/bench_dashboard.py --courses 50000 --enrolled 8
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+# Benchmarks measure the handlers, not the rate limits
+for name in (
+    "RATE_LIMIT_DEFAULT",
+    "RATE_LIMIT_LOGIN",
+    "RATE_LIMIT_QUIZ_SUBMIT",
+    "RATE_LIMIT_QUIZ_SUBMIT_BATCH",
+    "RATE_LIMIT_NEW_DISCUSSION",
+):
+    os.environ.setdefault(name, "1000000000/1")
+os.environ.setdefault("SHED_MAX_IN_FLIGHT", "1000000")
+os.environ.setdefault("SHED_MAX_LAG_MS", "60000")
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+import sampledata  # noqa: E402
+from users import enrollment_id  # noqa: E402
+
+USER_ID = "bench-student"
+
+
+def seed(courses: int, assignments: int, events: int, enrolled: int) -> List[str]:
+    now = datetime.now()
+    template = sampledata.sample_courses[0]
+    sampledata.sample_courses.extend(
+        template.model_copy(update={"id": f"SYN-{i}", "code": f"SYN-{i}"}) for i in range(courses)
+    )
+    # Generated in date order so seeding appends to the sorted indexes
+    offsets = sorted(random.uniform(-90, 90) for _ in range(courses * assignments))
+    sampledata.sample_assignments.extend(
+        main.Assignment(
+            id=f"SYN-hw{i}",
+            course_id=f"SYN-{random.randrange(courses)}",
+            title=f"Assignment {i}",
+            due_date=now + timedelta(days=offset),
+            points=10,
+        )
+        for i, offset in enumerate(offsets)
+    )
+    offsets = sorted(random.uniform(-90, 90) for _ in range(courses * events))
+    sampledata.sample_events.extend(
+        main.Event(
+            id=f"SYN-ev{i}",
+            title=f"Event {i}",
+            start_time=now + timedelta(days=offset),
+            end_time=now + timedelta(days=offset, hours=1),
+            course_id=f"SYN-{random.randrange(courses)}",
+        )
+        for i, offset in enumerate(offsets)
+    )
+    course_ids = [f"SYN-{i}" for i in random.sample(range(courses), enrolled)]
+    sampledata.sample_users.append(main.User(id=USER_ID, name="Bench Student"))
+    sampledata.sample_enrollments.extend(
+        main.Enrollment(id=enrollment_id(USER_ID, course_id), user_id=USER_ID, course_id=course_id)
+        for course_id in course_ids
+    )
+    return course_ids
+
+
+def percentiles(samples: List[float]) -> str:
+    samples = sorted(samples)
+    p99 = samples[max(int(len(samples) * 0.99) - 1, 0)]
+    return f"p50 {statistics.median(samples):.2f} ms, p99 {p99:.2f} ms"
+
+
+async def measure(requests: int, limit: int) -> None:
+    now = datetime.now()
+    async with main.app.router.lifespan_context(main.app):
+        token = main.app.state.tokens.issue(USER_ID, "Bench Student")
+        headers = {"Authorization": f"Bearer {token}"}
+        async with httpx.AsyncClient(app=main.app, base_url="http://bench", headers=headers) as client:
+            cold, warm = [], []
+            for i in range(requests):
+                params = {"from": (now - timedelta(seconds=i)).isoformat(), "limit": limit}
+                start = time.perf_counter()
+                response = await client.get("/dashboard", params=params)
+                cold.append((time.perf_counter() - start) * 1e3)
+                assert response.status_code == 200, response.text
+            for _ in range(requests):
+                start = time.perf_counter()
+                response = await client.get("/dashboard", params={"limit": limit})
+                warm.append((time.perf_counter() - start) * 1e3)
+            body = response.json()
+
+            timeline = main.app.state.timeline
+            course_ids = [course["id"] for course in body["courses"]]
+            start = time.perf_counter()
+            for _ in range(requests):
+                timeline.window(now, None, limit, course_ids)
+            merge_ms = (time.perf_counter() - start) / requests * 1e3
+
+    print(f"{len(timeline):,} timeline items, {len(course_ids)} enrolled courses")
+    print(f"cold /dashboard: {percentiles(cold)}")
+    print(f"warm /dashboard: {percentiles(warm)}")
+    print(f"timeline merge alone: {merge_ms:.3f} ms")
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--courses", type=int, default=50_000)
+    parser.add_argument("--assignments", type=int, default=5, help="assignments per course")
+    parser.add_argument("--events", type=int, default=2, help="events per course")
+    parser.add_argument("--enrolled", type=int, default=8)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    start = time.perf_counter()
+    seed(args.courses, args.assignments, args.events, args.enrolled)
+    print(f"seeded in {time.perf_counter() - start:.1f} s")
+    asyncio.run(measure(args.requests, args.limit))
+
+
+if __name__ == "__main__":
+    main_()
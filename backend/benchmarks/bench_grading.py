@@ -0,0 +1,70 @@
+"""Grade batches of quiz submissions: per-submission Python loop vs the vectorized engine.
+
+Run from the backend directory:
+
+    python benchmarks/bench_grading.py --sizes 10000 100000 --questions 40
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from grading import CompiledQuiz, answer_matrix  # noqa: E402
+
+
+def make_quiz(questions: int, options: int) -> dict:
+    return {
+        "questions": [
+            {"id": f"q{i}", "correct_option": random.randrange(options), "points": random.randint(1, 10)}
+            for i in range(questions)
+        ],
+        "total_points": 100,
+    }
+
+
+def grade_loop(quiz: dict, submissions) -> list:
+    # The previous approach: one generator over the questions per submission
+    questions = quiz["questions"]
+    max_points = sum(q["points"] for q in questions)
+    scores = []
+    for answers in submissions:
+        earned = sum(q["points"] for q, answer in zip(questions, answers) if answer == q["correct_option"])
+        scores.append(earned / max_points * quiz["total_points"])
+    return scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--options", type=int, default=4)
+    args = parser.parse_args()
+
+    random.seed(0)
+    quiz = make_quiz(args.questions, args.options)
+    compiled = CompiledQuiz.from_quiz(quiz)
+
+    print(f"{'submissions':>12} {'loop (ms)':>10} {'vectorized (ms)':>16} {'of which stacking':>18} {'speedup':>8}")
+    for size in args.sizes:
+        submissions = [[random.randrange(args.options) for _ in range(args.questions)] for _ in range(size)]
+
+        start = time.perf_counter()
+        expected = grade_loop(quiz, submissions)
+        loop_ms = (time.perf_counter() - start) * 1e3
+
+        start = time.perf_counter()
+        answers = answer_matrix(submissions, compiled.question_count)
+        stacked = time.perf_counter()
+        scores = compiled.grade(answers)
+        vector_ms = (time.perf_counter() - start) * 1e3
+        stack_ms = (stacked - start) * 1e3
+
+        assert all(abs(a - b) < 1e-9 for a, b in zip(expected, scores.tolist()))
+        print(f"{size:>12} {loop_ms:>10.1f} {vector_ms:>16.1f} {stack_ms:>18.1f} {loop_ms / vector_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
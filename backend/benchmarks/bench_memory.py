@@ -0,0 +1,141 @@
+"""Bytes per stored document: Pydantic models vs compact records.
+
+Builds the same documents twice: once kept as Pydantic models in an
+indexed repository, which is how the memory backend used to store them,
+and once through MemoryStorage, which keeps slotted records with interned
+strings. Both sides include the indexes. It also times reading documents
+back as dicts. Run from the backend directory:
+
+    python benchmarks/bench_memory.py --records 200000
+"""
+import argparse
+import asyncio
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from pydantic import BaseModel  # noqa: E402
+
+import main  # noqa: E402
+from repository import Repository  # noqa: E402
+from storage import COLLECTIONS, MemoryStorage  # noqa: E402
+
+
+def fresh(value: str) -> str:
+    # A new string object with the same value
+    return (value + ".")[:-1]
+
+
+def replies(count: int, rng: random.Random) -> Iterator[BaseModel]:
+    start = datetime.now() - timedelta(days=60)
+    for i in range(count):
+        # Built per document, as values decoded from a request or database
+        # would be, so repeated values start out as separate strings
+        yield main.DiscussionReply(
+            id=f"reply_{i:08d}",
+            post_id=f"disc_{rng.randrange(count // 20 + 1):06d}",
+            content=f"Reply {i}: " + "much discuss, very academic " * rng.randint(1, 4),
+            author=f"Student {rng.randrange(5000)}",
+            created_at=start + timedelta(seconds=i),
+        )
+
+
+def discussions(count: int, rng: random.Random) -> Iterator[BaseModel]:
+    start = datetime.now() - timedelta(days=60)
+    for i in range(count):
+        yield main.DiscussionPost(
+            id=f"disc_{i:08d}",
+            course_id=f"COURSE-{rng.randrange(500)}",
+            title=f"Question about week {rng.randrange(15)} reading {i}",
+            content="Can someone explain the second half of the lecture? " * rng.randint(1, 3),
+            author=f"Student {rng.randrange(5000)}",
+            created_at=start + timedelta(seconds=i),
+            replies_count=rng.randrange(30),
+        )
+
+
+def assignments(count: int, rng: random.Random) -> Iterator[BaseModel]:
+    start = datetime.now() - timedelta(days=90)
+    for i in range(count):
+        yield main.Assignment(
+            id=f"hw_{i:08d}",
+            course_id=f"COURSE-{rng.randrange(500)}",
+            title=f"Problem set {i}",
+            due_date=start + timedelta(minutes=i),
+            points=rng.choice((10, 20, 50, 100)),
+            status=fresh(rng.choice(("graded", "submitted", "not submitted"))),
+        )
+
+
+def measure(build: Callable[[], object]) -> tuple:
+    """What `build` returns, and the bytes still allocated once it has."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return kept, used
+
+
+def as_models(collection: str, documents: Iterator[BaseModel]) -> Repository:
+    spec = COLLECTIONS[collection]
+    return Repository(documents, indexes=spec.indexes, order_by=spec.order_by)
+
+
+def as_records(collection: str, documents: Iterator[BaseModel]) -> MemoryStorage:
+    storage = MemoryStorage()
+
+    async def insert():
+        for document in documents:
+            await storage.insert(collection, document)
+
+    asyncio.run(insert())
+    return storage
+
+
+def read_rate(read: Callable[[str], dict], keys: list) -> float:
+    start = time.perf_counter()
+    for key in keys:
+        read(key)
+    return (time.perf_counter() - start) / len(keys) * 1e6
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=200_000, help="documents per collection")
+    args = parser.parse_args()
+
+    print(f"{'collection':<20} {'models (B/doc)':>15} {'records (B/doc)':>16} {'saved':>7} "
+          f"{'read before (us)':>17} {'read after (us)':>16}")
+    for collection, generate in (
+        ("discussion_replies", replies),
+        ("discussions", discussions),
+        ("assignments", assignments),
+    ):
+        models, model_bytes = measure(lambda: as_models(collection, generate(args.records, random.Random(0))))
+        records, record_bytes = measure(lambda: as_records(collection, generate(args.records, random.Random(0))))
+
+        # What MemoryStorage.get did before and does now, without the coroutine
+        keys = [document.id for document in generate(min(args.records, 20_000), random.Random(0))]
+        stored = records._repos[collection]
+        before = read_rate(lambda key: models.get(key).model_dump(), keys)
+        after = read_rate(lambda key: stored.get(key).dump(), keys)
+
+        print(
+            f"{collection:<20} {model_bytes / args.records:>15.0f} {record_bytes / args.records:>16.0f} "
+            f"{1 - record_bytes / model_bytes:>6.0%} {before:>17.2f} {after:>16.2f}"
+        )
+        del models, records, stored
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,59 @@
+"""Compare linear scans against the indexed Repository lookups.
+
+Run from the backend directory:
+
+    python benchmarks/bench_repository.py --sizes 1000 10000 100000
+"""
+import argparse
+import sys
+import timeit
+from dataclasses import dataclass
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from repository import Repository  # noqa: E402
+
+
+@dataclass
+class Reply:
+    id: str
+    post_id: str
+
+
+def build(size: int, replies_per_post: int):
+    items = [Reply(id=f"reply{i}", post_id=f"disc{i // replies_per_post}") for i in range(size)]
+    return items, Repository(items, indexes=("post_id",))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--replies-per-post", type=int, default=10)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'size':>10} {'op':<14} {'scan (us)':>12} {'index (us)':>12} {'speedup':>9}")
+    for size in args.sizes:
+        items, repo = build(size, args.replies_per_post)
+        key = f"reply{size - 1}"
+        post_id = f"disc{(size - 1) // args.replies_per_post}"
+
+        cases = {
+            "get by id": (
+                lambda: next((r for r in items if r.id == key), None),
+                lambda: repo.get(key),
+            ),
+            "filter by post": (
+                lambda: [r for r in items if r.post_id == post_id],
+                lambda: repo.filter_by("post_id", post_id),
+            ),
+        }
+        for name, (scan, indexed) in cases.items():
+            scan_us = timeit.timeit(scan, number=args.number) / args.number * 1e6
+            index_us = timeit.timeit(indexed, number=args.number) / args.number * 1e6
+            print(f"{size:>10} {name:<14} {scan_us:>12.2f} {index_us:>12.2f} {scan_us / index_us:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,584 @@
+"""Throughput, latency and memory for every route, in-process and under uvicorn.
+
+Seeds a synthetic tenant (see synthetic.py) and drives each route with
+concurrent requests. It runs twice: once through an in-process ASGI
+client, and once against a real uvicorn server started on a local port.
+Results can be written as JSON and compared with an earlier run, so a
+regression shows up as a diff between commits:
+
+    python benchmarks/bench_routes.py --json results.json
+    python benchmarks/bench_routes.py --mode uvicorn --workers 2 --only "GET /courses"
+    python benchmarks/bench_routes.py --json new.json --compare results.json
+
+Rate limits and load shedding are raised for the run. On a small machine
+the load generator competes with the server for CPU, so compare runs
+made on the same machine.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+# Benchmarks measure the handlers, not the rate limits
+for name in (
+    "RATE_LIMIT_DEFAULT",
+    "RATE_LIMIT_LOGIN",
+    "RATE_LIMIT_QUIZ_SUBMIT",
+    "RATE_LIMIT_QUIZ_SUBMIT_BATCH",
+    "RATE_LIMIT_NEW_DISCUSSION",
+):
+    os.environ.setdefault(name, "1000000000/1")
+os.environ.setdefault("SHED_MAX_IN_FLIGHT", "1000000")
+os.environ.setdefault("SHED_MAX_LAG_MS", "60000")
+# Shared by the server workers, so tokens issued here verify there
+os.environ.setdefault("JWT_SECRET", "bench-routes-secret")
+# The bulk routes are admin-only
+os.environ.setdefault("ADMIN_USERS", "bench-student")
+
+import httpx  # noqa: E402
+from fastapi.routing import APIRoute  # noqa: E402
+
+import main  # noqa: E402
+import synthetic  # noqa: E402
+from auth import TokenVerifier  # noqa: E402
+from users import enrollment_id  # noqa: E402
+
+# The --serve process reads the scale from here
+SCALE_ENV = "BENCH_ROUTES_SCALE"
+
+Request = Tuple[str, str, dict]  # method, URL, httpx keyword arguments
+
+
+@dataclass
+class Scenario:
+    name: str  # "METHOD /route/{template}", matching the app's route
+    build: Callable[[int], Request]  # request number -> request
+    stream: bool = False  # timed to the first body chunk, then closed
+    # Untimed; creates what the requests read or append to, given how many will be sent
+    setup: Optional[Callable[[httpx.AsyncClient, int], Awaitable[None]]] = None
+
+
+def scenarios(seeded: synthetic.Seeded) -> List[Scenario]:
+    def cycle(ids: List[str]) -> Callable[[int], str]:
+        return lambda i: ids[i % len(ids)]
+
+    course, enrolled = cycle(seeded.courses), cycle(seeded.enrolled)
+    assignment, own_assignment = cycle(seeded.assignments), cycle(seeded.enrolled_assignments)
+    discussion, own_discussion = cycle(seeded.discussions), cycle(seeded.enrolled_discussions)
+    quiz, untimed_quiz = cycle(seeded.quizzes), cycle(seeded.untimed_quizzes)
+    now = datetime.now()
+    answers = [i % 4 for i in range(seeded.question_count)]
+    login = {"username": synthetic.BENCH_USER, "password": synthetic.BENCH_PASSWORD}
+    ndjson = b"".join(
+        main.Announcement(
+            id=f"bench-ann{j}",
+            source="BENCH",
+            title=f"Bench announcement {j}",
+            content=" ".join(synthetic.WORDS),
+            date=now - timedelta(hours=j),
+        ).model_dump_json().encode() + b"\n"
+        for j in range(100)
+    )
+
+    def get(path: str, **kwargs) -> Callable[[int], Request]:
+        return lambda i: ("GET", path, kwargs)
+
+    upload = bytes(range(256)) * 256  # 64 KiB
+    attachments: List[str] = []
+    uploads: List[str] = []
+
+    async def attach(client: httpx.AsyncClient, count: int) -> None:
+        response = await client.post(
+            f"/discussions/{own_discussion(0)}/attachments", params={"filename": "bench.bin"}, content=upload
+        )
+        attachments[:] = [response.json()["id"]]
+
+    # Timed attempts are one per student and quiz, so each request is sent
+    # by its own examinee, enrolled by the scenario's setup
+    exam_quiz, exam_course = next(iter(seeded.timed_quizzes.items()))
+    examinees: Dict[str, List[Dict[str, str]]] = {}
+
+    def enroll_examinees(pool: str, start: bool) -> Callable[[httpx.AsyncClient, int], Awaitable[None]]:
+        async def setup(client: httpx.AsyncClient, count: int) -> None:
+            if len(examinees.get(pool, ())) >= count:
+                return
+            users = [f"bench-{pool}-{i}" for i in range(count)]
+            await client.post("/bulk/enrollments/import", params={"job": f"bench-{pool}-{count}"}, content=b"".join(
+                main.Enrollment(id=enrollment_id(user, exam_course), user_id=user, course_id=exam_course).model_dump_json().encode()
+                + b"\n"
+                for user in users
+            ))
+            tokens = TokenVerifier(os.environ["JWT_SECRET"])
+            examinees[pool] = [{"Authorization": f"Bearer {tokens.issue(user, user)}"} for user in users]
+            if start:
+                for headers in examinees[pool]:
+                    await client.post(f"/quizzes/{exam_quiz}/attempt", headers=headers)
+
+        return setup
+
+    def examinee(pool: str, method: str, path: str, **kwargs) -> Callable[[int], Request]:
+        return lambda i: (method, path, {"headers": examinees[pool][i], **kwargs})
+
+    async def start_uploads(client: httpx.AsyncClient, count: int) -> None:
+        uploads.clear()
+        for _ in range(count):
+            response = await client.post("/uploads", json={
+                "parent_type": "discussion", "parent_id": own_discussion(0), "filename": "bench.bin", "size": len(upload),
+            })
+            uploads.append(response.json()["id"])
+
+    return [
+        Scenario("GET /", get("/")),
+        Scenario("POST /token", lambda i: ("POST", "/token", {"data": login})),
+        Scenario("GET /courses", get("/courses", params={"limit": 50})),
+        Scenario("GET /courses/{course_id}", lambda i: ("GET", f"/courses/{course(i)}", {})),
+        Scenario("GET /assignments", get("/assignments", params={"limit": 50})),
+        Scenario("GET /assignments/{assignment_id}", lambda i: ("GET", f"/assignments/{assignment(i)}", {})),
+        Scenario("GET /events", lambda i: ("GET", "/events", {"params": {
+            "start": (now + timedelta(days=i % 30)).isoformat(),
+            "end": (now + timedelta(days=i % 30 + 14)).isoformat(),
+        }})),
+        Scenario("GET /events.ics", lambda i: ("GET", "/events.ics", {"params": {"course_id": course(i)}})),
+        Scenario(
+            "PUT /assignments/{assignment_id}/status",
+            lambda i: ("PUT", f"/assignments/{own_assignment(i)}/status", {"params": {"status": "submitted"}}),
+        ),
+        Scenario("GET /announcements", get("/announcements", params={"limit": 50})),
+        Scenario("GET /dashboard", lambda i: ("GET", "/dashboard", {"params": {"limit": 50}})),
+        Scenario(
+            "GET /courses/{course_id}/discussions",
+            lambda i: ("GET", f"/courses/{course(i)}/discussions", {"params": {"limit": 20}}),
+        ),
+        Scenario(
+            "GET /discussions/{post_id}/replies",
+            lambda i: ("GET", f"/discussions/{discussion(i)}/replies", {"params": {"limit": 20}}),
+        ),
+        Scenario(
+            "POST /courses/{course_id}/discussions",
+            lambda i: ("POST", f"/courses/{enrolled(i)}/discussions", {"params": {
+                "title": f"Bench post {i}",
+                "content": "Does anyone have the notes from the midterm review session?",
+            }}),
+        ),
+        Scenario(
+            "POST /discussions/{post_id}/replies",
+            lambda i: ("POST", f"/discussions/{own_discussion(i)}/replies", {"params": {
+                "content": f"Bench reply {i}: the notes are in the shared folder",
+            }}),
+        ),
+        Scenario("GET /cache/stats", get("/cache/stats")),
+        # A course page: the course, its lists and the replies to 20 threads
+        Scenario("POST /batch", lambda i: ("POST", "/batch", {"json": {"requests": [
+            {"url": f"/courses/{enrolled(i)}"},
+            {"url": f"/courses/{enrolled(i)}/discussions?limit=20"},
+            {"url": f"/courses/{enrolled(i)}/quizzes"},
+            {"url": "/assignments?limit=20"},
+            {"url": "/events?limit=20"},
+        ] + [{"url": f"/discussions/{own_discussion(i + j)}/replies?limit=20"} for j in range(20)]}})),
+        Scenario("GET /search", lambda i: ("GET", "/search", {"params": {
+            "q": synthetic.WORDS[i % len(synthetic.WORDS)] + " " + synthetic.WORDS[(i * 7) % len(synthetic.WORDS)][:3],
+        }})),
+        Scenario("GET /stream", lambda i: ("GET", "/stream", {"params": {"course_id": course(i)}}), stream=True),
+        Scenario("GET /courses/{course_id}/quizzes", lambda i: ("GET", f"/courses/{course(i)}/quizzes", {})),
+        Scenario("GET /quizzes/{quiz_id}", lambda i: ("GET", f"/quizzes/{quiz(i)}", {})),
+        Scenario(
+            "POST /quizzes/{quiz_id}/submit", lambda i: ("POST", f"/quizzes/{untimed_quiz(i)}/submit", {"json": answers})
+        ),
+        Scenario(
+            "POST /quizzes/{quiz_id}/attempt",
+            examinee("starter", "POST", f"/quizzes/{exam_quiz}/attempt"),
+            setup=enroll_examinees("starter", start=False),
+        ),
+        Scenario(
+            "GET /quizzes/{quiz_id}/attempt",
+            examinee("examinee", "GET", f"/quizzes/{exam_quiz}/attempt"),
+            setup=enroll_examinees("examinee", start=True),
+        ),
+        Scenario(
+            "PUT /quizzes/{quiz_id}/attempt/answers",
+            examinee("examinee", "PUT", f"/quizzes/{exam_quiz}/attempt/answers", json=answers),
+            setup=enroll_examinees("examinee", start=True),
+        ),
+        Scenario(
+            "POST /quizzes/{quiz_id}/attempt/submit",
+            examinee("submitter", "POST", f"/quizzes/{exam_quiz}/attempt/submit", json=answers),
+            setup=enroll_examinees("submitter", start=True),
+        ),
+        # Graded by the bench user as an admin, for 50 enrolled students
+        Scenario(
+            "POST /quizzes/{quiz_id}/submit:batch",
+            lambda i: ("POST", f"/quizzes/{exam_quiz}/submit:batch", {"json": [
+                {"student_id": f"bench-graded-{j}", "answers": answers} for j in range(50)
+            ]}),
+            setup=lambda client, count: enroll_examinees("graded", start=False)(client, 50),
+        ),
+        Scenario("GET /quizzes/{quiz_id}/stats", lambda i: ("GET", f"/quizzes/{quiz(i)}/stats", {})),
+        Scenario("GET /metrics", get("/metrics")),
+        Scenario("GET /bulk/{collection}/export", get("/bulk/courses/export"), stream=True),
+        Scenario(
+            "POST /bulk/{collection}/import",
+            lambda i: ("POST", "/bulk/announcements/import", {"params": {"job": f"bench-import-{i}"}, "content": ndjson}),
+        ),
+        Scenario("GET /bulk/jobs/{job}", get("/bulk/jobs/bench-import-0")),
+        Scenario(
+            "POST /assignments/{assignment_id}/attachments",
+            lambda i: ("POST", f"/assignments/{own_assignment(i)}/attachments", {
+                "params": {"filename": f"bench-{i}.bin"}, "content": upload,
+            }),
+        ),
+        Scenario(
+            "POST /discussions/{post_id}/attachments",
+            lambda i: ("POST", f"/discussions/{own_discussion(i)}/attachments", {
+                "params": {"filename": f"bench-{i}.bin"}, "content": upload,
+            }),
+        ),
+        Scenario(
+            "GET /assignments/{assignment_id}/attachments",
+            lambda i: ("GET", f"/assignments/{own_assignment(i)}/attachments", {}),
+        ),
+        Scenario("GET /discussions/{post_id}/attachments", lambda i: ("GET", f"/discussions/{own_discussion(i)}/attachments", {})),
+        Scenario("GET /attachments/{attachment_id}", lambda i: ("GET", f"/attachments/{attachments[0]}", {}), setup=attach),
+        Scenario("POST /uploads", lambda i: ("POST", "/uploads", {"json": {
+            "parent_type": "discussion", "parent_id": own_discussion(i), "filename": "bench.bin", "size": len(upload),
+        }})),
+        Scenario(
+            "GET /uploads/{upload_id}",
+            lambda i: ("GET", f"/uploads/{uploads[0]}", {}),
+            setup=lambda client, count: start_uploads(client, 1),
+        ),
+        Scenario(
+            "PATCH /uploads/{upload_id}",
+            lambda i: ("PATCH", f"/uploads/{uploads[i]}", {"content": upload, "headers": {"Upload-Offset": "0"}}),
+            setup=start_uploads,
+        ),
+    ]
+
+
+def uncovered_routes(covered: List[Scenario]) -> List[str]:
+    """Routes of the app that no scenario drives, so new routes are not silently skipped."""
+    names = {scenario.name for scenario in covered}
+    routes = []
+    for route in main.app.routes:
+        # The docs pages are plain Starlette routes
+        if isinstance(route, APIRoute):
+            routes.extend(name for name in (f"{method} {route.path}" for method in sorted(route.methods)) if name not in names)
+    return routes
+
+
+def rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Resident memory of a process and its children, from /proc (Linux only)."""
+    pids = [pid or os.getpid()]
+    proc = Path("/proc")
+    if not proc.exists():
+        return None
+    if pid:
+        for stat in proc.glob("[0-9]*/stat"):
+            try:
+                if int(stat.read_text().rsplit(")", 1)[1].split()[1]) == pid:
+                    pids.append(int(stat.parent.name))
+            except (OSError, IndexError, ValueError):
+                continue
+    total = 0
+    for p in pids:
+        try:
+            total += int((proc / str(p) / "statm").read_text().split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    return round(total * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+
+
+async def first_chunk_asgi(app, path: str, params: dict, headers: Dict[str, str]) -> int:
+    # httpx's ASGI transport waits for the whole body, which an event stream
+    # never finishes, so streams are driven at the ASGI level: the client
+    # disconnects as soon as the first chunk arrives
+    first = asyncio.Event()
+    status = 0
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await first.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            first.set()
+
+    query = str(httpx.QueryParams(params))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    await app(scope, receive, send)
+    return status
+
+
+async def drive(
+    send_one: Callable[[Scenario, int], "asyncio.Future[int]"],
+    scenario: Scenario,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+) -> dict:
+    for i in range(warmup):
+        await send_one(scenario, i)
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    counter = iter(range(warmup, warmup + requests))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                status = str(await send_one(scenario, i))
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - start) * 1e3)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": sum(count for status, count in statuses.items() if not status.startswith("2")),
+        "statuses": statuses,
+        "throughput": round(requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+    }
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+async def run_scenarios(
+    client: httpx.AsyncClient,
+    send_one: Callable[[Scenario, int], "asyncio.Future[int]"],
+    selected: List[Scenario],
+    args: argparse.Namespace,
+    pid: Optional[int] = None,
+) -> dict:
+    results = {"rss_mb_start": rss_mb(pid), "routes": {}}
+    for scenario in selected:
+        if scenario.setup:
+            await scenario.setup(client, args.warmup + args.requests)
+        result = await drive(send_one, scenario, args.requests, args.concurrency, args.warmup)
+        results["routes"][scenario.name] = result
+        print(
+            f"  {scenario.name:<42} {result['throughput']:>9.0f} req/s  p50 {result['p50_ms']:>7.2f} ms  "
+            f"p95 {result['p95_ms']:>7.2f} ms  p99 {result['p99_ms']:>7.2f} ms  errors {result['errors']}"
+        )
+    results["rss_mb_end"] = rss_mb(pid)
+    return results
+
+
+def auth_headers() -> Dict[str, str]:
+    token = TokenVerifier(os.environ["JWT_SECRET"]).issue(synthetic.BENCH_USER, "Bench Student")
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def run_inprocess(selected: List[Scenario], args: argparse.Namespace) -> dict:
+    headers = auth_headers()
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(app=main.app, base_url="http://bench", headers=headers) as client:
+            async def send_one(scenario: Scenario, i: int) -> int:
+                method, url, kwargs = scenario.build(i)
+                if scenario.stream:
+                    return await first_chunk_asgi(main.app, url, kwargs.get("params", {}), headers)
+                return (await client.request(method, url, **kwargs)).status_code
+
+            return await run_scenarios(client, send_one, selected, args)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_uvicorn(selected: List[Scenario], args: argparse.Namespace, scale: synthetic.Scale) -> dict:
+    port = free_port()
+    env = {**os.environ, SCALE_ENV: json.dumps(scale.as_dict())}
+    command = [sys.executable, __file__, "--serve", "--port", str(port), "--workers", str(args.workers)]
+    server = subprocess.Popen(command, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, headers=auth_headers(), limits=limits, timeout=60) as client:
+            await wait_until_up(client, server)
+
+            async def send_one(scenario: Scenario, i: int) -> int:
+                method, url, kwargs = scenario.build(i)
+                if not scenario.stream:
+                    return (await client.request(method, url, **kwargs)).status_code
+                async with client.stream(method, url, **kwargs) as response:
+                    async for _ in response.aiter_raw():
+                        break
+                    return response.status_code
+
+            return await run_scenarios(client, send_one, selected, args, pid=server.pid)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+async def wait_until_up(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float = 120) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn did not start in time")
+
+
+def serve_app():
+    """Factory uvicorn calls in each worker: the app with the synthetic tenant seeded."""
+    synthetic.seed(synthetic.Scale(**json.loads(os.environ[SCALE_ENV])))
+    return main.app
+
+
+def serve(port: int, workers: int) -> None:
+    import uvicorn
+
+    uvicorn.run(
+        "bench_routes:serve_app",
+        factory=True,
+        app_dir=str(Path(__file__).resolve().parent),
+        host="127.0.0.1",
+        port=port,
+        workers=workers,
+        log_level="warning",
+    )
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """Routes whose p50 latency or throughput got worse by more than `threshold`."""
+    regressions = []
+    print(f"\ncompared with {baseline.get('commit') or 'baseline'} (regression threshold {threshold:.0%})")
+    for mode, results in current["modes"].items():
+        old_routes = baseline.get("modes", {}).get(mode, {}).get("routes", {})
+        for name, new in results["routes"].items():
+            old = old_routes.get(name)
+            if not old:
+                continue
+            latency = new["p50_ms"] / old["p50_ms"] - 1 if old["p50_ms"] else 0.0
+            throughput = new["throughput"] / old["throughput"] - 1 if old["throughput"] else 0.0
+            flag = latency > threshold or throughput < -threshold
+            if flag:
+                regressions.append(f"{mode} {name}")
+            print(f"  {'!' if flag else ' '} {mode:<9} {name:<42} p50 {latency:>+7.1%}  throughput {throughput:>+7.1%}")
+    return regressions
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn", "both"), default="both")
+    parser.add_argument("--requests", type=int, default=500, help="timed requests per route")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests per route first")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--only", help="regex; run only the routes whose name matches")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change counted as a regression")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    for name, default in synthetic.Scale().as_dict().items():
+        parser.add_argument(f"--{name}", type=int, default=default)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.workers)
+        return
+
+    scale = synthetic.Scale(**{name: getattr(args, name) for name in synthetic.Scale().as_dict()})
+    start = time.perf_counter()
+    seeded = synthetic.seed(scale)
+    print(f"seeded in {time.perf_counter() - start:.1f} s")
+    selected = scenarios(seeded)
+    uncovered = uncovered_routes(selected)
+    if uncovered:
+        print(f"routes without a scenario: {', '.join(uncovered)}")
+    if args.only:
+        selected = [scenario for scenario in selected if re.search(args.only, scenario.name)]
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "scale": scale.as_dict(),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "workers": args.workers,
+        "uncovered": uncovered,
+        "modes": {},
+    }
+    if args.mode in ("inprocess", "both"):
+        print("in-process:")
+        report["modes"]["inprocess"] = asyncio.run(run_inprocess(selected, args))
+    if args.mode in ("uvicorn", "both"):
+        print(f"uvicorn ({args.workers} worker{'s' if args.workers > 1 else ''}):")
+        report["modes"]["uvicorn"] = asyncio.run(run_uvicorn(selected, args, scale))
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2) + "\n")
+    if args.compare:
+        regressions = compare(report, json.loads(Path(args.compare).read_text()), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s)")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,74 @@
+"""Build, query and snapshot the search index on a synthetic corpus.
+
+Run from the backend directory:
+
+    python benchmarks/bench_search.py --docs 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from itertools import accumulate
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from search import SearchIndex  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=200_000)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--words", type=int, default=40, help="words per document")
+    parser.add_argument("--courses", type=int, default=1_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(0)
+    vocabulary = [f"w{i}" for i in range(args.vocabulary)]
+    # Zipf-like weights so a few terms are very common and most are rare
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(args.vocabulary)))
+    docs = []
+    for i in range(args.docs):
+        words = random.choices(vocabulary, cum_weights=cum_weights, k=args.words)
+        docs.append((f"d{i}", " ".join(words[:5]), " ".join(words[5:]), f"C{i % args.courses}"))
+
+    index = SearchIndex()
+    start = time.perf_counter()
+    for doc_id, title, content, course_id in docs:
+        index.add("discussion", doc_id, title, [content], course_id)
+    build_s = time.perf_counter() - start
+    del docs
+
+    queries = [" ".join(random.choices(vocabulary[:5_000], k=random.randint(1, 3))) for _ in range(args.queries)]
+    for label, course in (("all courses", None), ("one course", "C7")):
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, course)
+            latencies.append((time.perf_counter() - start) * 1e3)
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f"query ({label}): p50 {statistics.median(latencies):.2f} ms, p95 {p95:.2f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "search.pkl")
+        start = time.perf_counter()
+        index.save(path)
+        save_s = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded = SearchIndex.load(path)
+        load_s = time.perf_counter() - start
+        size_mb = os.path.getsize(path) / 1e6
+    assert loaded is not None and len(loaded) == len(index)
+
+    print(f"build {args.docs} docs: {build_s:.1f} s")
+    print(f"snapshot: save {save_s:.1f} s, load {load_s:.1f} s, {size_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Request throughput of /courses and /quizzes/{id}: response_model path vs pre-encoded path.
+
+The baseline app reproduces the previous handlers, returning Pydantic models
+through `response_model` so FastAPI re-validates and re-serializes them on
+every request. Run from the backend directory:
+
+    python benchmarks/bench_serialization.py --courses 500 --requests 2000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+# Benchmarks measure the handlers, not the rate limits
+for name in (
+    "RATE_LIMIT_DEFAULT",
+    "RATE_LIMIT_LOGIN",
+    "RATE_LIMIT_QUIZ_SUBMIT",
+    "RATE_LIMIT_QUIZ_SUBMIT_BATCH",
+    "RATE_LIMIT_NEW_DISCUSSION",
+):
+    os.environ.setdefault(name, "1000000000/1")
+os.environ.setdefault("SHED_MAX_IN_FLIGHT", "1000000")
+os.environ.setdefault("SHED_MAX_LAG_MS", "60000")
+
+import httpx  # noqa: E402
+from fastapi import FastAPI, HTTPException  # noqa: E402
+
+import main  # noqa: E402
+import sampledata  # noqa: E402
+from compression import Compressor  # noqa: E402
+from metrics import Metrics  # noqa: E402
+from throttling import LoadShedder, MemoryRateLimitStore, RateLimiter  # noqa: E402
+
+
+def baseline_app(courses, quizzes) -> FastAPI:
+    app = FastAPI()
+    # Same middleware stack, so only the handlers and serialization differ
+    app.user_middleware = list(main.app.user_middleware)
+    app.state.metrics = Metrics()
+    app.state.load_shedder = LoadShedder()
+    app.state.rate_limiter = RateLimiter(MemoryRateLimitStore())
+    app.state.compressor = Compressor()
+
+    @app.get("/courses", response_model=List[main.Course])
+    async def get_courses():
+        return courses
+
+    @app.get("/quizzes/{quiz_id}", response_model=main.Quiz)
+    async def get_quiz(quiz_id: str):
+        for quiz in quizzes:
+            if quiz.id == quiz_id:
+                return quiz
+        raise HTTPException(status_code=404, detail="Quiz not found")
+
+    return app
+
+
+async def measure(app: FastAPI, paths: List[str], requests: int) -> dict:
+    results = {}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+            for path in paths:
+                await client.get(path)  # warm up caches
+                start = time.perf_counter()
+                for _ in range(requests):
+                    response = await client.get(path)
+                results[path] = requests / (time.perf_counter() - start)
+                assert response.status_code == 200, response.text
+    return results
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--courses", type=int, default=500, help="synthetic courses added to the sample data")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    template = sampledata.sample_courses[0]
+    sampledata.sample_courses.extend(
+        template.model_copy(update={"id": f"SYN-{i}", "code": f"SYN-{i}"}) for i in range(args.courses)
+    )
+    paths = ["/courses", "/quizzes/quiz1"]
+
+    before = asyncio.run(measure(baseline_app(sampledata.sample_courses, sampledata.sample_quizzes), paths, args.requests))
+    after = asyncio.run(measure(main.app, paths, args.requests))
+
+    print(f"{'route':<16} {'before (req/s)':>15} {'after (req/s)':>15} {'speedup':>8}")
+    for path in paths:
+        print(f"{path:<16} {before[path]:>15.0f} {after[path]:>15.0f} {after[path] / before[path]:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main_()
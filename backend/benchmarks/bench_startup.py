@@ -0,0 +1,184 @@
+"""Cold start: import time, time to first response and the first requests after it.
+
+Starts the app the way the container does, `uvicorn main:app` in a fresh
+process, and times it from spawning the process to the first response.
+It then times the first login and the first reads of course and
+dashboard data, which pay for anything left cold. Each configuration
+runs several times and the medians are reported:
+
+- sample: seeded from the bundled sample data
+- snapshot: seeded from a seed snapshot of the same data
+- with --courses N, also a synthetic tenant of N courses, generated at
+  startup vs loaded from a snapshot
+
+Run from the backend directory:
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --courses 500 --importtime
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+APP_DIR = Path(__file__).resolve().parents[1] / "app"
+sys.path.insert(0, str(APP_DIR))
+
+# The --courses factory reads the scale from here
+SCALE_ENV = "BENCH_STARTUP_SCALE"
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+
+
+def serve_generated():
+    """Factory uvicorn calls: the app with a synthetic tenant generated at startup."""
+    import main
+    import synthetic
+
+    synthetic.seed(synthetic.Scale(**json.loads(os.environ[SCALE_ENV])))
+    return main.app
+
+
+def import_seconds(env: Dict[str, str]) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=APP_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return float(output.stdout)
+
+
+def slowest_imports(env: Dict[str, str], count: int = 15) -> List[str]:
+    """The modules with the most import time of their own, from `-X importtime`."""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], cwd=APP_DIR, env=env, capture_output=True, text=True
+    )
+    rows = []
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, total, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(own), int(total), name))
+    rows.sort(reverse=True)
+    return [f"{own / 1000:>8.1f} ms {total / 1000:>8.1f} ms  {name}" for own, total, name in rows[:count]]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def cold_start(target: List[str], env: Dict[str, str], timeout: float = 120) -> Dict[str, float]:
+    """Seconds from spawning uvicorn to the first response, then each first request's latency."""
+    import httpx
+
+    port = free_port()
+    command = [sys.executable, "-m", "uvicorn", *target, "--port", str(port), "--log-level", "warning"]
+    start = time.perf_counter()
+    server = subprocess.Popen(command, env=env)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+                if time.perf_counter() - start > timeout:
+                    raise RuntimeError("uvicorn did not start in time")
+                try:
+                    if client.get("/").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    time.sleep(0.005)
+            timings = {"first_response": time.perf_counter() - start}
+
+            def timed(name: str, method: str, url: str, **kwargs) -> httpx.Response:
+                request_start = time.perf_counter()
+                response = client.request(method, url, **kwargs)
+                response.raise_for_status()
+                timings[name] = time.perf_counter() - request_start
+                return response
+
+            token = timed("POST /token", "POST", "/token", data={"username": "student1", "password": "password123"})
+            client.headers["Authorization"] = f"Bearer {token.json()['access_token']}"
+            timed("GET /courses", "GET", "/courses")
+            timed("GET /dashboard", "GET", "/dashboard")
+            timed("GET /quizzes/{quiz_id}", "GET", "/quizzes/quiz1")
+            return timings
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def build_snapshot(path: str, courses: int) -> None:
+    # The sample lists as the app would seed them, plus a synthetic tenant
+    import main  # noqa: F401
+    import sampledata
+    import synthetic
+    from seeding import save_seed_snapshot
+
+    if courses:
+        synthetic.seed(synthetic.Scale(courses=courses))
+    save_seed_snapshot(sampledata.sample_data, path)
+
+
+def report(name: str, runs: List[Dict[str, float]]) -> dict:
+    medians = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+    cells = [f"{medians['first_response']:>8.2f} s"] + [
+        f"{medians[key] * 1000:>9.1f} ms" for key in medians if key != "first_response"
+    ]
+    print(f"  {name:<22}" + "".join(f"{cell:>19}" for cell in cells))
+    return medians
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="cold starts per configuration")
+    parser.add_argument("--courses", type=int, default=0, help="also compare a synthetic tenant of this many courses")
+    parser.add_argument("--importtime", action="store_true", help="list the slowest modules to import")
+    parser.add_argument("--json", help="write the medians to this file")
+    args = parser.parse_args()
+
+    # As on Cloud Run, which skips looking for a .env file
+    env = {**os.environ, "K_SERVICE": "bench-startup", "PYTHONPATH": str(APP_DIR)}
+    env.pop("SEED_SNAPSHOT_PATH", None)
+    results: Dict[str, object] = {"runs": args.runs, "cpus": os.cpu_count()}
+
+    imports = [import_seconds(env) for _ in range(args.runs)]
+    results["import_main"] = statistics.median(imports)
+    print(f"import main: median {statistics.median(imports):.3f} s (min {min(imports):.3f}, max {max(imports):.3f})")
+    if args.importtime:
+        print(f"  {'self':>11} {'total':>11}  module")
+        for row in slowest_imports(env):
+            print(f"  {row}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = ["main:app", "--app-dir", str(APP_DIR)]
+        configurations = {"sample": (app, env)}
+        sample_snapshot = os.path.join(directory, "sample.snapshot")
+        subprocess.run([sys.executable, "seeding.py", sample_snapshot], cwd=APP_DIR, env=env, check=True)
+        configurations["snapshot"] = (app, {**env, "SEED_SNAPSHOT_PATH": sample_snapshot})
+        if args.courses:
+            scale = json.dumps({"courses": args.courses})
+            factory = ["bench_startup:serve_generated", "--factory", "--app-dir", str(Path(__file__).resolve().parent)]
+            configurations[f"{args.courses} courses generated"] = (factory, {**env, SCALE_ENV: scale})
+            synthetic_snapshot = os.path.join(directory, "synthetic.snapshot")
+            build_snapshot(synthetic_snapshot, args.courses)
+            configurations[f"{args.courses} courses snapshot"] = (app, {**env, "SEED_SNAPSHOT_PATH": synthetic_snapshot})
+
+        header = ["first response", "POST /token", "GET /courses", "GET /dashboard", "GET /quizzes/{id}"]
+        print(f"\n  {'configuration':<22}" + "".join(f"{name:>19}" for name in header))
+        results["configurations"] = {}
+        for name, (target, target_env) in configurations.items():
+            runs = [cold_start(target, target_env) for _ in range(args.runs)]
+            results["configurations"][name] = report(name, runs)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,153 @@
+"""Concurrent writers on the discussion write path: no collisions, no lost updates.
+
+Fires many replies at one thread, and many new posts at one course, all
+concurrently. It then checks that every ID is unique, every write is
+listed and the thread's replies_count equals the number of replies.
+It also generates IDs in forked processes to check that workers never
+collide.
+
+The app runs in-process by default. Pass --url to target a running
+server instead. With several uvicorn workers that server must use
+MongoDB, because the memory backend is per process, and it must be
+started with RATE_LIMIT_DEFAULT and RATE_LIMIT_NEW_DISCUSSION raised:
+
+    python benchmarks/stress_writes.py --replies 2000 --concurrency 100
+    python benchmarks/stress_writes.py --url http://localhost:8000
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+import httpx  # noqa: E402
+
+from ids import new_id  # noqa: E402
+from pagination import NEXT_CURSOR_HEADER  # noqa: E402
+
+COURSE_ID = "MEME-420"
+
+
+def generate_ids(count: int) -> List[str]:
+    return [new_id() for _ in range(count)]
+
+
+def check_ids(processes: int, per_process: int) -> List[str]:
+    # Use the generator before forking so children inherit a live sequence
+    generate_ids(10)
+    with multiprocessing.get_context("fork").Pool(processes) as pool:
+        batches = pool.map(generate_ids, [per_process] * processes)
+    failures = []
+    if len(set().union(*batches)) != processes * per_process:
+        failures.append("IDs collided across processes")
+    if any(batch != sorted(batch) or len(set(batch)) != len(batch) for batch in batches):
+        failures.append("IDs were not strictly increasing within a process")
+    return failures
+
+
+async def list_all(client: httpx.AsyncClient, path: str, fields: Optional[str] = None) -> List[dict]:
+    items, cursor = [], None
+    while True:
+        params = {"limit": 500}
+        if cursor:
+            params["cursor"] = cursor
+        if fields:
+            params["fields"] = fields
+        response = await client.get(path, params=params)
+        response.raise_for_status()
+        items.extend(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return items
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> None:
+    response = await client.post("/token", data={"username": username, "password": password})
+    response.raise_for_status()
+    client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+
+async def stress(client: httpx.AsyncClient, replies: int, posts: int, concurrency: int) -> List[str]:
+    response = await client.post(f"/courses/{COURSE_ID}/discussions", params={"title": "Stress", "content": "Thread"})
+    response.raise_for_status()
+    post_id = response.json()["id"]
+    limit = asyncio.Semaphore(concurrency)
+
+    async def write(path: str, params: dict) -> str:
+        async with limit:
+            response = await client.post(path, params=params)
+        response.raise_for_status()
+        return response.json()["id"]
+
+    writes = [write(f"/discussions/{post_id}/replies", {"content": f"reply {i}"}) for i in range(replies)]
+    writes += [write(f"/courses/{COURSE_ID}/discussions", {"title": f"post {i}", "content": "x"}) for i in range(posts)]
+    start = time.perf_counter()
+    ids = await asyncio.gather(*writes)
+    elapsed = time.perf_counter() - start
+    print(f"{len(writes)} writes at concurrency {concurrency}: {len(writes) / elapsed:,.0f} writes/s")
+
+    reply_ids, new_post_ids = set(ids[:replies]), set(ids[replies:])
+    listed_replies = {reply["id"] for reply in await list_all(client, f"/discussions/{post_id}/replies")}
+    discussions = {post["id"]: post for post in await list_all(client, f"/courses/{COURSE_ID}/discussions", "replies_count")}
+
+    failures = []
+    if len(reply_ids) != replies or len(new_post_ids) != posts or reply_ids & new_post_ids:
+        failures.append("duplicate IDs were returned")
+    if listed_replies != reply_ids:
+        failures.append(f"{len(reply_ids - listed_replies)} replies missing from the thread")
+    if not new_post_ids <= discussions.keys():
+        failures.append(f"{len(new_post_ids - discussions.keys())} posts missing from the course")
+    if discussions[post_id]["replies_count"] != replies:
+        failures.append(f"replies_count is {discussions[post_id]['replies_count']}, expected {replies}")
+    return failures
+
+
+async def run(args: argparse.Namespace) -> List[str]:
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+            await login(client, args.username, args.password)
+            return await stress(client, args.replies, args.posts, args.concurrency)
+    # The stress test posts far faster than a real user may
+    for name in ("RATE_LIMIT_DEFAULT", "RATE_LIMIT_NEW_DISCUSSION"):
+        os.environ.setdefault(name, "1000000000/1")
+    # In process, the client shares the app's event loop and requests on the
+    # memory backend rarely yield, so the whole burst shows up as loop lag
+    os.environ.setdefault("SHED_MAX_IN_FLIGHT", "1000000")
+    os.environ.setdefault("SHED_MAX_LAG_MS", "60000")
+    import main
+
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(app=main.app, base_url="http://stress") as client:
+            await login(client, args.username, args.password)
+            return await stress(client, args.replies, args.posts, args.concurrency)
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="base URL of a running server (default: in-process app)")
+    parser.add_argument("--username", default="student1", help="a user enrolled in the stressed course")
+    parser.add_argument("--password", default="password123")
+    parser.add_argument("--replies", type=int, default=2000)
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--processes", type=int, default=8, help="forked processes generating IDs")
+    parser.add_argument("--ids", type=int, default=100_000, help="IDs generated per process")
+    args = parser.parse_args()
+
+    failures = check_ids(args.processes, args.ids)
+    print(f"{args.processes} processes x {args.ids:,} IDs: {'FAIL' if failures else 'ok'}")
+    failures += asyncio.run(run(args))
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("ok: no collisions, no lost updates")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,204 @@
+"""Synthetic tenant data at a configurable scale, modeled on the API's models.
+
+Appends to the sample lists in `sampledata`, which the app seeds storage
+from on startup, so import this after setting any environment `main`
+reads.
+Generation is seeded, so every process given the same `Scale` builds the
+same data.
+"""
+import random
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import bcrypt
+
+import main
+import sampledata
+from users import enrollment_id
+
+BENCH_USER = "bench-student"
+BENCH_PASSWORD = "bench-password"
+WORDS = (
+    "meme doge nap pizza binge lecture syllabus midterm final quiz essay lab project reading seminar "
+    "deadline extension rubric office hours group study notes slides textbook citation draft review"
+).split()
+
+
+@dataclass
+class Scale:
+    courses: int = 200
+    assignments: int = 5  # per course
+    events: int = 2  # per course
+    discussions: int = 5  # per course
+    replies: int = 5  # per discussion
+    quizzes: int = 1  # per course
+    questions: int = 10  # per quiz
+    announcements: int = 100
+    enrolled: int = 8  # courses the bench user is enrolled in
+    seed: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+@dataclass
+class Seeded:
+    """Ids of the generated entities that requests can target."""
+
+    courses: List[str] = field(default_factory=list)
+    enrolled: List[str] = field(default_factory=list)
+    assignments: List[str] = field(default_factory=list)
+    enrolled_assignments: List[str] = field(default_factory=list)
+    discussions: List[str] = field(default_factory=list)
+    enrolled_discussions: List[str] = field(default_factory=list)
+    quizzes: List[str] = field(default_factory=list)
+    enrolled_quizzes: List[str] = field(default_factory=list)
+    # Enrolled quizzes without a time limit, which take plain submissions
+    untimed_quizzes: List[str] = field(default_factory=list)
+    # Quizzes with a time limit, by id, with their course id
+    timed_quizzes: Dict[str, str] = field(default_factory=dict)
+    question_count: int = 0
+
+
+def text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def seed(scale: Scale) -> Seeded:
+    rng = random.Random(scale.seed)
+    now = datetime.now()
+    seeded = Seeded(question_count=scale.questions)
+    seeded.courses = [f"SYN-{i}" for i in range(scale.courses)]
+    seeded.enrolled = sorted(rng.sample(seeded.courses, min(scale.enrolled, scale.courses)))
+    enrolled = set(seeded.enrolled)
+
+    sampledata.sample_courses.extend(
+        main.Course(
+            id=course_id,
+            code=course_id,
+            name=text(rng, 3),
+            color=f"#{rng.randrange(0x1000000):06x}",
+            section=f"Section {rng.randrange(1, 100)}",
+            term="Spring 2025",
+            description=text(rng, 20),
+        )
+        for course_id in seeded.courses
+    )
+
+    # Dated entities are generated in date order so seeding appends to the
+    # sorted indexes
+    offsets = sorted(rng.uniform(-90, 90) for _ in range(scale.courses * scale.assignments))
+    for i, offset in enumerate(offsets):
+        assignment = main.Assignment(
+            id=f"SYN-hw{i}",
+            course_id=rng.choice(seeded.courses),
+            title=text(rng, 4),
+            due_date=now + timedelta(days=offset),
+            points=rng.choice((10, 20, 50, 100)),
+            description=text(rng, 30),
+        )
+        sampledata.sample_assignments.append(assignment)
+        seeded.assignments.append(assignment.id)
+        if assignment.course_id in enrolled:
+            seeded.enrolled_assignments.append(assignment.id)
+
+    offsets = sorted(rng.uniform(-90, 90) for _ in range(scale.courses * scale.events))
+    sampledata.sample_events.extend(
+        main.Event(
+            id=f"SYN-ev{i}",
+            title=text(rng, 3),
+            start_time=now + timedelta(days=offset),
+            end_time=now + timedelta(days=offset, hours=1),
+            location=f"Room {rng.randrange(100, 500)}",
+            course_id=rng.choice(seeded.courses),
+            # Every tenth event is a weekly class meeting
+            recurrence="FREQ=WEEKLY;COUNT=12" if i % 10 == 0 else None,
+        )
+        for i, offset in enumerate(offsets)
+    )
+
+    offsets = sorted(rng.uniform(-30, 0) for _ in range(scale.announcements))
+    sampledata.sample_announcements.extend(
+        main.Announcement(
+            id=f"SYN-ann{i}",
+            source=text(rng, 2).upper(),
+            title=text(rng, 6),
+            content=text(rng, 40),
+            date=now + timedelta(days=offset),
+        )
+        for i, offset in enumerate(offsets)
+    )
+
+    offsets = sorted(rng.uniform(-60, 0) for _ in range(scale.courses * scale.discussions))
+    for i, offset in enumerate(offsets):
+        created_at = now + timedelta(days=offset)
+        post = main.DiscussionPost(
+            id=f"SYN-disc{i}",
+            course_id=rng.choice(seeded.courses),
+            title=text(rng, 6),
+            content=text(rng, 60),
+            author=text(rng, 2),
+            created_at=created_at,
+            replies_count=scale.replies,
+        )
+        sampledata.sample_discussions.append(post)
+        seeded.discussions.append(post.id)
+        if post.course_id in enrolled:
+            seeded.enrolled_discussions.append(post.id)
+        sampledata.sample_discussion_replies.extend(
+            main.DiscussionReply(
+                id=f"SYN-reply{i}-{j}",
+                post_id=post.id,
+                content=text(rng, 30),
+                author=text(rng, 2),
+                created_at=created_at + timedelta(hours=j + 1),
+            )
+            for j in range(scale.replies)
+        )
+
+    # Every enrolled course gets a quiz, so quiz writes always have a target;
+    # the first enrolled course's quizzes have no time limit, so untimed
+    # submissions do too
+    quiz_courses = [course_id for course_id in seeded.courses for _ in range(scale.quizzes)] or seeded.enrolled
+    for i, course_id in enumerate(quiz_courses):
+        questions = [
+            main.QuizQuestion(
+                id=f"q{j}",
+                question=text(rng, 10) + "?",
+                options=[text(rng, 2) for _ in range(4)],
+                correct_option=rng.randrange(4),
+                points=rng.randint(1, 5),
+            )
+            for j in range(scale.questions)
+        ]
+        quiz = main.Quiz(
+            id=f"SYN-quiz{i}",
+            course_id=course_id,
+            title=text(rng, 4),
+            description=text(rng, 12),
+            due_date=now + timedelta(days=rng.uniform(1, 60)),
+            time_limit_minutes=rng.choice((None, 15, 30, 60)),
+            questions=questions,
+            total_points=sum(question.points for question in questions),
+        )
+        if course_id in seeded.enrolled[:1]:
+            quiz.time_limit_minutes = None
+        sampledata.sample_quizzes.append(quiz)
+        seeded.quizzes.append(quiz.id)
+        if course_id in enrolled:
+            seeded.enrolled_quizzes.append(quiz.id)
+            if quiz.time_limit_minutes is None:
+                seeded.untimed_quizzes.append(quiz.id)
+        if quiz.time_limit_minutes is not None:
+            seeded.timed_quizzes[quiz.id] = course_id
+
+    sampledata.sample_users.append(main.User(id=BENCH_USER, name="Bench Student"))
+    # The lowest bcrypt cost, so /token measures the route rather than bcrypt
+    password_hash = bcrypt.hashpw(BENCH_PASSWORD.encode(), bcrypt.gensalt(4)).decode()
+    sampledata.sample_credentials.append(main.Credential(id=BENCH_USER, password_hash=password_hash))
+    sampledata.sample_enrollments.extend(
+        main.Enrollment(id=enrollment_id(BENCH_USER, course_id), user_id=BENCH_USER, course_id=course_id)
+        for course_id in seeded.enrolled
+    )
+    return seeded
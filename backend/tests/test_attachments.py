@@ -0,0 +1,79 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from attachments import BlobStore, LocalBlobStore
+from storage import MemoryStorage
+
+
+def test_blob_store_backends_must_implement_every_operation():
+    class Partial(BlobStore):
+        async def write_part(self, upload_id, offset, chunks):
+            return 0
+
+    with pytest.raises(TypeError):
+        BlobStore()
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def body(*chunks: bytes) -> SimpleNamespace:
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+
+    return SimpleNamespace(stream=stream, headers={})
+
+
+async def course_member(storage: MemoryStorage) -> None:
+    await storage.upsert("assignments", main.Assignment(id="a", course_id="c", title="A", due_date=datetime(2026, 12, 1)))
+    await storage.upsert("enrollments", main.Enrollment(id="u:c", user_id="u", course_id="c"))
+
+
+def test_malformed_content_length_is_a_bad_request(tmp_path):
+    async def run():
+        storage = MemoryStorage()
+        await course_member(storage)
+        request = body(b"file")
+        request.headers = {"content-length": "lots"}
+        with pytest.raises(HTTPException) as raised:
+            await main.receive_attachment(request, "assignment", "a", "f.txt", "u", storage, LocalBlobStore(str(tmp_path)), None)
+        assert raised.value.status_code == 400
+
+    asyncio.run(run())
+
+
+def test_part_written_first_by_another_worker_wins(tmp_path):
+    class Racing(LocalBlobStore):
+        async def write_part(self, upload_id, offset, chunks):
+            written = await super().write_part(upload_id, offset, chunks)
+            # Another worker, which this one's lock does not cover, stores the same part first
+            await storage.update_if("uploads", upload_id, {"offset": offset}, {"offset": offset + 2})
+            return written
+
+    async def run():
+        await course_member(storage)
+        upload = main.Upload(
+            id="upl",
+            parent_type="assignment",
+            parent_id="a",
+            course_id="c",
+            filename="f.txt",
+            content_type="text/plain",
+            size=4,
+            uploaded_by="u",
+            created_at=datetime.now(),
+        )
+        await storage.insert("uploads", upload)
+        with pytest.raises(HTTPException) as raised:
+            await main.append_upload("upl", body(b"ab"), 0, "u", storage, Racing(str(tmp_path)), None)
+        assert raised.value.status_code == 409
+        assert raised.value.headers == {"Upload-Offset": "2"}
+        assert (await storage.get("uploads", "upl"))["offset"] == 2
+
+    storage = MemoryStorage()
+    asyncio.run(run())
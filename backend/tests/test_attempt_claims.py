@@ -0,0 +1,170 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from attempts import ATTEMPT_CLAIM_TIMEOUT_SECONDS, ATTEMPTS_COLLECTION, GRADING, QuizSessions
+from grading import GradingEngine
+from storage import MemoryStorage
+
+QUIZ = main.Quiz(
+    id="q",
+    course_id="c",
+    title="Quiz",
+    due_date=datetime(2026, 12, 1),
+    time_limit_minutes=30,
+    questions=[main.QuizQuestion(id=f"q{i}", question="?", options=["a", "b"], correct_option=1) for i in range(3)],
+    total_points=3,
+)
+
+
+def attempt(student: str, deadline: datetime) -> main.QuizAttempt:
+    started = deadline - timedelta(minutes=30)
+    return main.QuizAttempt(
+        id=f"{student}:q",
+        quiz_id="q",
+        course_id="c",
+        student_id=student,
+        answers=[None] * 3,
+        started_at=started,
+        deadline=deadline,
+        saved_at=started,
+    )
+
+
+async def workers(count: int, *attempts: main.QuizAttempt):
+    # Several workers sharing one storage, each with its own sessions
+    storage = MemoryStorage()
+    await storage.upsert("quizzes", QUIZ)
+    await storage.upsert_many(ATTEMPTS_COLLECTION, list(attempts))
+    states = []
+    for _ in range(count):
+        state = SimpleNamespace(storage=storage, grading=GradingEngine())
+        state.quiz_sessions = QuizSessions(storage, lambda attempt_ids, state=state: main.expire_attempts(state, attempt_ids))
+        states.append(state)
+    return storage, states
+
+
+async def submissions(storage) -> list:
+    return await storage.find("quiz_submissions", where={"quiz_id": "q"})
+
+
+def test_every_worker_expiring_an_attempt_grades_it_once():
+    async def run():
+        storage, states = await workers(3, attempt("s1", datetime.now() - timedelta(minutes=1)))
+        await asyncio.gather(*(main.expire_attempts(state, ["s1:q"]) for state in states))
+        stored = await storage.get(ATTEMPTS_COLLECTION, "s1:q")
+        graded = await submissions(storage)
+        assert stored["status"] == "timed_out"
+        assert [submission["id"] for submission in graded] == [stored["submission_id"]]
+
+    asyncio.run(run())
+
+
+def test_submission_and_expiry_race_grades_once():
+    async def run():
+        storage, (first, second) = await workers(2, attempt("s1", datetime.now() + timedelta(minutes=5)))
+        second.quiz_sessions.save(attempt("s1", datetime.now() + timedelta(minutes=5)).model_copy(update={"answers": [1, 1, 0]}))
+        submitted, _ = await asyncio.gather(
+            main.submit_attempt(storage, first.grading, first.quiz_sessions, "q", "s1", [1, 1, 1]),
+            main.expire_attempts(second, ["s1:q"]),
+        )
+        assert submitted.score == 3
+        assert len(await submissions(storage)) == 1
+        assert (await storage.get(ATTEMPTS_COLLECTION, "s1:q"))["status"] == "submitted"
+        # The other worker's autosave is dropped rather than reopening the attempt
+        await second.quiz_sessions.flush()
+        assert (await storage.get(ATTEMPTS_COLLECTION, "s1:q"))["answers"] == [1, 1, 1]
+
+        with pytest.raises(HTTPException) as raised:
+            await main.submit_attempt(storage, second.grading, second.quiz_sessions, "q", "s1", [0, 0, 0])
+        assert raised.value.status_code == 409
+
+    asyncio.run(run())
+
+
+def test_answers_stay_buffered_until_the_flush_has_written_them():
+    async def run():
+        storage, (worker,) = await workers(1, attempt("s1", datetime.now() + timedelta(minutes=5)))
+        saved = main.QuizAttempt.model_validate(await storage.get(ATTEMPTS_COLLECTION, "s1:q"))
+        worker.quiz_sessions.save(saved.model_copy(update={"answers": [1, 0, 1]}))
+        written = asyncio.Event()
+        update_many_if = storage.update_many_if
+
+        async def slow_update_many_if(*args):
+            await written.wait()
+            await update_many_if(*args)
+
+        storage.update_many_if = slow_update_many_if
+        flushing = asyncio.create_task(worker.quiz_sessions.flush())
+        await asyncio.sleep(0)
+        # Mid-write, the answers are still read from the buffer
+        loaded = await main.load_attempt(storage, worker.quiz_sessions, "s1:q")
+        assert loaded.answers == [1, 0, 1]
+        written.set()
+        await flushing
+        assert worker.quiz_sessions.unsaved("s1:q") is None
+        assert (await storage.get(ATTEMPTS_COLLECTION, "s1:q"))["answers"] == [1, 0, 1]
+
+    asyncio.run(run())
+
+
+def test_failed_flush_keeps_the_answers():
+    async def run():
+        storage, (worker,) = await workers(1, attempt("s1", datetime.now() + timedelta(minutes=5)))
+        saved = main.QuizAttempt.model_validate(await storage.get(ATTEMPTS_COLLECTION, "s1:q"))
+        worker.quiz_sessions.save(saved.model_copy(update={"answers": [1, 0, 1]}))
+
+        async def failing(*args):
+            raise ConnectionError
+
+        storage.update_many_if = failing
+        with pytest.raises(ConnectionError):
+            await worker.quiz_sessions.flush()
+        assert worker.quiz_sessions.unsaved("s1:q").answers == [1, 0, 1]
+
+    asyncio.run(run())
+
+
+def test_stale_claims_are_graded_once_after_a_restart():
+    async def run():
+        claimed_at = datetime.now() - timedelta(seconds=ATTEMPT_CLAIM_TIMEOUT_SECONDS + 5)
+        left = attempt("s1", claimed_at + timedelta(minutes=5)).model_copy(update={
+            "status": GRADING, "submission_id": "sub_lost", "saved_at": claimed_at, "answers": [1, 1, 0],
+        })
+        storage, states = await workers(2, left)
+        for state in states:
+            await state.quiz_sessions.start()
+            await state.quiz_sessions.close()
+            assert "s1:q" in state.quiz_sessions.timers
+        await asyncio.gather(*(main.expire_attempts(state, ["s1:q"]) for state in states))
+        stored = await storage.get(ATTEMPTS_COLLECTION, "s1:q")
+        graded = await submissions(storage)
+        # Claimed before its deadline, so it was being submitted
+        assert stored["status"] == "submitted"
+        assert [(submission["id"], submission["score"]) for submission in graded] == [(stored["submission_id"], 2)]
+
+    asyncio.run(run())
+
+
+def test_reclaim_after_recording_keeps_one_submission_and_one_count():
+    async def run():
+        claimed_at = datetime.now() - timedelta(seconds=ATTEMPT_CLAIM_TIMEOUT_SECONDS + 5)
+        left = attempt("s1", claimed_at + timedelta(minutes=5)).model_copy(update={
+            "status": GRADING, "submission_id": "sub_lost", "saved_at": claimed_at, "answers": [1, 1, 0],
+        })
+        storage, (worker,) = await workers(1, left)
+        # The stopped worker got as far as writing the submission
+        await storage.upsert("quiz_submissions", main.QuizSubmission(
+            id="sub_lost", quiz_id="q", student_id="s1", answers=[1, 1, 0], score=2, submitted_at=claimed_at,
+        ))
+        await main.expire_attempts(worker, ["s1:q"])
+        stored = await storage.get(ATTEMPTS_COLLECTION, "s1:q")
+        assert stored["status"] == "submitted"
+        assert [submission["id"] for submission in await submissions(storage)] == ["sub_lost"]
+        assert (await storage.counters("quiz_stats", "q"))["count"] == 1
+
+    asyncio.run(run())
@@ -0,0 +1,58 @@
+import random
+
+from attempts import TimerWheel, grading_answers
+
+
+def test_fires_on_the_first_tick_at_or_after_the_deadline():
+    wheel = TimerWheel(now=1000)
+    wheel.schedule("a", 1005.5)
+    assert wheel.advance(1005) == []
+    assert wheel.advance(1006) == ["a"]
+    assert "a" not in wheel
+
+
+def test_past_deadlines_fire_on_the_next_tick():
+    wheel = TimerWheel(now=1000)
+    wheel.schedule("a", 10)
+    assert wheel.advance(1001) == ["a"]
+
+
+def test_cancel_and_reschedule():
+    wheel = TimerWheel(now=0)
+    wheel.schedule("a", 10)
+    wheel.schedule("b", 10)
+    wheel.cancel("a")
+    wheel.schedule("b", 5000)
+    assert wheel.advance(4999) == []
+    assert wheel.advance(5000) == ["b"]
+    assert len(wheel) == 0
+
+
+def test_matches_a_sorted_reference_across_levels():
+    rng = random.Random(0)
+    wheel = TimerWheel(tick=1.0, slots=8, levels=3, now=0)
+    pending = {}
+    now = 0
+    for step in range(3000):
+        for _ in range(rng.randrange(3)):
+            key = rng.randrange(200)
+            # Beyond the wheel's span of 8**3 ticks too
+            deadline = now + rng.choice((rng.uniform(0, 10), rng.uniform(0, 600), rng.uniform(0, 2000)))
+            wheel.schedule(key, deadline)
+            pending[key] = max(int(-(-deadline // 1)), now + 1)
+        if rng.random() < 0.1 and pending:
+            key = rng.choice(list(pending))
+            wheel.cancel(key)
+            del pending[key]
+        now += rng.randrange(1, 4)
+        fired = wheel.advance(now)
+        due = {key for key, tick in pending.items() if tick <= now}
+        assert set(fired) == due
+        for key in due:
+            del pending[key]
+        assert len(wheel) == len(pending)
+
+
+def test_grading_answers_pads_and_marks_unanswered():
+    assert grading_answers([1, None], 3) == [1, -1, -1]
+    assert grading_answers([1, 2, 3, 0], 3) == [1, 2, 3]
@@ -0,0 +1,41 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from pydantic import BaseModel
+
+from bulk import import_ndjson
+from storage import MemoryStorage
+
+
+class Announcement(BaseModel):
+    id: str
+    source: str
+    title: str
+    content: str
+    date: datetime
+
+
+async def chunks(lines: List[bytes]):
+    for line in lines:
+        yield line
+
+
+def test_aware_dates_are_stored_naive():
+    lines = [
+        b'{"id": "a1", "source": "CS101", "title": "Naive", "content": "", "date": "2026-10-01T09:00:00"}\n',
+        b'{"id": "a2", "source": "CS101", "title": "Aware", "content": "", "date": "2026-10-02T09:00:00+02:00"}\n',
+    ]
+
+    async def run():
+        storage = MemoryStorage()
+        result = await import_ndjson(storage, "announcements", Announcement, chunks(lines))
+        assert (result.imported, result.rejected) == (2, 0)
+        return await storage.find("announcements")
+
+    docs = asyncio.run(run())
+    aware = datetime(2026, 10, 2, 9, tzinfo=timezone(timedelta(hours=2)))
+    assert {doc["id"]: doc["date"] for doc in docs} == {
+        "a1": datetime(2026, 10, 1, 9),
+        "a2": aware.astimezone().replace(tzinfo=None),
+    }
@@ -0,0 +1,100 @@
+import asyncio
+
+from cache import EncodedCache, MemorySharedCache
+
+
+def test_shared_tier_drops_write_back_after_delete():
+    async def run():
+        shared = MemorySharedCache()
+        (body, generation), = await shared.get_many(["k"])
+        assert body is None
+        await shared.delete(["k"])
+        await shared.set_many({"k": (b"stale", generation)}, ttl=60)
+        assert (await shared.get_many(["k"]))[0][0] is None
+        (_, generation), = await shared.get_many(["k"])
+        await shared.set_many({"k": (b"fresh", generation)}, ttl=60)
+        assert (await shared.get_many(["k"]))[0][0] == b"fresh"
+
+    asyncio.run(run())
+
+
+def test_invalidation_during_load_is_not_overwritten():
+    async def run():
+        shared = MemorySharedCache()
+        # A second worker sharing the tier invalidates while this one loads
+        cache, other = EncodedCache(shared), EncodedCache(shared)
+
+        async def load():
+            await other.invalidate("ns", "k")
+            return b"stale"
+
+        assert await cache.get_or_load("ns", "k", load) == b"stale"
+
+        async def reload():
+            return b"fresh"
+
+        assert await other.get_or_load("ns", "k", reload) == b"fresh"
+        assert await EncodedCache(shared).get_or_load("ns", "k", reload) == b"fresh"
+
+    asyncio.run(run())
+
+
+def test_get_or_load_many_skips_keys_invalidated_during_load():
+    async def run():
+        shared = MemorySharedCache()
+        cache, other = EncodedCache(shared), EncodedCache(shared)
+        calls = []
+
+        async def load(keys):
+            calls.append(sorted(keys))
+            if len(calls) == 1:
+                await cache.invalidate("ns", "a")
+                await other.invalidate("ns", "b")
+            return {key: f"v{len(calls)}".encode() for key in keys}
+
+        assert await cache.get_or_load_many("ns", ["a", "b", "c"], load) == {"a": b"v1", "b": b"v1", "c": b"v1"}
+        # "a" was invalidated here, so only "b" and "c" stay in this process
+        assert await cache.get_or_load_many("ns", ["a", "b", "c"], load) == {"a": b"v2", "b": b"v1", "c": b"v1"}
+        # and the shared tier kept "c" and the reloaded "a", but not the stale "b"
+        fresh = EncodedCache(shared)
+        assert await fresh.get_or_load_many("ns", ["a", "b", "c"], load) == {"a": b"v2", "b": b"v3", "c": b"v1"}
+        assert calls == [["a", "b", "c"], ["a"], ["b"]]
+
+    asyncio.run(run())
+
+
+def test_local_entries_older_than_the_requested_revision_are_reloaded():
+    async def run():
+        # No shared tier: another worker's write only shows up as a new revision
+        cache = EncodedCache()
+        bodies = iter([b"old", b"new"])
+
+        async def load():
+            return next(bodies)
+
+        assert await cache.at({"ns": 1}).get_or_load("ns", "k", load) == b"old"
+        assert await cache.at({"ns": 1}).get_or_load("ns", "k", load) == b"old"
+        assert await cache.at({"ns": 2}).get_or_load("ns", "k", load) == b"new"
+        assert await cache.at({"ns": 1}).get_or_load("ns", "k", load) == b"new"
+        assert cache.stats.outdated == 1
+
+    asyncio.run(run())
+
+
+def test_shared_entries_older_than_the_requested_revision_are_reloaded():
+    async def run():
+        shared = MemorySharedCache()
+        calls = []
+
+        async def load(keys):
+            calls.append(sorted(keys))
+            return {key: f"v{len(calls)}".encode() for key in keys}
+
+        await EncodedCache(shared).get_or_load_many("ns", ["a", "b"], load, revision=1)
+        # Written back at revision 1, so a worker asking for revision 2 loads again
+        assert await EncodedCache(shared).get_or_load_many("ns", ["a", "b"], load, revision=2) == {"a": b"v2", "b": b"v2"}
+        # and a newer entry serves older revisions too
+        assert await EncodedCache(shared).get_or_load_many("ns", ["a"], load, revision=1) == {"a": b"v2"}
+        assert calls == [["a", "b"], ["a", "b"]]
+
+    asyncio.run(run())
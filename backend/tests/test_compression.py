@@ -0,0 +1,68 @@
+import asyncio
+import gzip
+
+import pytest
+
+from compression import Compressor, negotiate
+
+CODINGS = ("zstd", "br", "gzip")
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    [
+        ("gzip, deflate, br, zstd", "zstd"),
+        ("gzip;q=1.0, br;q=0.5", "gzip"),
+        ("br;q=0, gzip", "gzip"),
+        ("*", "zstd"),
+        ("*;q=0.1, br;q=0.5", "br"),
+        ("identity", None),
+        ("gzip;q=0", None),
+        ("gzip;q=abc", None),
+        ("GZIP", "gzip"),
+        ("", None),
+    ],
+)
+def test_negotiate(accept, expected):
+    assert negotiate(accept, CODINGS) == expected
+
+
+def test_unavailable_codings_are_not_offered():
+    compressor = Compressor(codecs={"gzip": lambda body, level: gzip.compress(body, level)}, encodings=CODINGS)
+    assert compressor.encodings == ("gzip",)
+    assert compressor.negotiate("zstd, br") is None
+    assert compressor.negotiate(None) is None
+
+
+def test_bodies_with_an_etag_are_compressed_once():
+    calls = []
+
+    def codec(body, level):
+        calls.append(level)
+        return gzip.compress(body, level)
+
+    compressor = Compressor(codecs={"gzip": codec}, encodings=("gzip",), levels={"gzip": 1}, cached_levels={"gzip": 9})
+    body = b"x" * 4096
+
+    async def run():
+        first = await compressor.compress(body, "gzip", '"r1"')
+        second = await compressor.compress(body, "gzip", '"r1"')
+        assert first == second
+        assert gzip.decompress(first) == body
+        await compressor.compress(body, "gzip")
+
+    asyncio.run(run())
+    assert calls == [9, 1]
+    assert compressor.stats.cache_hits == 1
+
+
+def test_cache_is_bounded_by_bytes():
+    compressor = Compressor(codecs={"gzip": lambda body, level: body}, encodings=("gzip",), max_bytes=10)
+
+    async def run():
+        for etag in ("a", "b", "c"):
+            await compressor.compress(b"12345", "gzip", etag)
+
+    asyncio.run(run())
+    assert len(compressor) == 2
+    assert compressor.stats.evictions == 1
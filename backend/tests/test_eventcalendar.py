@@ -0,0 +1,45 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+from eventcalendar import Recurrence, build_event_calendar
+from storage import MemoryStorage
+
+
+class StoredEvent(BaseModel):
+    # Unvalidated, like events stored before rules were checked
+    id: str
+    start_time: datetime
+    end_time: datetime
+    location: Optional[str] = None
+    course_id: Optional[str] = None
+    recurrence: Optional[str] = None
+
+
+@pytest.mark.parametrize("rule", ["FREQ=MONTHLY", "FREQ=DAILY;BYDAY=MO", "FREQ=WEEKLY;COUNT=0", "COUNT", "FREQ=DAILY;COUNT=x"])
+def test_unsupported_rules_are_rejected(rule):
+    with pytest.raises(ValueError):
+        Recurrence.parse(rule)
+
+
+def test_weekly_series_end():
+    first = datetime(2026, 11, 2, 10)
+    assert Recurrence.parse("FREQ=WEEKLY;INTERVAL=2;COUNT=3").last_start(first) == first + timedelta(weeks=4)
+
+
+def test_startup_skips_events_it_cannot_expand():
+    async def run():
+        storage = MemoryStorage()
+        start = datetime(2026, 11, 2, 10)
+        await storage.upsert_many("events", [
+            StoredEvent(id="bad", start_time=start, end_time=start + timedelta(hours=1), recurrence="FREQ=MONTHLY"),
+            StoredEvent(id="good", start_time=start, end_time=start + timedelta(hours=1), recurrence="FREQ=DAILY;COUNT=3"),
+        ])
+        calendar = await build_event_calendar(storage)
+        occurrences = calendar.window(start, start + timedelta(days=7))
+        assert [event["id"] for event in occurrences] == ["good"] * 3
+
+    asyncio.run(run())
@@ -0,0 +1,52 @@
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Optional
+
+import pytest
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from pagination import check_cursor, decode_cursor, encode_cursor
+
+
+@pytest.mark.parametrize("value", ["CS101", 42, datetime(2026, 10, 18, 9, 30)])
+def test_cursor_round_trip(value):
+    assert decode_cursor(encode_cursor(value, "key1")) == (value, "key1")
+
+
+@pytest.mark.parametrize("cursor", ["", "not base64!", "bm90IGpzb24", encode_cursor("a", "b")[:-3]])
+def test_malformed_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor(cursor)
+    assert raised.value.status_code == 400
+
+
+class Item(BaseModel):
+    id: str
+    due_date: datetime
+    score: Optional[float] = None
+
+
+@pytest.mark.parametrize("value", ["abc", None, [1], 5, True])
+def test_cursor_value_of_another_type_is_400(value):
+    with pytest.raises(HTTPException) as raised:
+        check_cursor((value, "x"), Item, "due_date")
+    assert raised.value.status_code == 400
+
+
+def test_cursor_values_match_the_stored_types():
+    aware = datetime(2026, 10, 18, 9, 30, tzinfo=timezone.utc)
+    value, key = check_cursor((aware, "x"), Item, "due_date")
+    assert value.tzinfo is None and value == aware.astimezone().replace(tzinfo=None)
+    assert check_cursor((3, "x"), Item, "score") == (3.0, "x")
+    assert check_cursor(("b", "x"), Item, "id") == ("b", "x")
+    with pytest.raises(HTTPException):
+        check_cursor((1, "x"), Item, "id")
+
+
+@pytest.mark.parametrize("payload", [["q", 1, "x"], ["v", "a", 3], ["v", "a"]])
+def test_malformed_cursor_payload_is_400(payload):
+    cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+    with pytest.raises(HTTPException):
+        decode_cursor(cursor)
@@ -0,0 +1,23 @@
+import asyncio
+
+from pubsub import Broker, course_topic
+
+
+def test_stream_subscribes_only_once_iterated():
+    async def run():
+        broker = Broker()
+        await broker.start()
+        topic = course_topic("CS101")
+        # Created but never sent, as inside a batch
+        broker.stream([topic])
+        assert broker._subscribers == {}
+
+        stream = broker.stream([topic])
+        assert await stream.__anext__() == b": connected\n\n"
+        assert len(broker._subscribers[topic]) == 1
+        await broker.publish([topic], "reply.created", b"{}")
+        assert b"reply.created" in await stream.__anext__()
+        await stream.aclose()
+        assert broker._subscribers == {}
+
+    asyncio.run(run())
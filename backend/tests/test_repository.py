@@ -0,0 +1,77 @@
+from dataclasses import dataclass
+
+import pytest
+
+from repository import Repository
+
+
+@dataclass
+class Item:
+    id: str
+    group: str
+    rank: int
+
+
+def make() -> Repository[Item]:
+    return Repository(
+        [Item("b", "x", 2), Item("a", "y", 2), Item("c", "x", 1)], indexes=("group",), order_by="rank"
+    )
+
+
+def test_items_are_kept_in_sort_order():
+    repo = make()
+    assert [item.id for item in repo] == ["c", "a", "b"]
+    assert [item.id for item in repo.filter_by("group", "x")] == ["c", "b"]
+
+
+def test_pages_start_after_the_cursor():
+    repo = make()
+    cursor = repo.sort_key(repo.get("c"))
+    assert [item.id for item in repo.iter_from(after=cursor)] == ["a", "b"]
+    assert [item.id for item in repo.iter_from("group", "x", after=cursor)] == ["b"]
+
+
+def test_update_moves_the_item_between_buckets():
+    repo = make()
+    repo.update("b", group="y", rank=0)
+    assert [item.id for item in repo] == ["b", "c", "a"]
+    assert [item.id for item in repo.filter_by("group", "x")] == ["c"]
+    assert [item.id for item in repo.filter_by("group", "y")] == ["b", "a"]
+
+
+def test_remove_drops_empty_buckets():
+    repo = make()
+    repo.remove("a")
+    assert "a" not in repo
+    assert repo.filter_by("group", "y") == []
+    assert "y" not in repo._indexes["group"]
+
+
+def test_duplicate_keys_are_rejected():
+    repo = make()
+    with pytest.raises(ValueError):
+        repo.add(Item("a", "z", 5))
+    assert len(repo) == 3
+
+
+def test_rejected_add_leaves_the_indexes_unchanged():
+    repo = make()
+    with pytest.raises(TypeError):
+        repo.add(Item("d", "x", "late"))
+    with pytest.raises(TypeError):
+        repo.add(Item("e", ["unhashable"], 3))
+    assert "d" not in repo and "e" not in repo
+    assert [item.id for item in repo] == ["c", "a", "b"]
+    assert [item.id for item in repo.filter_by("group", "x")] == ["c", "b"]
+    repo.add(Item("d", "x", 3))
+    assert [item.id for item in repo.filter_by("group", "x")] == ["c", "b", "d"]
+
+
+def test_rejected_update_restores_the_item():
+    repo = make()
+    with pytest.raises(TypeError):
+        repo.update("c", group="y", rank="late")
+    assert repo.get("c") == Item("c", "x", 1)
+    assert [item.id for item in repo] == ["c", "a", "b"]
+    assert [item.id for item in repo.filter_by("group", "x")] == ["c", "b"]
+    assert repo.filter_by("group", "y") == [repo.get("a")]
@@ -0,0 +1,50 @@
+import asyncio
+from datetime import datetime
+
+from pydantic import BaseModel
+
+from search import build_search_index, save_search_index
+from storage import MemoryStorage
+
+
+class Announcement(BaseModel):
+    id: str
+    source: str
+    title: str
+    content: str
+    date: datetime
+
+
+def announcement(key: str, title: str) -> Announcement:
+    return Announcement(id=key, source="CS101", title=title, content="Read chapter four", date=datetime(2026, 10, 1))
+
+
+def test_snapshot_is_reused_while_nothing_changed(tmp_path):
+    path = str(tmp_path / "search.snapshot")
+
+    async def run():
+        storage = MemoryStorage()
+        await storage.upsert("announcements", announcement("a1", "Midterm moved"))
+        index = await build_search_index(storage, path)
+        assert await save_search_index(index, storage, path)
+        reloaded = await build_search_index(storage, path)
+        assert reloaded.revisions == index.revisions
+        assert [hit["id"] for hit in reloaded.search("midterm")] == ["a1"]
+
+    asyncio.run(run())
+
+
+def test_write_after_build_is_not_saved_as_fresh(tmp_path):
+    path = tmp_path / "search.snapshot"
+
+    async def run():
+        storage = MemoryStorage()
+        index = await build_search_index(storage, str(path))
+        # A write the index never saw
+        await storage.upsert("announcements", announcement("a2", "Final exam room"))
+        assert not await save_search_index(index, storage, str(path))
+        assert not path.exists()
+        rebuilt = await build_search_index(storage, str(path))
+        assert [hit["id"] for hit in rebuilt.search("final exam")] == ["a2"]
+
+    asyncio.run(run())
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from pydantic import BaseModel
+
+from storage import MemoryStorage, Storage
+
+
+class Course(BaseModel):
+    id: str
+    name: str
+
+
+def test_incomplete_backend_fails_when_created():
+    class Partial(Storage):
+        async def get(self, collection, key, fields=None):
+            return None
+
+    with pytest.raises(TypeError, match="abstract"):
+        Partial()
+
+
+def test_memory_backend_implements_the_interface():
+    async def run():
+        storage = MemoryStorage()
+        before, = await storage.revisions(["courses"])
+        await storage.upsert_many("courses", [Course(id="c2", name="B"), Course(id="c1", name="A")])
+        assert await storage.get("courses", "c1") == {"id": "c1", "name": "A"}
+        assert [key for _, key in await storage.find_keys("courses")] == ["c1", "c2"]
+        assert await storage.revisions(["courses"]) > [before]
+
+    asyncio.run(run())
+
+
+class Attempt(BaseModel):
+    id: str
+    quiz_id: str
+    student_id: str
+    status: str
+    answers: list
+    started_at: int
+
+
+def test_conditional_updates_apply_only_to_matching_documents():
+    async def run():
+        storage = MemoryStorage()
+        await storage.upsert_many("quiz_attempts", [
+            Attempt(id=key, quiz_id="q", student_id=key, status="in_progress", answers=[None], started_at=i)
+            for i, key in enumerate(("a", "b"))
+        ])
+        assert await storage.update_if("quiz_attempts", "a", {"status": "in_progress"}, {"status": "grading"})
+        assert not await storage.update_if("quiz_attempts", "a", {"status": "in_progress"}, {"status": "grading"})
+        assert not await storage.update_if("quiz_attempts", "missing", {}, {"status": "grading"})
+        before, = await storage.revisions(["quiz_attempts"])
+        await storage.update_many_if("quiz_attempts", {"status": "in_progress"}, {"a": {"answers": [1]}, "b": {"answers": [2]}})
+        assert await storage.revisions(["quiz_attempts"]) > [before]
+        assert [doc["answers"] for doc in await storage.get_many("quiz_attempts", ["a", "b"])] == [[None], [2]]
+        assert [doc["id"] for doc in await storage.find("quiz_attempts", where={"status": "grading"})] == ["a"]
+
+    asyncio.run(run())
@@ -0,0 +1,27 @@
+from throttling import LoadShedder
+
+
+def test_single_stall_is_not_shed():
+    shedder = LoadShedder(max_lag=0.2)
+    for late in (0.001, 3.0, 0.001):
+        shedder.record(late)
+        assert not shedder.overloaded()
+
+
+def test_sustained_lag_is_shed_until_the_loop_recovers():
+    shedder = LoadShedder(max_lag=0.2)
+    shedder.record(0.5)
+    assert not shedder.overloaded()
+    shedder.record(0.3)
+    assert shedder.overloaded()
+    assert shedder.lag == 0.3
+    shedder.record(0.001)
+    assert not shedder.overloaded()
+
+
+def test_in_flight_limit():
+    shedder = LoadShedder(max_in_flight=2)
+    shedder.in_flight = 1
+    assert not shedder.overloaded()
+    shedder.in_flight = 2
+    assert shedder.overloaded()